@@ -4,8 +4,10 @@ from .models import (
     Currency, Vendor, VendorProduct,
     PurchaseOrder, PurchaseOrderItem, Quotation, QuotationItem,
     Receiving, ReceivingItem,
-    ItemRequest, ItemRequestLine, ItemIssuance, ItemIssuanceLine
+    ItemRequest, ItemRequestLine, ItemIssuance, ItemIssuanceLine,
+    StockMovement, StockCheckpoint, StockBalance, DocumentCounter
 )
+from .stock import set_stock_level
 
 
 # ==================== Inline Admin Classes ====================
@@ -19,7 +21,7 @@ class PurchaseOrderItemInline(admin.TabularInline):
 class ReceivingItemInline(admin.TabularInline):
     model = ReceivingItem
     extra = 1
-    fields = ['po_item', 'quantity_received', 'condition_notes']
+    fields = ['po_item', 'quantity_received', 'location', 'condition_notes']
 
 
 class ItemRequestLineInline(admin.TabularInline):
@@ -31,7 +33,7 @@ class ItemRequestLineInline(admin.TabularInline):
 class ItemIssuanceLineInline(admin.TabularInline):
     model = ItemIssuanceLine
     extra = 1
-    fields = ['request_line', 'quantity_issued']
+    fields = ['request_line', 'quantity_issued', 'location']
 
 
 class VendorProductInline(admin.TabularInline):
@@ -58,15 +60,16 @@ class UnitOfMeasureAdmin(admin.ModelAdmin):
 
 @admin.register(StorageLocation)
 class StorageLocationAdmin(admin.ModelAdmin):
-    list_display = ['code', 'name', 'is_active', 'created_at']
-    list_filter = ['is_active', 'created_at']
+    list_display = ['code', 'name', 'zone', 'aisle', 'bay', 'level', 'is_active', 'created_at']
+    list_filter = ['is_active', 'zone', 'created_at']
     search_fields = ['code', 'name', 'description']
-    list_editable = ['is_active']
+    list_editable = ['zone', 'aisle', 'bay', 'level', 'is_active']
 
 
 @admin.register(Department)
 class DepartmentAdmin(admin.ModelAdmin):
     list_display = ['code', 'name', 'manager', 'is_active', 'created_at']
+    list_select_related = ['manager']
     list_filter = ['is_active', 'created_at']
     search_fields = ['code', 'name']
     list_editable = ['is_active']
@@ -95,6 +98,7 @@ class SiteAdmin(admin.ModelAdmin):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'sku', 'unit_of_measure', 'quantity', 'min_quantity', 'is_low_stock', 'location', 'unit_price', 'created_at']
+    list_select_related = ['unit_of_measure', 'location']
     list_filter = ['location', 'unit_of_measure', 'created_at']
     search_fields = ['name', 'sku', 'description']
     readonly_fields = ['created_at', 'updated_at']
@@ -111,10 +115,70 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        # Quantity and location are applied by the stock service so the ledger and balances stay in step;
+        # reservations are only ever moved by UPDATEs from approvals and issuing, and generated columns by the database
+        quantity, location_id = obj.quantity, obj.location_id
+        if change:
+            obj.save(update_fields=[
+                field.name for field in obj._meta.concrete_fields
+                if not field.primary_key and not field.generated
+                and field.name not in ('quantity', 'location', 'reserved_quantity')
+            ])
+        else:
+            obj.quantity = 0
+            obj.save()
+        set_stock_level(obj, quantity, location_id,
+                        movement_type='adjustment' if change else 'opening',
+                        reference='Admin', user=request.user)
+
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ['product', 'location', 'quantity', 'updated_at']
+    list_filter = ['location']
+    search_fields = ['product__name', 'product__sku', 'location__code']
+    list_select_related = ['product', 'product__unit_of_measure', 'location']
+    raw_id_fields = ['product']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'product', 'movement_type', 'quantity_change', 'location', 'reference', 'created_by']
+    list_filter = ['movement_type', 'created_at']
+    search_fields = ['product__name', 'product__sku', 'reference']
+    list_select_related = ['product', 'product__unit_of_measure', 'location', 'created_by']
+    raw_id_fields = ['product']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockCheckpoint)
+class StockCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['product', 'as_of', 'quantity', 'last_movement_id']
+    list_select_related = ['product__unit_of_measure']
+    list_filter = ['as_of']
+    search_fields = ['product__name', 'product__sku']
+    raw_id_fields = ['product']
+
 
 @admin.register(Team)
 class TeamAdmin(admin.ModelAdmin):
     list_display = ['name', 'department', 'is_active', 'created_at']
+    list_select_related = ['department']
     list_filter = ['is_active', 'department', 'created_at']
     search_fields = ['name', 'description']
 
@@ -122,6 +186,7 @@ class TeamAdmin(admin.ModelAdmin):
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'role', 'department', 'team', 'employee_id', 'is_approved']
+    list_select_related = ['user', 'department', 'team']
     list_filter = ['role', 'department', 'team', 'is_approved']
     search_fields = ['user__username', 'user__email', 'employee_id']
     list_editable = ['is_approved']
@@ -140,10 +205,11 @@ class UserProfileAdmin(admin.ModelAdmin):
 
 @admin.register(PurchaseOrder)
 class PurchaseOrderAdmin(admin.ModelAdmin):
-    list_display = ['po_number', 'external_po_number', 'supplier_name', 'status', 'order_date', 'expected_delivery', 'total_amount', 'created_by']
+    list_display = ['po_number', 'external_po_number', 'supplier_name', 'status', 'order_date', 'expected_delivery', 'line_count', 'total_amount', 'created_by']
+    list_select_related = ['created_by']
     list_filter = ['status', 'order_date', 'created_at']
     search_fields = ['po_number', 'external_po_number', 'supplier_name']
-    readonly_fields = ['created_at', 'updated_at', 'total_amount']
+    readonly_fields = ['created_at', 'updated_at', 'total_amount', 'line_count']
     inlines = [PurchaseOrderItemInline]
     fieldsets = (
         ('PO Information', {
@@ -153,7 +219,7 @@ class PurchaseOrderAdmin(admin.ModelAdmin):
             'fields': ('order_date', 'expected_delivery')
         }),
         ('Details', {
-            'fields': ('notes', 'created_by', 'total_amount')
+            'fields': ('notes', 'created_by', 'total_amount', 'line_count')
         }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
@@ -164,15 +230,17 @@ class PurchaseOrderAdmin(admin.ModelAdmin):
 
 @admin.register(Receiving)
 class ReceivingAdmin(admin.ModelAdmin):
-    list_display = ['purchase_order', 'received_date', 'received_by', 'status']
+    list_display = ['receiving_number', 'purchase_order', 'received_date', 'received_by', 'status']
+    list_select_related = ['purchase_order', 'received_by']
     list_filter = ['status', 'received_date']
-    search_fields = ['purchase_order__po_number']
+    search_fields = ['receiving_number', 'purchase_order__po_number']
     inlines = [ReceivingItemInline]
 
 
 @admin.register(ItemRequest)
 class ItemRequestAdmin(admin.ModelAdmin):
     list_display = ['request_number', 'requested_by', 'department', 'priority', 'status', 'requested_date', 'approved_by']
+    list_select_related = ['requested_by', 'department', 'approved_by']
     list_filter = ['status', 'priority', 'department', 'requested_date']
     search_fields = ['request_number', 'requested_by__username', 'department__name', 'department__code']
     readonly_fields = ['created_at', 'updated_at']
@@ -197,6 +265,7 @@ class ItemRequestAdmin(admin.ModelAdmin):
 @admin.register(ItemIssuance)
 class ItemIssuanceAdmin(admin.ModelAdmin):
     list_display = ['issue_number', 'item_request', 'issued_to', 'issued_by', 'issued_date', 'status']
+    list_select_related = ['item_request__requested_by', 'item_request__department', 'issued_to', 'issued_by']
     list_filter = ['status', 'issued_date']
     search_fields = ['issue_number', 'item_request__request_number']
     inlines = [ItemIssuanceLineInline]
@@ -213,6 +282,7 @@ class CurrencyAdmin(admin.ModelAdmin):
 @admin.register(Vendor)
 class VendorAdmin(admin.ModelAdmin):
     list_display = ['code', 'name', 'contact_person', 'email', 'phone', 'currency', 'is_active']
+    list_select_related = ['currency']
     list_filter = ['is_active', 'currency']
     search_fields = ['code', 'name', 'email', 'contact_person']
     list_editable = ['is_active']
@@ -236,6 +306,7 @@ class VendorAdmin(admin.ModelAdmin):
 @admin.register(VendorProduct)
 class VendorProductAdmin(admin.ModelAdmin):
     list_display = ['vendor', 'product', 'unit_price', 'currency', 'minimum_order_quantity', 'lead_time_days', 'is_active']
+    list_select_related = ['vendor', 'product__unit_of_measure', 'currency']
     list_filter = ['vendor', 'currency', 'is_active']
     search_fields = ['vendor__name', 'product__name', 'vendor_sku']
     list_editable = ['unit_price', 'is_active']
@@ -243,10 +314,11 @@ class VendorProductAdmin(admin.ModelAdmin):
 
 @admin.register(Quotation)
 class QuotationAdmin(admin.ModelAdmin):
-    list_display = ['quotation_number', 'vendor', 'status', 'request_date', 'valid_until', 'total_amount', 'created_by']
+    list_display = ['quotation_number', 'vendor', 'status', 'request_date', 'valid_until', 'line_count', 'total_amount', 'created_by']
+    list_select_related = ['vendor', 'created_by']
     list_filter = ['status', 'vendor', 'request_date']
     search_fields = ['quotation_number', 'vendor__name']
-    readonly_fields = ['total_amount', 'created_at', 'updated_at']
+    readonly_fields = ['total_amount', 'line_count', 'created_at', 'updated_at']
     inlines = [QuotationItemInline]
     fieldsets = (
         ('Quotation Information', {
@@ -256,7 +328,7 @@ class QuotationAdmin(admin.ModelAdmin):
             'fields': ('request_date', 'quotation_date', 'valid_until')
         }),
         ('Details', {
-            'fields': ('notes', 'created_by', 'total_amount')
+            'fields': ('notes', 'created_by', 'total_amount', 'line_count')
         }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
@@ -269,3 +341,15 @@ class QuotationAdmin(admin.ModelAdmin):
 admin.site.site_header = "Warehouse Management System"
 admin.site.site_title = "WMS Admin"
 admin.site.index_title = "Welcome to Warehouse Management System"
+
+
+@admin.register(DocumentCounter)
+class DocumentCounterAdmin(admin.ModelAdmin):
+    list_display = ['prefix', 'last_number', 'updated_at']
+    search_fields = ['prefix']
+    # Counters only ever move forward through allocate_numbers; a lower value would hand out duplicate numbers
+    readonly_fields = ['prefix', 'last_number', 'updated_at']
+
+    def has_add_permission(self, request):
+        # allocate_numbers creates each counter on first use, starting past the numbers already in use
+        return False
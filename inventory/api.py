@@ -0,0 +1,369 @@
+"""
+JSON API resources - values() projections with keyset cursors and field selection
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .listing import decode_cursor, encode_cursor
+from .conditional import ITEM_REQUEST, ISSUANCE, PRODUCT, PURCHASE_ORDER, QUOTATION, TRANSFER, VENDOR
+from .models import (
+    Product, StorageLocation, ItemRequest, ItemRequestLine, ItemIssuance, ItemIssuanceLine,
+    Transfer, Vendor, PurchaseOrder, PurchaseOrderItem, Quotation, QuotationItem,
+)
+from .roles import can_issue_items, can_procure
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+API_VERSION = 'v1'
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class ApiError(Exception):
+    """A client error, reported as {"error": message} with the given status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _default(value):
+    # orjson handles datetimes natively; Decimal and anything else go out as strings
+    return str(value)
+
+
+def dumps(payload):
+    """Serialize to compact JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return DjangoJSONEncoder(separators=(',', ':')).encode(payload).encode()
+
+
+class Lines:
+    """Child rows embedded in each record under `key`, loaded with one query per page"""
+
+    def __init__(self, key, model, parent_field, fields):
+        self.key = key
+        self.model = model
+        self.parent_field = parent_field
+        self.fields = fields
+
+    async def aload(self, parent_ids):
+        labels = list(self.fields)
+        queryset = (
+            self.model.objects
+            .filter(**{f'{self.parent_field}__in': parent_ids})
+            .order_by(self.parent_field, 'id')
+            .values_list(f'{self.parent_field}_id', *self.fields.values())
+        )
+        rows = [row async for row in queryset]
+        return {
+            parent_id: [dict(zip(labels, row[1:])) for row in group]
+            for parent_id, group in groupby(rows, key=itemgetter(0))
+        }
+
+
+class Resource:
+    """
+    One API collection, read with the async ORM.
+
+    fields maps output names to values() lookups, so related columns are
+    joined into the same query instead of being fetched per row. version,
+    when set, lets detail requests be answered with 304 Not Modified.
+    """
+
+    def __init__(self, name, queryset, fields, lines=None, permission=None, filters=(), version=None):
+        self.name = name
+        self.queryset = queryset
+        self.fields = fields
+        self.lines = lines
+        self.permission = permission
+        self.filters = filters
+        self.version = version
+
+    def allowed(self, user):
+        return self.permission is None or self.permission(user)
+
+    def select(self, requested):
+        """Split ?fields= into (record fields, include lines); id is always returned"""
+        available = set(self.fields) | ({self.lines.key} if self.lines else set())
+        if not requested:
+            return list(self.fields), self.lines is not None
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ApiError(f'Unknown field(s): {", ".join(unknown)}. Available: {", ".join(sorted(available))}')
+        selected = ['id'] + [name for name in self.fields if name in names and name != 'id']
+        return selected, bool(self.lines and self.lines.key in names)
+
+    async def _records(self, queryset, selected, include_lines):
+        records = [
+            dict(zip(selected, row))
+            async for row in queryset.values_list(*[self.fields[name] for name in selected])
+        ]
+        if include_lines and records:
+            lines = await self.lines.aload([record['id'] for record in records])
+            for record in records:
+                record[self.lines.key] = lines.get(record['id'], [])
+        return records
+
+    async def apage(self, params):
+        """One page of records ordered by id, plus the cursor for the next page"""
+        selected, include_lines = self.select(params.get('fields'))
+        try:
+            limit = int(params.get('limit', DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            raise ApiError('limit must be a number')
+        limit = max(1, min(limit, MAX_LIMIT))
+
+        queryset = self.queryset()
+        for name in self.filters:
+            value = params.get(name)
+            if value:
+                try:
+                    queryset = queryset.filter(**{FILTERS[name]: value})
+                except ValidationError as e:
+                    raise ApiError(f'{name}: {"; ".join(e.messages)}')
+
+        cursor = params.get('cursor')
+        if cursor:
+            values = decode_cursor(cursor)
+            if values is None:
+                raise ApiError('Invalid cursor')
+            queryset = queryset.filter(id__gt=values[1])
+
+        records = await self._records(queryset.order_by('id')[:limit + 1], selected, include_lines)
+        has_more = len(records) > limit
+        records = records[:limit]
+        return {
+            'results': records,
+            'next_cursor': encode_cursor([None, records[-1]['id']]) if has_more else None,
+        }
+
+    async def adetail(self, pk, params):
+        selected, include_lines = self.select(params.get('fields'))
+        records = await self._records(self.queryset().filter(pk=pk), selected, include_lines)
+        if not records:
+            raise ApiError('Not found', status=404)
+        return records[0]
+
+
+# Query parameters a resource may accept, mapped to ORM lookups
+FILTERS = {
+    'status': 'status',
+    'updated_since': 'updated_at__gte',
+    'created_since': 'created_at__gte',
+    'sku': 'sku',
+    'location': 'location__code',
+    'is_active': 'is_active',
+}
+
+
+RESOURCES = {resource.name: resource for resource in [
+    Resource(
+        'products',
+        lambda: Product.objects.all(),
+        {
+            'id': 'id',
+            'sku': 'sku',
+            'name': 'name',
+            'description': 'description',
+            'quantity': 'quantity',
+            'reserved_quantity': 'reserved_quantity',
+            'available_quantity': 'available_quantity',
+            'min_quantity': 'min_quantity',
+            'unit_price': 'unit_price',
+            'unit_of_measure': 'unit_of_measure__abbreviation',
+            'location': 'location__code',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        filters=('sku', 'location', 'updated_since'),
+        version=PRODUCT,
+    ),
+    Resource(
+        'locations',
+        lambda: StorageLocation.objects.all(),
+        {
+            'id': 'id',
+            'code': 'code',
+            'name': 'name',
+            'description': 'description',
+            'zone': 'zone',
+            'aisle': 'aisle',
+            'bay': 'bay',
+            'level': 'level',
+            'is_active': 'is_active',
+            'created_at': 'created_at',
+        },
+        filters=('is_active',),
+    ),
+    Resource(
+        'requests',
+        lambda: ItemRequest.objects.all(),
+        {
+            'id': 'id',
+            'request_number': 'request_number',
+            'status': 'status',
+            'priority': 'priority',
+            'requested_by': 'requested_by__username',
+            'department': 'department__code',
+            'purpose': 'purpose',
+            'requested_date': 'requested_date',
+            'required_by_date': 'required_by_date',
+            'approved_by': 'approved_by__username',
+            'approved_date': 'approved_date',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        lines=Lines('lines', ItemRequestLine, 'item_request', {
+            'id': 'id',
+            'product_id': 'product_id',
+            'product_sku': 'product__sku',
+            'quantity_requested': 'quantity_requested',
+            'quantity_approved': 'quantity_approved',
+            'quantity_issued': 'quantity_issued',
+            'destination_site': 'destination_site__code',
+        }),
+        filters=('status', 'updated_since'),
+        version=ITEM_REQUEST,
+    ),
+    Resource(
+        'issuances',
+        lambda: ItemIssuance.objects.all(),
+        {
+            'id': 'id',
+            'issue_number': 'issue_number',
+            'status': 'status',
+            'request_number': 'item_request__request_number',
+            'issued_by': 'issued_by__username',
+            'issued_to': 'issued_to__username',
+            'issued_date': 'issued_date',
+            'notes': 'notes',
+            'created_at': 'created_at',
+        },
+        lines=Lines('lines', ItemIssuanceLine, 'issuance', {
+            'id': 'id',
+            'request_line_id': 'request_line_id',
+            'product_sku': 'request_line__product__sku',
+            'quantity_issued': 'quantity_issued',
+            'location': 'location__code',
+        }),
+        permission=can_issue_items,
+        filters=('status', 'created_since'),
+        version=ISSUANCE,
+    ),
+    Resource(
+        'transfers',
+        lambda: Transfer.objects.all(),
+        {
+            'id': 'id',
+            'transfer_number': 'transfer_number',
+            'status': 'status',
+            'product_id': 'product_id',
+            'product_sku': 'product__sku',
+            'quantity': 'quantity',
+            'from_location': 'from_location__code',
+            'to_location': 'to_location__code',
+            'requested_by': 'requested_by__username',
+            'transferred_by': 'transferred_by__username',
+            'transfer_date': 'transfer_date',
+            'notes': 'notes',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        filters=('status', 'updated_since'),
+        version=TRANSFER,
+    ),
+    Resource(
+        'vendors',
+        lambda: Vendor.objects.all(),
+        {
+            'id': 'id',
+            'code': 'code',
+            'name': 'name',
+            'contact_person': 'contact_person',
+            'email': 'email',
+            'phone': 'phone',
+            'address': 'address',
+            'payment_terms': 'payment_terms',
+            'currency': 'currency__code',
+            'is_active': 'is_active',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        permission=can_procure,
+        filters=('is_active', 'updated_since'),
+        version=VENDOR,
+    ),
+    Resource(
+        'purchase-orders',
+        lambda: PurchaseOrder.objects.all(),
+        {
+            'id': 'id',
+            'po_number': 'po_number',
+            'external_po_number': 'external_po_number',
+            'status': 'status',
+            'vendor': 'vendor__code',
+            'supplier_name': 'supplier_name',
+            'currency': 'currency__code',
+            'order_date': 'order_date',
+            'expected_delivery': 'expected_delivery',
+            'payment_terms': 'payment_terms',
+            'total_amount': 'total_amount',
+            'line_count': 'line_count',
+            'created_by': 'created_by__username',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        lines=Lines('items', PurchaseOrderItem, 'purchase_order', {
+            'id': 'id',
+            'product_id': 'product_id',
+            'product_sku': 'product__sku',
+            'quantity_ordered': 'quantity_ordered',
+            'quantity_received': 'quantity_received',
+            'unit_price': 'unit_price',
+        }),
+        permission=can_procure,
+        filters=('status', 'updated_since'),
+        version=PURCHASE_ORDER,
+    ),
+    Resource(
+        'quotations',
+        lambda: Quotation.objects.all(),
+        {
+            'id': 'id',
+            'quotation_number': 'quotation_number',
+            'status': 'status',
+            'vendor': 'vendor__code',
+            'currency': 'currency__code',
+            'request_date': 'request_date',
+            'quotation_date': 'quotation_date',
+            'valid_until': 'valid_until',
+            'total_amount': 'total_amount',
+            'line_count': 'line_count',
+            'created_by': 'created_by__username',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        lines=Lines('items', QuotationItem, 'quotation', {
+            'id': 'id',
+            'product_id': 'product_id',
+            'product_sku': 'product__sku',
+            'quantity': 'quantity',
+            'unit_price': 'unit_price',
+            'vendor_sku': 'vendor_sku',
+            'lead_time_days': 'lead_time_days',
+        }),
+        permission=can_procure,
+        filters=('status', 'updated_since'),
+        version=QUOTATION,
+    ),
+]}
@@ -0,0 +1,70 @@
+"""
+API Views - read-only JSON endpoints under /inventory/api/v1/
+
+The views are async: under ASGI a worker answers many concurrent polls from
+one event loop, with only the session/permission check and the queries
+handed to threads.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+
+from .api import RESOURCES, ApiError, dumps
+from .conditional import aconditional_response
+
+
+def json_response(payload, status=200):
+    return HttpResponse(dumps(payload), status=status, content_type='application/json')
+
+
+def error_response(message, status):
+    return json_response({'error': message}, status=status)
+
+
+def resolve(request, resource):
+    """The named resource, or an ApiError when it does not exist or the user may not read it"""
+    if request.method != 'GET':
+        raise ApiError('Method not allowed', status=405)
+    if not request.user.is_authenticated:
+        raise ApiError('Authentication required', status=401)
+    if resource not in RESOURCES:
+        raise ApiError(f'Unknown resource "{resource}"', status=404)
+    api_resource = RESOURCES[resource]
+    if not api_resource.allowed(request.user):
+        raise ApiError('You do not have permission to read this resource', status=403)
+    return api_resource
+
+
+async def api_list(request, resource):
+    """
+    One page of a collection, ordered by id.
+
+    ?limit= (max 200), ?cursor= from the previous page's next_cursor,
+    ?fields=a,b,c to trim records, plus the resource's filters.
+    """
+    try:
+        api_resource = await sync_to_async(resolve)(request, resource)
+        page = await api_resource.apage(request.GET)
+    except ApiError as e:
+        return error_response(str(e), e.status)
+    return json_response(page)
+
+
+async def api_detail(request, resource, pk):
+    """
+    A single record, with its lines; ?fields= works as on the list.
+    Answers 304 to If-None-Match / If-Modified-Since when the record is unchanged.
+    """
+    try:
+        api_resource = await sync_to_async(resolve)(request, resource)
+    except ApiError as e:
+        return error_response(str(e), e.status)
+
+    async def respond():
+        try:
+            return json_response(await api_resource.adetail(pk, request.GET))
+        except ApiError as e:
+            return error_response(str(e), e.status)
+
+    if api_resource.version is None:
+        return await respond()
+    return await aconditional_response(request, api_resource.version, pk, respond)
@@ -0,0 +1,182 @@
+"""
+Item request approval - approve, reject or cancel many requests in a few set-based statements
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import stats
+from .models import ItemRequest, ItemRequestLine, Product
+from .reservations import RESERVING_STATUSES, open_quantities, release, reserve
+
+
+class Decision:
+    """Outcome of a bulk approve/reject for one request"""
+
+    def __init__(self, request_id, request_number, ok, message):
+        self.request_id = request_id
+        self.request_number = request_number
+        self.ok = ok
+        self.message = message
+
+
+def can_decide(user, item_request):
+    """Department heads decide their own department's requests; superusers decide any"""
+    return user.is_superuser or (
+        item_request.department_id is not None and item_request.department.manager_id == user.pk
+    )
+
+
+def decide_requests(user, request_ids, approve=True, reason=''):
+    """
+    Approve, or reject with reason, every request in request_ids that user may
+    decide and that is still pending.
+
+    Headers are locked in id order; the decided ones are updated with one
+    UPDATE, and on approval their lines get quantity_approved =
+    quantity_requested with another. An approval reserves its lines' stock,
+    so a request is only approved while every product still has enough
+    available to promise. Returns a Decision per id, in id order.
+    """
+    if not approve and not reason:
+        raise ValueError('Please provide a reason for rejection.')
+    verb = 'approve' if approve else 'reject'
+    ids = sorted(set(request_ids))
+
+    with transaction.atomic():
+        found = {
+            item_request.pk: item_request
+            for item_request in ItemRequest.objects.select_for_update(of=('self',))
+            .select_related('department')
+            .only('id', 'request_number', 'status', 'department__manager')
+            .filter(pk__in=ids)
+            .order_by('pk')
+        }
+
+        decisions, decided = [], []
+        for pk in ids:
+            item_request = found.get(pk)
+            if item_request is None:
+                decisions.append(Decision(pk, None, False, 'Request not found.'))
+            elif not can_decide(user, item_request):
+                decisions.append(Decision(pk, item_request.request_number, False,
+                                          f'You do not have permission to {verb} this request.'))
+            elif item_request.status != 'pending':
+                decisions.append(Decision(pk, item_request.request_number, False,
+                                          f'Only pending requests can be {verb}d.'))
+            else:
+                decided.append(item_request)
+                decisions.append(Decision(pk, item_request.request_number, True, f'{verb.capitalize()}d.'))
+
+        if approve and decided:
+            decided = _reserve_for(decided, decisions)
+
+        if decided:
+            now = timezone.now()
+            status = 'approved' if approve else 'rejected'
+            changes = {'status': status, 'approved_by': user, 'approved_date': now, 'updated_at': now}
+            if not approve:
+                changes['rejection_reason'] = reason
+            decided_ids = [item_request.pk for item_request in decided]
+            ItemRequest.objects.filter(pk__in=decided_ids).update(**changes)
+            if approve:
+                ItemRequestLine.objects.filter(item_request_id__in=decided_ids).update(
+                    quantity_approved=F('quantity_requested'),
+                )
+            for item_request in decided:
+                item_request.status = status
+            stats.updated_in_bulk(decided)
+
+    return decisions
+
+
+def _reserve_for(candidates, decisions):
+    """
+    Reserve stock for the requests being approved, first come first served
+    in id order; a request whose lines no longer fit the products' available
+    quantity is turned into a failed Decision. Returns the requests that fit.
+    """
+    wanted = defaultdict(dict)
+    for request_id, product_id, quantity in ItemRequestLine.objects.filter(
+        item_request_id__in=[item_request.pk for item_request in candidates],
+    ).values_list('item_request_id', 'product_id', 'quantity_requested'):
+        wanted[request_id][product_id] = wanted[request_id].get(product_id, 0) + quantity
+
+    product_ids = {product_id for lines in wanted.values() for product_id in lines}
+    available, names = {}, {}
+    for product_id, name, quantity in (
+        Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk')
+        .values_list('pk', 'name', 'available_quantity')
+    ):
+        available[product_id], names[product_id] = quantity, name
+
+    by_id = {decision.request_id: decision for decision in decisions}
+    approved, reserved = [], defaultdict(int)
+    for item_request in candidates:
+        lines = wanted.get(item_request.pk, {})
+        short = next((pk for pk, quantity in lines.items() if quantity > available[pk]), None)
+        if short is not None:
+            decision = by_id[item_request.pk]
+            decision.ok = False
+            decision.message = f'Only {max(available[short], 0)} of {names[short]} available to promise.'
+            continue
+        for product_id, quantity in lines.items():
+            available[product_id] -= quantity
+            reserved[product_id] += quantity
+        approved.append(item_request)
+
+    reserve(reserved)
+    return approved
+
+
+def cancel_requests(user, request_ids):
+    """
+    Cancel every request in request_ids that user may decide and that has not
+    been completed, rejected or cancelled, releasing the stock its open lines
+    hold. Returns a Decision per id, in id order.
+    """
+    ids = sorted(set(request_ids))
+    cancellable = ('pending',) + RESERVING_STATUSES
+
+    with transaction.atomic():
+        found = {
+            item_request.pk: item_request
+            for item_request in ItemRequest.objects.select_for_update(of=('self',))
+            .select_related('department')
+            .only('id', 'request_number', 'status', 'department__manager')
+            .filter(pk__in=ids)
+            .order_by('pk')
+        }
+
+        decisions, cancelled = [], []
+        for pk in ids:
+            item_request = found.get(pk)
+            if item_request is None:
+                decisions.append(Decision(pk, None, False, 'Request not found.'))
+            elif not can_decide(user, item_request):
+                decisions.append(Decision(pk, item_request.request_number, False,
+                                          'You do not have permission to cancel this request.'))
+            elif item_request.status not in cancellable:
+                decisions.append(Decision(pk, item_request.request_number, False,
+                                          f'A {item_request.get_status_display().lower()} request cannot be cancelled.'))
+            else:
+                cancelled.append(item_request)
+                decisions.append(Decision(pk, item_request.request_number, True, 'Cancelled.'))
+
+        if cancelled:
+            holding = [item_request.pk for item_request in cancelled if item_request.status in RESERVING_STATUSES]
+            if holding:
+                amounts = open_quantities(holding)
+                # Products are locked in id order, as issuing does
+                list(Product.objects.select_for_update().filter(pk__in=amounts).order_by('pk').values_list('pk'))
+                release(amounts)
+            ItemRequest.objects.filter(pk__in=[item_request.pk for item_request in cancelled]).update(
+                status='cancelled', updated_at=timezone.now(),
+            )
+            for item_request in cancelled:
+                item_request.status = 'cancelled'
+            stats.updated_in_bulk(cancelled)
+
+    return decisions
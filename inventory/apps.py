@@ -1,6 +1,47 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_migrate, post_save, pre_save
+
+
+def _install_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from .search import install_search_index
+
+    install_search_index(connections[using])
 
 
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        post_migrate.connect(_install_search_index, sender=self)
+
+        from .instrumentation import install
+        connection_created.connect(install)
+
+        from django.contrib.auth.models import Group, User
+        from .models import PurchaseOrderItem, QuotationItem
+        from .caching import WATCHED_MODELS, model_changed
+        from . import stats
+        from .roles import group_changed, membership_changed
+        from . import reference  # noqa: F401 - declares the cached values, filling WATCHED_MODELS
+        from .totals import line_changed
+
+        m2m_changed.connect(membership_changed, sender=User.groups.through)
+        post_save.connect(group_changed, sender=Group)
+        post_delete.connect(group_changed, sender=Group)
+
+        for line_model in (PurchaseOrderItem, QuotationItem):
+            post_save.connect(line_changed, sender=line_model)
+            post_delete.connect(line_changed, sender=line_model)
+
+        for model in WATCHED_MODELS:
+            post_save.connect(model_changed, sender=model)
+            post_delete.connect(model_changed, sender=model)
+
+        for model in stats.COUNTED_MODELS:
+            post_init.connect(stats.loaded, sender=model)
+            pre_save.connect(stats.saving, sender=model)
+            post_save.connect(stats.saved, sender=model)
+            post_delete.connect(stats.deleted, sender=model)
@@ -0,0 +1,503 @@
+"""
+Synthetic data generation and per-route benchmarks
+"""
+import asyncio
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+import django
+from asgiref.sync import ThreadSensitiveContext, async_to_sync, iscoroutinefunction, sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, connections, reset_queries, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .models import (
+    UnitOfMeasure, StorageLocation, Product, StockBalance, StockMovement,
+    Department, Site, Currency, Vendor, VendorProduct,
+    PurchaseOrder, PurchaseOrderItem, Quotation, QuotationItem, Receiving,
+    ItemRequest, ItemRequestLine, ItemIssuance, ItemIssuanceLine, Transfer
+)
+from .caching import WATCHED_MODELS, invalidate
+from .reservations import refresh_reservations
+from .stats import rebuild_counters
+from .totals import refresh_totals
+from .utils import _highest_used, advance_counter, allocate_issue_numbers, allocate_numbers, allocate_product_skus
+
+
+SIZES = (1000, 10000, 100000)
+BATCH_SIZE = 2000
+DOCUMENT_CHUNK = 5000
+
+ADJECTIVES = ['Hex', 'Steel', 'Brass', 'Nylon', 'Galvanized', 'Heavy Duty', 'Stainless', 'Copper', 'PVC', 'Rubber']
+NOUNS = ['Bolt', 'Nut', 'Washer', 'Bracket', 'Hinge', 'Cable', 'Pipe', 'Valve', 'Filter', 'Bearing',
+         'Gasket', 'Clamp', 'Fuse', 'Switch', 'Hose', 'Spring', 'Screw', 'Anchor', 'Coupling', 'Seal']
+UNITS = [('Each', 'ea'), ('Box', 'bx'), ('Kilogram', 'kg'), ('Meter', 'm'), ('Liter', 'L'), ('Pack', 'pk')]
+CURRENCIES = [('USD', 'US Dollar', '$'), ('EUR', 'Euro', '€'), ('GBP', 'British Pound', '£')]
+
+
+# ==================== Data Generation ====================
+
+def _bulk(model, objects):
+    return model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _reuse_or_create(model, key, objects):
+    """Bulk-create the objects whose unique `key` is not taken yet; rows already there are reused in their place"""
+    existing = model.objects.in_bulk([getattr(obj, key) for obj in objects], field_name=key)
+    _bulk(model, [obj for obj in objects if getattr(obj, key) not in existing])
+    return [existing.get(getattr(obj, key), obj) for obj in objects]
+
+
+def _allocate(model, field, prefix, count):
+    """First of `count` numbers allocated from the prefix's counter, as the app's own documents are"""
+    if not count:
+        return 1
+    return allocate_numbers(prefix, count, seed=lambda: _highest_used(model, field, prefix))
+
+
+def seed_data(size, seed=0, log=None):
+    """
+    Generate a warehouse with `size` products and proportional documents.
+
+    Roughly: size/2 requests (1-4 lines), size/10 issuances, size/5 purchase
+    orders (1-5 lines), size/10 quotations and size/5 transfers. Everything
+    is written with bulk_create in batches. Reference rows (users, sites,
+    departments, locations, vendors) are reused when they already exist,
+    and SKUs and document numbers come from the document counters, so
+    seeding again adds another batch alongside the data already there.
+    Returns the row counts per model.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+    year = datetime.now().year
+
+    def recent(days=365):
+        return now - timedelta(days=rng.random() * days)
+
+    # Reference data
+    users = _reuse_or_create(User, 'username', [
+        User(username=f'bench_user_{n:03d}', first_name='Bench', last_name=f'User {n}',
+             password=make_password(None))
+        for n in range(1, 26)
+    ])
+    units = [UnitOfMeasure.objects.get_or_create(name=name, defaults={'abbreviation': abbr})[0] for name, abbr in UNITS]
+    currencies = [
+        Currency.objects.get_or_create(code=code, defaults={'name': name, 'symbol': symbol})[0]
+        for code, name, symbol in CURRENCIES
+    ]
+    departments = _reuse_or_create(Department, 'code', [
+        Department(name=f'Department {n:02d}', code=f'D{n:02d}', manager=rng.choice(users)) for n in range(1, 13)
+    ])
+    sites = _reuse_or_create(Site, 'code', [Site(name=f'Site {n:02d}', code=f'S{n:02d}') for n in range(1, 16)])
+
+    location_count = max(20, size // 50)
+    locations = _reuse_or_create(StorageLocation, 'code', [
+        StorageLocation(name=f'Bin {code}', code=code, zone=chr(65 + n // 100 % 26),
+                        aisle=n % 100 // 10 + 1, bay=n % 10 + 1, level=n // 2600 + 1)
+        for n, code in ((n, f'{chr(65 + n // 100 % 26)}{n // 2600:02d}-{n % 100:02d}') for n in range(location_count))
+    ])
+    vendors = _reuse_or_create(Vendor, 'code', [
+        Vendor(name=f'Vendor {n:05d}', code=f'VEN-{n:04d}', currency=rng.choice(currencies),
+               payment_terms=rng.choice(['Net 30', 'Net 60', 'COD']))
+        for n in range(1, max(10, size // 100) + 1)
+    ])
+    advance_counter('VEN-', len(vendors), seed=lambda: _highest_used(Vendor, 'code', 'VEN-'))
+    log(f'  reference data: {len(users)} users, {len(locations)} locations, {len(vendors)} vendors')
+
+    # Products, with a balance and an opening movement per product
+    product_ids = []
+    skus = allocate_product_skus(size)
+    for start in range(0, size, DOCUMENT_CHUNK):
+        products = []
+        for n in range(start + 1, min(size, start + DOCUMENT_CHUNK) + 1):
+            products.append(Product(
+                name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} M{rng.randint(3, 24)}x{rng.randint(10, 200)}',
+                description=f'Synthetic benchmark item {n}',
+                sku=skus[n - 1],
+                quantity=rng.randint(0, 500),
+                min_quantity=rng.randint(5, 50),
+                location=rng.choice(locations),
+                unit_of_measure=rng.choice(units),
+                unit_price=Decimal(rng.randint(50, 50000)) / 100,
+                created_by=rng.choice(users),
+            ))
+        _bulk(Product, products)
+        stocked = [product for product in products if product.quantity]
+        _bulk(StockBalance, [
+            StockBalance(product=product, location_id=product.location_id, quantity=product.quantity)
+            for product in stocked
+        ])
+        _bulk(StockMovement, [
+            StockMovement(product=product, movement_type='opening', quantity_change=product.quantity,
+                          location_id=product.location_id, reference=product.sku, created_at=recent(400))
+            for product in stocked
+        ])
+        product_ids.extend(product.pk for product in products)
+    log(f'  {size} products')
+
+    _bulk(VendorProduct, [
+        VendorProduct(vendor=rng.choice(vendors), product_id=product_id, unit_price=Decimal(rng.randint(50, 40000)) / 100,
+                      currency=rng.choice(currencies), lead_time_days=rng.randint(1, 30))
+        for product_id in rng.sample(product_ids, size // 2)
+    ])
+
+    # Requests and issuances
+    request_count = size // 2
+    first_request = _allocate(ItemRequest, 'request_number', f'REQ-{year}-', request_count)
+    issuance_count = 0
+    for start in range(0, request_count, DOCUMENT_CHUNK):
+        requests = _bulk(ItemRequest, [
+            ItemRequest(
+                request_number=f'REQ-{year}-{first_request + n - 1:04d}',
+                requested_by=rng.choice(users),
+                department=rng.choice(departments),
+                priority=_weighted(rng, [('low', 2), ('medium', 5), ('high', 2), ('urgent', 1)]),
+                status=_weighted(rng, [('pending', 3), ('approved', 3), ('rejected', 1), ('issued', 1), ('completed', 2)]),
+                purpose='Benchmark request',
+                requested_date=recent(),
+            )
+            for n in range(start + 1, min(request_count, start + DOCUMENT_CHUNK) + 1)
+        ])
+        lines = []
+        for item_request in requests:
+            for _ in range(rng.randint(1, 4)):
+                requested = rng.randint(1, 20)
+                approved = requested if item_request.status in ('approved', 'issued', 'completed') else 0
+                issued = approved if item_request.status == 'completed' else (
+                    approved // 2 if item_request.status == 'issued' else 0)
+                lines.append(ItemRequestLine(
+                    item_request=item_request, product_id=rng.choice(product_ids), quantity_requested=requested,
+                    quantity_approved=approved, quantity_issued=issued, destination_site=rng.choice(sites),
+                ))
+        _bulk(ItemRequestLine, lines)
+
+        issued_requests = [item_request for item_request in requests if item_request.status in ('issued', 'completed')]
+        issuances = []
+        for item_request, issue_number in zip(issued_requests, allocate_issue_numbers(len(issued_requests))):
+            issuances.append(ItemIssuance(
+                item_request=item_request, issue_number=issue_number,
+                issued_by=rng.choice(users), issued_to=item_request.requested_by,
+                issued_date=item_request.requested_date + timedelta(days=rng.randint(0, 5)), status='completed',
+            ))
+        _bulk(ItemIssuance, issuances)
+        issuance_count += len(issuances)
+        by_request = {issuance.item_request_id: issuance for issuance in issuances}
+        _bulk(ItemIssuanceLine, [
+            ItemIssuanceLine(issuance=by_request[line.item_request_id], request_line=line,
+                             quantity_issued=line.quantity_issued)
+            for line in lines
+            if line.quantity_issued and line.item_request_id in by_request
+        ])
+    refresh_reservations()
+    log(f'  {request_count} requests, {issuance_count} issuances')
+
+    # Purchase orders and quotations
+    po_count = size // 5
+    first_po = _allocate(PurchaseOrder, 'po_number', 'PO', po_count)
+    for start in range(0, po_count, DOCUMENT_CHUNK):
+        orders = _bulk(PurchaseOrder, [
+            PurchaseOrder(
+                po_number=f'PO{first_po + n - 1:06d}', vendor=rng.choice(vendors), currency=rng.choice(currencies),
+                status=_weighted(rng, [('draft', 2), ('submitted', 2), ('approved', 2), ('ordered', 2),
+                                       ('partially_received', 1), ('received', 3), ('cancelled', 1)]),
+                order_date=recent().date(), created_by=rng.choice(users),
+            )
+            for n in range(start + 1, min(po_count, start + DOCUMENT_CHUNK) + 1)
+        ])
+        _bulk(PurchaseOrderItem, [
+            PurchaseOrderItem(purchase_order=order, product_id=rng.choice(product_ids),
+                              quantity_ordered=rng.randint(1, 200), unit_price=Decimal(rng.randint(50, 40000)) / 100)
+            for order in orders
+            for _ in range(rng.randint(1, 5))
+        ])
+
+    quotation_count = size // 10
+    first_quotation = _allocate(Quotation, 'quotation_number', f'QTN-{year}-', quotation_count)
+    for start in range(0, quotation_count, DOCUMENT_CHUNK):
+        quotations = _bulk(Quotation, [
+            Quotation(
+                quotation_number=f'QTN-{year}-{first_quotation + n - 1:04d}', vendor=rng.choice(vendors), currency=rng.choice(currencies),
+                status=_weighted(rng, [('draft', 2), ('sent', 2), ('received', 2), ('accepted', 2),
+                                       ('rejected', 1), ('expired', 1)]),
+                request_date=recent().date(), created_by=rng.choice(users),
+            )
+            for n in range(start + 1, min(quotation_count, start + DOCUMENT_CHUNK) + 1)
+        ])
+        _bulk(QuotationItem, [
+            QuotationItem(quotation=quotation, product_id=rng.choice(product_ids), quantity=rng.randint(1, 200),
+                          unit_price=Decimal(rng.randint(50, 40000)) / 100)
+            for quotation in quotations
+            for _ in range(rng.randint(1, 5))
+        ])
+    refresh_totals(PurchaseOrder)
+    refresh_totals(Quotation)
+    log(f'  {po_count} purchase orders, {quotation_count} quotations')
+
+    # Transfers
+    transfer_count = size // 5
+    first_transfer = _allocate(Transfer, 'transfer_number', f'TRF-{year}-', transfer_count)
+    for start in range(0, transfer_count, DOCUMENT_CHUNK):
+        transfers = []
+        for n in range(start + 1, min(transfer_count, start + DOCUMENT_CHUNK) + 1):
+            from_location, to_location = rng.sample(locations, 2)
+            status = _weighted(rng, [('pending', 2), ('completed', 7), ('cancelled', 1)])
+            transfers.append(Transfer(
+                transfer_number=f'TRF-{year}-{first_transfer + n - 1:04d}', product_id=rng.choice(product_ids),
+                quantity=rng.randint(1, 50), from_location=from_location, to_location=to_location,
+                status=status, requested_by=rng.choice(users),
+                transferred_by=rng.choice(users) if status == 'completed' else None,
+                transfer_date=recent() if status == 'completed' else None,
+            ))
+        _bulk(Transfer, transfers)
+    log(f'  {transfer_count} transfers')
+    # Everything above was bulk-inserted without signals
+    invalidate(*WATCHED_MODELS)
+    rebuild_counters()
+
+    return {
+        model._meta.label: model.objects.count()
+        for model in (Product, StockBalance, StockMovement, Vendor, ItemRequest, ItemRequestLine,
+                      ItemIssuance, ItemIssuanceLine, PurchaseOrder, PurchaseOrderItem,
+                      Quotation, QuotationItem, Transfer)
+    }
+
+
+# ==================== Routes ====================
+
+def _first_id(queryset):
+    return queryset.order_by('id').values_list('id', flat=True).first()
+
+
+# URL kwarg -> callable returning a value to benchmark with
+ROUTE_ARGUMENTS = {
+    'request_id': lambda: _first_id(ItemRequest.objects.filter(status='approved')),
+    'product_id': lambda: _first_id(Product.objects.all()),
+    'vendor_id': lambda: _first_id(Vendor.objects.all()),
+    'po_id': lambda: _first_id(PurchaseOrder.objects.all()),
+    'quotation_id': lambda: _first_id(Quotation.objects.all()),
+    'issuance_id': lambda: _first_id(ItemIssuance.objects.all()),
+    'transfer_id': lambda: _first_id(Transfer.objects.filter(status='pending')),
+    'receiving_id': lambda: _first_id(Receiving.objects.all()),
+}
+
+# Routes that need a query string to do meaningful work
+ROUTE_QUERIES = {
+    'product_search': lambda: 'q=steel bolt',
+    'stock_lookup': lambda: 'location=' + (StorageLocation.objects.order_by('id').values_list('code', flat=True).first() or ''),
+    'issuance_pick_list': lambda: '&'.join(
+        f'request_ids={pk}' for pk in ItemRequest.objects.filter(status='approved').values_list('id', flat=True)[:50]
+    ),
+}
+
+
+def route_cases():
+    """(label, url) for every named route in inventory/urls.py; export and API routes once per dataset/resource"""
+    from . import urls
+    from .api import RESOURCES
+    from .exports import DATASETS
+
+    cases = []
+    for pattern in urls.urlpatterns:
+        name = pattern.name
+        params = list(pattern.pattern.converters)
+        if params == ['dataset']:
+            for dataset in DATASETS:
+                cases.append((f'{name}:{dataset}', reverse(name, kwargs={'dataset': dataset})))
+            continue
+        if params[:1] == ['resource']:
+            for resource, api_resource in RESOURCES.items():
+                kwargs = {'resource': resource}
+                if 'pk' in params:
+                    kwargs['pk'] = _first_id(api_resource.queryset())
+                label = f'{name}:{resource}'
+                cases.append((label, reverse(name, kwargs=kwargs) if kwargs.get('pk', 0) is not None else None))
+            continue
+
+        kwargs = {param: ROUTE_ARGUMENTS[param]() if param in ROUTE_ARGUMENTS else None for param in params}
+        if any(value is None for value in kwargs.values()):
+            cases.append((name, None))
+            continue
+        url = reverse(name, kwargs=kwargs)
+        if name in ROUTE_QUERIES:
+            url = f'{url}?{ROUTE_QUERIES[name]()}'
+        cases.append((name, url))
+    return cases
+
+
+# ==================== Measurement ====================
+
+def _get(client, url):
+    """GET inside a rolled-back transaction, so routes that write on GET leave the data untouched"""
+    with transaction.atomic():
+        response = client.get(url)
+        if response.streaming:
+            for _chunk in response.streaming_content:
+                pass
+        transaction.set_rollback(True)
+    return response
+
+
+def measure_route(client, user, url, repeat):
+    """Latency over `repeat` runs after a warm-up, plus query count and peak Python memory of one run"""
+    # Logging in again before every request keeps routes like logout from affecting the ones after them
+    try:
+        client.force_login(user)
+        response = _get(client, url)
+
+        client.force_login(user)
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            try:
+                _get(client, url)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        # Read the count now: the next request's request_started signal clears the query log
+        query_count = len(queries)
+
+        timings = []
+        for _ in range(repeat):
+            client.force_login(user)
+            start = time.perf_counter()
+            _get(client, url)
+            timings.append((time.perf_counter() - start) * 1000)
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+
+    timings.sort()
+    return {
+        'status': response.status_code,
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        'min_ms': round(timings[0], 2),
+        'queries': query_count,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def is_async_route(url):
+    return iscoroutinefunction(resolve(urlsplit(url).path).func)
+
+
+async def _concurrent_gets(client, url, concurrency):
+    async def get():
+        # One context per request, as ASGIHandler does, so each gets its own thread for ORM calls
+        async with ThreadSensitiveContext():
+            try:
+                return (await client.get(url)).status_code
+            finally:
+                await sync_to_async(connections.close_all)()
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(get() for _ in range(concurrency)))
+    return (time.perf_counter() - start) * 1000, statuses
+
+
+def measure_concurrency(user, url, concurrency):
+    """Wall time for `concurrency` simultaneous GETs of an async route, served from one event loop"""
+    client = AsyncClient(raise_request_exception=False)
+    client.force_login(user)
+    try:
+        elapsed, statuses = async_to_sync(_concurrent_gets)(client, url, concurrency)
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+    return {
+        'requests': concurrency,
+        'wall_ms': round(elapsed, 2),
+        'per_second': round(concurrency / elapsed * 1000, 1),
+        'failed': sum(status != 200 for status in statuses),
+    }
+
+
+def benchmark_routes(repeat=5, log=None, concurrency=0):
+    """
+    Log in as a superuser and measure every route against the current database;
+    with concurrency, async routes are also hit by that many simultaneous requests
+    """
+    log = log or (lambda message: None)
+    request_logger = logging.getLogger('django.request')
+    previous_level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        return _benchmark_routes(repeat, log, concurrency)
+    finally:
+        request_logger.setLevel(previous_level)
+
+
+def _benchmark_routes(repeat, log, concurrency):
+    user, _ = User.objects.get_or_create(username='bench_admin', defaults={'is_superuser': True, 'is_staff': True})
+    # Broken routes are recorded as 500s rather than aborting the run
+    client = Client(raise_request_exception=False)
+
+    results = {}
+    for label, url in route_cases():
+        if url is None:
+            results[label] = {'skipped': 'no matching object in the dataset'}
+            continue
+        results[label] = {'url': url, **measure_route(client, user, url, repeat)}
+        summary = results[label]
+        if 'error' in summary:
+            log(f'  {label:<32} ERROR {summary["error"]}')
+        else:
+            log(f'  {label:<32} {summary["status"]}  {summary["median_ms"]:>9.1f} ms  '
+                f'{summary["queries"]:>4} queries  {summary["peak_memory_kb"]:>9.1f} KB')
+        if concurrency and 'error' not in summary and is_async_route(url):
+            summary['concurrent'] = concurrent = measure_concurrency(user, url, concurrency)
+            if 'error' in concurrent:
+                log(f'  {"":<32} concurrent ERROR {concurrent["error"]}')
+            else:
+                log(f'  {"":<32} {concurrent["requests"]} concurrent in {concurrent["wall_ms"]:.1f} ms '
+                    f'({concurrent["per_second"]:.0f}/s, {concurrent["failed"]} failed)')
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ''
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'git_commit': commit,
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+    }
+
+
+def compare(results, baseline):
+    """Yield (size, route, metric, before, after) for every metric present in both result files"""
+    for size, current in results.get('sizes', {}).items():
+        previous = baseline.get('sizes', {}).get(size)
+        if not previous:
+            continue
+        for route, metrics in current['routes'].items():
+            before = previous['routes'].get(route, {})
+            for metric in ('median_ms', 'queries', 'peak_memory_kb'):
+                if metric in metrics and metric in before:
+                    yield size, route, metric, before[metric], metrics[metric]
+
+
+def write_results(results, path):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
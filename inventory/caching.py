@@ -0,0 +1,113 @@
+"""
+Application cache - expensive computations kept under keys that change whenever
+a model they read from changes, with single-flight recomputation
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+MISSING = object()
+
+# Every model some CachedValue depends on; apps.py connects the signals for these
+WATCHED_MODELS = set()
+
+
+def _generation_key(model):
+    return f'inventory:gen:{model._meta.label_lower}'
+
+
+def generations(models):
+    """Current generation number of each model, starting unseen models at 1"""
+    keys = [_generation_key(model) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, 1, None)
+            found[key] = cache.get(key, 1)
+    return [found[key] for key in keys]
+
+
+def invalidate(*models):
+    """
+    Move the given models to a new generation, orphaning every cached value
+    that read from them. Deferred until commit so a concurrent reader cannot
+    cache the old data under the new generation.
+    """
+    def bump():
+        for model in models:
+            key = _generation_key(model)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 2, None)
+    transaction.on_commit(bump)
+
+
+def model_changed(sender, **kwargs):
+    """post_save / post_delete handler for watched models"""
+    invalidate(sender)
+
+
+class CachedValue:
+    """
+    A computation cached until one of its models changes or timeout passes.
+
+    After an invalidation only one caller recomputes: it takes a short lock
+    with cache.add(), and the others are served the previous value while it
+    works, or wait for the new one if there is no previous value.
+    """
+
+    lock_timeout = 30
+    wait_interval = 0.05
+
+    def __init__(self, name, compute, depends_on, timeout=None):
+        self.name = name
+        self.compute = compute
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        WATCHED_MODELS.update(self.depends_on)
+
+    def _timeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        return getattr(settings, 'APP_CACHE_TIMEOUT', 300)
+
+    def key(self, *args):
+        parts = [self.name, *map(str, args), *map(str, generations(self.depends_on))]
+        return 'inventory:cache:' + ':'.join(parts)
+
+    def get(self, *args):
+        key = self.key(*args)
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        latest_key = f'inventory:cache:{self.name}:latest:' + ':'.join(map(str, args))
+        lock_key = f'{key}:lock'
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, self.lock_timeout):
+            try:
+                value = self.compute(*args)
+                cache.set_many({key: value, latest_key: value}, self._timeout())
+            finally:
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+            return value
+
+        # Someone else is recomputing: serve the previous value if there is one
+        value = cache.get(latest_key, MISSING)
+        if value is not MISSING:
+            return value
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.wait_interval)
+            value = cache.get(key, MISSING)
+            if value is not MISSING:
+                return value
+            if cache.get(lock_key) is None:
+                break
+        return self.compute(*args)
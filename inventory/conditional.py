@@ -0,0 +1,151 @@
+"""
+Conditional GET - ETag / Last-Modified validators for detail pages and API records,
+checked with one small query before anything is loaded or rendered
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import ItemIssuance, ItemRequest, Product, PurchaseOrder, Quotation, Transfer, Vendor
+from .roles import user_roles
+
+
+class Version:
+    """
+    What a rendered document depends on.
+
+    stamps are timestamp lookups on the document itself (its own updated_at
+    and those of related rows shown with it). children names one reverse
+    relation whose row count, highest id and latest related timestamps are
+    folded in, so added or deleted lines change the version even where the
+    writer did not touch the parent.
+    """
+
+    def __init__(self, model, stamps=('updated_at',), children=None, child_stamps=()):
+        self.model = model
+        self.stamps = stamps
+        self.children = children
+        self.child_stamps = child_stamps
+
+    def current(self, pk):
+        """The document's version as a tuple of values, or None if it does not exist"""
+        # One aggregate row: MAX() of a single document's column is just its value
+        aggregates = {'found': Count('pk', distinct=True)}
+        for index, stamp in enumerate(self.stamps):
+            aggregates[f'stamp_{index}'] = Max(stamp)
+        if self.children:
+            aggregates['child_count'] = Count(self.children)
+            aggregates['child_max_id'] = Max(f'{self.children}__id')
+            for index, stamp in enumerate(self.child_stamps):
+                aggregates[f'child_stamp_{index}'] = Max(f'{self.children}__{stamp}')
+        row = self.model.objects.filter(pk=pk).aggregate(**aggregates)
+        if not row.pop('found'):
+            return None
+        return tuple(row.values())
+
+
+PURCHASE_ORDER = Version(PurchaseOrder, ('updated_at', 'vendor__updated_at'), 'items', ('product__updated_at',))
+QUOTATION = Version(Quotation, ('updated_at', 'vendor__updated_at'), 'items', ('product__updated_at',))
+ITEM_REQUEST = Version(ItemRequest, ('updated_at',), 'items', ('product__updated_at',))
+ISSUANCE = Version(ItemIssuance, ('created_at', 'item_request__updated_at'), 'lines')
+TRANSFER = Version(Transfer, ('updated_at', 'product__updated_at'))
+PRODUCT = Version(Product)
+VENDOR = Version(Vendor)
+
+
+def validators(request, values):
+    """
+    (etag, last_modified) for a version as seen by this request's user.
+
+    Pages carry the user's name, role-dependent buttons and a CSRF token, so
+    the user, their roles and their CSRF secret are part of the ETag. The
+    secret is created here if needed, so the first page and the ones after
+    it are fingerprinted with the same value.
+    """
+    user = request.user
+    get_token(request)
+    seed = repr((
+        values,
+        user.pk,
+        sorted(user_roles(user)),
+        request.META.get('CSRF_COOKIE'),
+        request.GET.urlencode(),
+    ))
+    etag = 'W/' + quote_etag(hashlib.md5(seed.encode(), usedforsecurity=False).hexdigest())
+
+    stamps = [value for value in values if isinstance(value, datetime)]
+    if user.is_authenticated and user.last_login:
+        stamps.append(user.last_login)
+    last_modified = max(stamps).timestamp() if stamps else None
+    return etag, last_modified
+
+
+def check(request, version, pk):
+    """
+    (304 response or None, etag, last_modified), or None when the request
+    should simply be answered in full.
+
+    Requests with flash messages waiting are always rendered in full and are
+    not given validators, so a page showing a message is never revalidated.
+    """
+    if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+        return None
+    values = version.current(pk)
+    if values is None:
+        return None
+    etag, last_modified = validators(request, values)
+    return get_conditional_response(request, etag=etag, last_modified=last_modified), etag, last_modified
+
+
+def conditional_response(request, version, pk, respond):
+    """Answer 304 when the client's copy is current, otherwise call respond() and mark the response"""
+    state = check(request, version, pk)
+    if state is None:
+        return respond()
+    response, etag, last_modified = state
+    if response is None:
+        response = respond()
+        if response.status_code != 200:
+            return response
+    return mark(response, etag, last_modified)
+
+
+async def aconditional_response(request, version, pk, respond):
+    """conditional_response() for async views; respond is a coroutine function"""
+    state = await sync_to_async(check)(request, version, pk)
+    if state is None:
+        return await respond()
+    response, etag, last_modified = state
+    if response is None:
+        response = await respond()
+        if response.status_code != 200:
+            return response
+    return mark(response, etag, last_modified)
+
+
+def mark(response, etag, last_modified):
+    response.headers.setdefault('ETag', etag)
+    if last_modified is not None:
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    # Always revalidate, and never let a shared cache keep a per-user page
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional(version, pk_argument):
+    """View decorator: conditional GET for a detail view keyed by the pk_argument URL kwarg"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return conditional_response(
+                request, version, kwargs[pk_argument], lambda: view(request, *args, **kwargs),
+            )
+        return wrapper
+    return decorator
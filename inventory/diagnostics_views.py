@@ -0,0 +1,31 @@
+"""
+Diagnostics Views - per-view SQL query summary
+"""
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render, redirect
+
+from .instrumentation import query_log
+from . import roles
+
+
+@login_required
+def query_summary(request):
+    """Rolling per-view query counts and DB time recorded by the instrumentation middleware"""
+    can_view = roles.can_view_diagnostics(request.user)
+
+    if not can_view:
+        messages.error(request, 'You do not have permission to view diagnostics.')
+        return redirect('dashboard')
+
+    if request.method == 'POST':
+        query_log.clear()
+        messages.success(request, 'Query statistics cleared.')
+        return redirect('query_summary')
+
+    context = {
+        'rows': query_log.summary(),
+        'window': query_log.window,
+        'page_title': 'Query Summary',
+    }
+    return render(request, 'diagnostics/query_summary.html', context)
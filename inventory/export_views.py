@@ -0,0 +1,43 @@
+"""
+Export Views - streaming CSV / NDJSON downloads
+"""
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.utils import timezone
+
+from .exports import DATASETS, stream_csv, stream_ndjson
+from .procurement_views import check_procurement_permission
+
+
+# Datasets that need procurement access on top of being logged in
+PROCUREMENT_DATASETS = {'purchase-orders'}
+
+FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8', 'csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson', 'ndjson'),
+}
+
+
+@login_required
+def export_dataset(request, dataset):
+    """Stream a full dataset export; memory stays flat regardless of row count"""
+    if dataset not in DATASETS:
+        raise Http404('Unknown export')
+
+    if dataset in PROCUREMENT_DATASETS and not check_procurement_permission(request.user):
+        messages.error(request, 'You do not have permission to export purchase orders.')
+        return redirect('dashboard')
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in FORMATS:
+        export_format = 'csv'
+    stream, content_type, extension = FORMATS[export_format]
+
+    response = StreamingHttpResponse(stream(DATASETS[dataset]), content_type=content_type)
+    filename = f'{dataset}-{timezone.now():%Y%m%d-%H%M%S}.{extension}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Ask reverse proxies (nginx) not to buffer, so the first rows reach the client immediately
+    response['X-Accel-Buffering'] = 'no'
+    return response
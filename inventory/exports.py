@@ -0,0 +1,182 @@
+"""
+Streaming CSV / NDJSON exports of inventory and documents
+"""
+import csv
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Product, ItemRequest, PurchaseOrder, Transfer
+
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() just returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+class Dataset:
+    """
+    An exportable dataset: a values() projection plus optional nesting.
+
+    header_fields are the document columns; line_fields (if any) come from a
+    reverse relation and produce one CSV row per line, or a nested "lines"
+    list per document in NDJSON.
+    """
+
+    def __init__(self, name, queryset, header_fields, line_fields=None, lines_key='lines'):
+        self.name = name
+        self.queryset = queryset
+        self.header_fields = header_fields
+        self.line_fields = line_fields or []
+        self.lines_key = lines_key
+
+    @property
+    def columns(self):
+        return [label for label, _lookup in self.header_fields + self.line_fields]
+
+    def _values(self):
+        lookups = [lookup for _label, lookup in self.header_fields + self.line_fields]
+        return self.queryset().values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+
+    def csv_rows(self):
+        yield self.columns
+        yield from self._values()
+
+    def ndjson_records(self):
+        header_labels = [label for label, _lookup in self.header_fields]
+        if not self.line_fields:
+            for row in self._values():
+                yield dict(zip(header_labels, row))
+            return
+
+        # Rows arrive ordered by document id, so each document's lines are contiguous
+        line_labels = [label for label, _lookup in self.line_fields]
+        split = len(header_labels)
+        for header, rows in groupby(self._values(), key=itemgetter(slice(0, split))):
+            record = dict(zip(header_labels, header))
+            record[self.lines_key] = [
+                dict(zip(line_labels, row[split:]))
+                for row in rows
+                if row[split] is not None
+            ]
+            yield record
+
+
+DATASETS = {
+    'products': Dataset(
+        'products',
+        lambda: Product.objects.order_by('id'),
+        [
+            ('id', 'id'),
+            ('sku', 'sku'),
+            ('name', 'name'),
+            ('description', 'description'),
+            ('quantity', 'quantity'),
+            ('min_quantity', 'min_quantity'),
+            ('unit_price', 'unit_price'),
+            ('unit_of_measure', 'unit_of_measure__abbreviation'),
+            ('location', 'location__code'),
+            ('created_at', 'created_at'),
+            ('updated_at', 'updated_at'),
+        ],
+    ),
+    'requests': Dataset(
+        'requests',
+        lambda: ItemRequest.objects.order_by('id', 'items__id'),
+        [
+            ('id', 'id'),
+            ('request_number', 'request_number'),
+            ('status', 'status'),
+            ('priority', 'priority'),
+            ('requested_by', 'requested_by__username'),
+            ('department', 'department__code'),
+            ('requested_date', 'requested_date'),
+            ('required_by_date', 'required_by_date'),
+            ('approved_by', 'approved_by__username'),
+            ('approved_date', 'approved_date'),
+            ('purpose', 'purpose'),
+        ],
+        [
+            ('line_id', 'items__id'),
+            ('product_sku', 'items__product__sku'),
+            ('product_name', 'items__product__name'),
+            ('quantity_requested', 'items__quantity_requested'),
+            ('quantity_approved', 'items__quantity_approved'),
+            ('quantity_issued', 'items__quantity_issued'),
+            ('destination_site', 'items__destination_site__code'),
+        ],
+    ),
+    'purchase-orders': Dataset(
+        'purchase-orders',
+        lambda: PurchaseOrder.objects.order_by('id', 'items__id'),
+        [
+            ('id', 'id'),
+            ('po_number', 'po_number'),
+            ('external_po_number', 'external_po_number'),
+            ('status', 'status'),
+            ('vendor_code', 'vendor__code'),
+            ('vendor_name', 'vendor__name'),
+            ('supplier_name', 'supplier_name'),
+            ('currency', 'currency__code'),
+            ('order_date', 'order_date'),
+            ('expected_delivery', 'expected_delivery'),
+            ('total_amount', 'total_amount'),
+            ('created_by', 'created_by__username'),
+        ],
+        [
+            ('line_id', 'items__id'),
+            ('product_sku', 'items__product__sku'),
+            ('product_name', 'items__product__name'),
+            ('quantity_ordered', 'items__quantity_ordered'),
+            ('quantity_received', 'items__quantity_received'),
+            ('unit_price', 'items__unit_price'),
+        ],
+        lines_key='items',
+    ),
+    'transfers': Dataset(
+        'transfers',
+        lambda: Transfer.objects.order_by('id'),
+        [
+            ('id', 'id'),
+            ('transfer_number', 'transfer_number'),
+            ('status', 'status'),
+            ('product_sku', 'product__sku'),
+            ('product_name', 'product__name'),
+            ('quantity', 'quantity'),
+            ('from_location', 'from_location__code'),
+            ('to_location', 'to_location__code'),
+            ('requested_by', 'requested_by__username'),
+            ('transferred_by', 'transferred_by__username'),
+            ('transfer_date', 'transfer_date'),
+            ('created_at', 'created_at'),
+        ],
+    ),
+}
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(dataset):
+    """Yield CSV text one row at a time"""
+    writer = csv.writer(Echo())
+    for row in dataset.csv_rows():
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def stream_ndjson(dataset):
+    """Yield one JSON document per line"""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for record in dataset.ndjson_records():
+        yield encoder.encode(record) + '\n'
@@ -32,12 +32,20 @@ class ItemRequestForm(forms.ModelForm):
         }
 
 
+class AvailableProductChoiceField(forms.ModelChoiceField):
+    """Product dropdown that shows what is still available to promise"""
+
+    def label_from_instance(self, obj):
+        return f"{obj} - {obj.available_quantity} available"
+
+
 class ItemRequestLineForm(forms.ModelForm):
     """Form for Item Request line items"""
 
     class Meta:
         model = ItemRequestLine
         fields = ['product', 'quantity_requested', 'destination_site', 'remarks']
+        field_classes = {'product': AvailableProductChoiceField}
         widgets = {
             'product': forms.Select(attrs={'class': 'form-control'}),
             'quantity_requested': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
@@ -45,6 +53,10 @@ class ItemRequestLineForm(forms.ModelForm):
             'remarks': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Optional remarks'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['product'].queryset = Product.objects.for_choices()
+
 
 # Formset for multiple line items
 ItemRequestLineFormSet = inlineformset_factory(
@@ -87,6 +99,10 @@ class PurchaseOrderItemForm(forms.ModelForm):
             'unit_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['product'].queryset = Product.objects.for_choices()
+
 
 PurchaseOrderItemFormSet = inlineformset_factory(
     PurchaseOrder,
@@ -0,0 +1,308 @@
+"""
+Streaming bulk product import from CSV or XLSX files
+"""
+import csv
+import io
+import time
+import zipfile
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import stats
+from .models import Product, StockBalance, StockMovement, StorageLocation, UnitOfMeasure
+from .stock import record_movements
+from .utils import allocate_product_skus, claim_product_skus
+
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+COLUMNS = ['name', 'description', 'quantity', 'min_quantity', 'unit_price', 'sku', 'location', 'unit_of_measure']
+REQUIRED_COLUMNS = ['name', 'description']
+
+SKU_MAX_LENGTH = Product._meta.get_field('sku').max_length
+# Largest value an IntegerField holds on every supported backend
+INTEGER_MAX = 2147483647
+PRICE_FIELD = Product._meta.get_field('unit_price')
+PRICE_LIMIT = Decimal(10) ** (PRICE_FIELD.max_digits - PRICE_FIELD.decimal_places)
+PRICE_STEP = Decimal(1).scaleb(-PRICE_FIELD.decimal_places)
+
+
+class ImportFileError(Exception):
+    """Raised when the file itself cannot be read (bad format, missing columns)"""
+
+
+class ImportResult:
+    """Running totals for an import, including per-row errors"""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+    def finish(self):
+        self.elapsed = time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+
+# ==================== Row Readers ====================
+
+def _normalize_header(header):
+    return [str(col or '').strip().lower().replace(' ', '_') for col in header]
+
+
+def _check_header(header):
+    missing = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing:
+        raise ImportFileError(f'Missing required column(s): {", ".join(missing)}')
+
+
+def iter_csv_rows(binary_file, encoding='utf-8-sig'):
+    """Yield (row_number, dict) from a binary CSV stream without reading it all into memory"""
+    text = io.TextIOWrapper(binary_file, encoding=encoding, newline='')
+    reader = csv.reader(text)
+    try:
+        header = _normalize_header(next(reader))
+    except StopIteration:
+        raise ImportFileError('File is empty')
+    except (UnicodeDecodeError, csv.Error):
+        raise ImportFileError('File is not a UTF-8 CSV file')
+    _check_header(header)
+    row_number = 1
+    try:
+        for row_number, values in enumerate(reader, start=2):
+            if not any(values):
+                continue
+            yield row_number, dict(zip(header, values))
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Rows before this one have already been imported
+        raise ImportFileError(f'Could not read the file after row {row_number}: {e}')
+
+
+def iter_xlsx_rows(binary_file):
+    """Yield (row_number, dict) from an XLSX workbook using openpyxl's read-only streaming mode"""
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ImportFileError('XLSX import requires the openpyxl package')
+
+    try:
+        workbook = load_workbook(binary_file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, OSError):
+        raise ImportFileError('File is not a valid XLSX workbook')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        try:
+            header = _normalize_header(next(rows))
+        except StopIteration:
+            raise ImportFileError('Workbook is empty')
+        _check_header(header)
+        for row_number, values in enumerate(rows, start=2):
+            if not any(value not in (None, '') for value in values):
+                continue
+            yield row_number, {
+                key: '' if value is None else str(value)
+                for key, value in zip(header, values)
+            }
+    finally:
+        workbook.close()
+
+
+def iter_rows(binary_file, filename):
+    """Pick a reader by file extension"""
+    name = (filename or '').lower()
+    if name.endswith('.xlsx'):
+        return iter_xlsx_rows(binary_file)
+    if name.endswith('.csv') or name.endswith('.txt'):
+        return iter_csv_rows(binary_file)
+    raise ImportFileError('Unsupported file type - upload a .csv or .xlsx file')
+
+
+# ==================== Import ====================
+
+def _int(value, field, default=None):
+    value = (value or '').strip()
+    if not value:
+        if default is None:
+            raise ValueError(f'{field} is required')
+        return default
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{field} must be a whole number')
+    # Spreadsheet cells arrive as "5.0"; fractions and exponents are rejected rather than rounded
+    if not number.is_finite() or number.as_tuple().exponent > 0 or number != number.to_integral_value():
+        raise ValueError(f'{field} must be a whole number')
+    if number < 0:
+        raise ValueError(f'{field} cannot be negative')
+    if number > INTEGER_MAX:
+        raise ValueError(f'{field} cannot be more than {INTEGER_MAX}')
+    return int(number)
+
+
+def _decimal(value, field):
+    value = (value or '').strip()
+    if not value:
+        return Decimal('0.00')
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{field} must be a number')
+    if not number.is_finite():
+        raise ValueError(f'{field} must be a number')
+    if number < 0:
+        raise ValueError(f'{field} cannot be negative')
+    # quantize() raises on values past the context precision, so only round ones that can fit
+    if number < PRICE_LIMIT:
+        number = number.quantize(PRICE_STEP)
+    if number >= PRICE_LIMIT:
+        raise ValueError(f'{field} must be less than {PRICE_LIMIT}')
+    return number
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _import_chunk(chunk, result, created_by, dry_run):
+    # One lookup per chunk for each reference table and for SKU collisions
+    location_codes = {row.get('location', '').strip() for _, row in chunk} - {''}
+    uom_keys = {row.get('unit_of_measure', '').strip() for _, row in chunk} - {''}
+    given_skus = [row.get('sku', '').strip() for _, row in chunk if row.get('sku', '').strip()]
+
+    locations = {
+        loc.code: loc.id
+        for loc in StorageLocation.objects.filter(code__in=location_codes).only('id', 'code')
+    } if location_codes else {}
+
+    uoms = {}
+    if uom_keys:
+        for uom in UnitOfMeasure.objects.filter(
+            Q(abbreviation__in=uom_keys) | Q(name__in=uom_keys)
+        ).only('id', 'name', 'abbreviation'):
+            uoms.setdefault(uom.abbreviation, uom.id)
+            uoms.setdefault(uom.name, uom.id)
+
+    taken_skus = set(
+        Product.objects.filter(sku__in=given_skus).values_list('sku', flat=True)
+    ) if given_skus else set()
+
+    products = []
+    needs_sku = []
+    for row_number, row in chunk:
+        result.rows_read += 1
+        try:
+            name = row.get('name', '').strip()
+            description = row.get('description', '').strip()
+            if not name:
+                raise ValueError('name is required')
+            if not description:
+                raise ValueError('description is required')
+
+            product = Product(
+                name=name[:255],
+                description=description,
+                quantity=_int(row.get('quantity'), 'quantity', default=0),
+                min_quantity=_int(row.get('min_quantity'), 'min_quantity', default=10),
+                unit_price=_decimal(row.get('unit_price'), 'unit_price'),
+                created_by=created_by,
+            )
+
+            sku = row.get('sku', '').strip()
+            if len(sku) > SKU_MAX_LENGTH:
+                raise ValueError(f'SKU is longer than {SKU_MAX_LENGTH} characters')
+            if sku and sku in taken_skus:
+                raise ValueError(f'SKU "{sku}" already exists')
+
+            code = row.get('location', '').strip()
+            if code:
+                if code not in locations:
+                    raise ValueError(f'Unknown storage location "{code}"')
+                product.location_id = locations[code]
+
+            uom_key = row.get('unit_of_measure', '').strip()
+            if uom_key:
+                if uom_key not in uoms:
+                    raise ValueError(f'Unknown unit of measure "{uom_key}"')
+                product.unit_of_measure_id = uoms[uom_key]
+
+        except ValueError as e:
+            result.add_error(row_number, str(e))
+            continue
+
+        if sku:
+            taken_skus.add(sku)
+            product.sku = sku
+        else:
+            needs_sku.append(product)
+        products.append(product)
+
+    if dry_run:
+        result.created += len(products)
+        return
+    if not products:
+        return
+
+    with transaction.atomic():
+        # Explicit PRD-NNNN SKUs move the counter first, so the block allocated below skips them
+        claim_product_skus(product.sku for product in products if product.sku)
+        for product, sku in zip(needs_sku, allocate_product_skus(len(needs_sku))):
+            product.sku = sku
+        Product.objects.bulk_create(products, batch_size=500)
+        record_movements(
+            StockMovement(
+                product=product,
+                movement_type='opening',
+                quantity_change=product.quantity,
+                location_id=product.location_id,
+                reference='Import',
+                created_by=created_by,
+            )
+            for product in products
+        )
+        StockBalance.objects.bulk_create([
+            StockBalance(product=product, location_id=product.location_id, quantity=product.quantity)
+            for product in products
+            if product.location_id and product.quantity
+        ], batch_size=500)
+        stats.created_in_bulk(products)
+    result.created += len(products)
+
+
+def import_products(rows, chunk_size=DEFAULT_CHUNK_SIZE, created_by=None, dry_run=False, progress=None):
+    """
+    Validate and bulk-insert products from an iterable of (row_number, dict).
+
+    Rows are processed in chunks: each chunk resolves its location and unit
+    codes with one query apiece, takes a block of SKUs in one step and is
+    written with bulk_create in its own transaction, so a bad row is
+    reported without discarding the rest of the file.
+    """
+    result = ImportResult()
+    for chunk in _chunks(rows, chunk_size):
+        _import_chunk(chunk, result, created_by, dry_run)
+        if progress:
+            progress(result)
+    result.finish()
+    return result
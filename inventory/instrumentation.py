@@ -0,0 +1,211 @@
+"""
+Per-request SQL instrumentation - query counts, DB time and repeated-query fingerprints
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from .roles import can_view_diagnostics
+
+
+logger = logging.getLogger('inventory.queries')
+
+WHITESPACE_RE = re.compile(r'\s+')
+IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def fingerprint(sql):
+    """Normalize SQL so the same statement with different values compares equal"""
+    sql = WHITESPACE_RE.sub(' ', sql).strip()
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    sql = STRING_RE.sub('?', sql)
+    return NUMBER_RE.sub('?', sql)
+
+
+# QueryStats objects collecting in the current context. A context variable rather
+# than a per-connection wrapper, because async views run their queries on
+# connections that belong to other threads; contextvars follow them there.
+_active = ContextVar('inventory_query_stats', default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection - times queries for the active QueryStats"""
+    active = _active.get()
+    if not active:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        statement = fingerprint(sql)
+        for stats in active:
+            stats.record(statement, elapsed)
+
+
+def install(connection, **kwargs):
+    """connection_created handler - add the execute wrapper once per connection"""
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _dispatch)
+
+
+class QueryStats:
+    """
+    Counts and times queries through a connection execute wrapper, so it works
+    without DEBUG and without keeping the SQL of every query.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, elapsed):
+        self.duration += elapsed
+        self.count += 1
+        self.fingerprints[statement] += 1
+
+    @contextmanager
+    def capture(self):
+        """Record queries run in this context - including sync_to_async threads - during the block"""
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+        token = _active.set(_active.get() + (self,))
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+
+    @property
+    def repeated_count(self):
+        """Queries beyond the first for each fingerprint - the N+1 signal"""
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+    def repeated(self, limit=5):
+        return [(sql, count) for sql, count in self.fingerprints.most_common(limit) if count > 1]
+
+    def server_timing(self, total):
+        return (
+            f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries", '
+            f'dbrepeat;desc="{self.repeated_count} repeated queries", '
+            f'total;dur={total * 1000:.2f}'
+        )
+
+
+class QueryLog:
+    """Rolling per-view window of request statistics, kept in process memory"""
+
+    def __init__(self, window=200):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.repeated = {}
+
+    def record(self, view_name, stats, total):
+        with self.lock:
+            samples = self.samples.setdefault(view_name, deque(maxlen=self.window))
+            samples.append((stats.count, stats.duration, total, stats.repeated_count))
+            repeated = self.repeated.setdefault(view_name, Counter())
+            for sql, count in stats.repeated(3):
+                repeated[sql] += count
+            if len(repeated) > 50:
+                self.repeated[view_name] = Counter(dict(repeated.most_common(20)))
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.repeated.clear()
+
+    def summary(self):
+        """One row per view, heaviest average query count first"""
+        with self.lock:
+            snapshot = {name: list(samples) for name, samples in self.samples.items()}
+            repeated = {name: counter.most_common(1) for name, counter in self.repeated.items()}
+
+        rows = []
+        for name, samples in snapshot.items():
+            counts = sorted(sample[0] for sample in samples)
+            requests = len(samples)
+            top_repeated = repeated.get(name)
+            rows.append({
+                'view': name,
+                'requests': requests,
+                'avg_queries': sum(counts) / requests,
+                'p95_queries': counts[min(requests - 1, int(requests * 0.95))],
+                'max_queries': counts[-1],
+                'avg_db_ms': sum(sample[1] for sample in samples) / requests * 1000,
+                'avg_total_ms': sum(sample[2] for sample in samples) / requests * 1000,
+                'avg_repeated': sum(sample[3] for sample in samples) / requests,
+                'top_repeated': top_repeated[0][0] if top_repeated else '',
+            })
+        rows.sort(key=lambda row: row['avg_queries'], reverse=True)
+        return rows
+
+
+query_log = QueryLog(window=getattr(settings, 'QUERY_STATS_WINDOW', 200))
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records each request's SQL count and DB time per view for the query
+    summary page, and adds them as a Server-Timing header when DEBUG is on
+    or the user may view diagnostics. Works in both sync (WSGI) and async (ASGI)
+    middleware chains.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.warn_over = getattr(settings, 'QUERY_COUNT_WARNING', 100)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = QueryStats()
+        start = time.perf_counter()
+        with stats.capture():
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        return self.finish(request, response, stats, total, self.show_timing(getattr(request, 'user', None)))
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with stats.capture():
+            response = await self.get_response(request)
+        total = time.perf_counter() - start
+        user = await request.auser() if hasattr(request, 'auser') else None
+        return self.finish(request, response, stats, total, self.show_timing(user))
+
+    @staticmethod
+    def show_timing(user):
+        # Timings reveal how much work a request does; keep them from anonymous and ordinary users
+        return settings.DEBUG or (user is not None and can_view_diagnostics(user))
+
+    def finish(self, request, response, stats, total, show_timing):
+        # Streaming responses keep querying after this point; only the view's own queries are counted
+        if show_timing:
+            response['Server-Timing'] = stats.server_timing(total)
+
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            query_log.record(match.view_name, stats, total)
+            if stats.count > self.warn_over:
+                logger.warning('%s ran %d queries (%d repeated) in %.1f ms',
+                               match.view_name, stats.count, stats.repeated_count, stats.duration * 1000)
+        return response
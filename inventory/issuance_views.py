@@ -1,15 +1,30 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction as db_transaction
+from django.db.models import Count, F, Q, Sum
 from django.utils import timezone
 from datetime import datetime
 
 from .models import (
     ItemIssuance, ItemIssuanceLine, ItemRequest, ItemRequestLine,
-    Product
+    Product, StockBalance, StorageLocation
 )
 from .utils import generate_issue_number
+from .stock import issue_stock
+from .reservations import release
+from .waves import issue_wave
+from .picking import build_pick_list
+from .listing import paginate
+from .conditional import ISSUANCE, conditional
+from . import roles
+
+
+ISSUANCE_SORTS = {
+    'newest': ('Newest first', '-created_at'),
+    'oldest': ('Oldest first', 'created_at'),
+    'issued': ('Issue date', '-issued_date'),
+}
 
 
 # ==================== Issuance Management ====================
@@ -18,25 +33,28 @@ from .utils import generate_issue_number
 def issuance_list(request):
     """List all issuances - warehouse staff can view"""
     # Only warehouse staff, supervisors, and managers can view issuances
-    can_view = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Staff', 'Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_view = roles.can_issue_items(request.user)
 
     if not can_view:
         messages.error(request, 'You do not have permission to view issuances.')
         return redirect('dashboard')
 
-    issuances = ItemIssuance.objects.all().order_by('-issued_date')
+    listing = paginate(
+        request,
+        ItemIssuance.objects.for_list(),
+        sorts=ISSUANCE_SORTS,
+        default_sort='newest',
+        status_choices=ItemIssuance.STATUS_CHOICES,
+        date_field='created_at',
+        owner_field='issued_by',
+    )
 
     # Check if user can create issuance (supervisor or manager)
-    can_create = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_create = roles.can_manage_inventory(request.user)
 
     context = {
-        'issuances': issuances,
+        'issuances': listing.object_list,
+        'listing': listing,
         'can_create': can_create,
     }
     return render(request, 'issuance/issuance_list.html', context)
@@ -46,17 +64,14 @@ def issuance_list(request):
 def issuance_create(request):
     """Create new issuance - warehouse supervisors can create"""
     # Only warehouse supervisors and managers can create issuances
-    can_create = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_create = roles.can_manage_inventory(request.user)
 
     if not can_create:
         messages.error(request, 'You do not have permission to create issuances.')
         return redirect('issuance_list')
 
     # Get approved requests that have items remaining to be issued
-    approved_requests = ItemRequest.objects.filter(status='approved')
+    approved_requests = ItemRequest.objects.for_list().filter(status='approved')
 
     if request.method == 'POST':
         request_id = request.POST.get('request_id')
@@ -78,6 +93,11 @@ def issuance_create(request):
         # Process the issuance
         try:
             with db_transaction.atomic():
+                # Lock the request so two supervisors cannot issue the same lines at once
+                item_request = ItemRequest.objects.select_for_update().get(pk=item_request.pk)
+                if item_request.status != 'approved':
+                    raise ValueError('Only approved requests can be issued.')
+
                 # Create the issuance
                 issuance = ItemIssuance(
                     item_request=item_request,
@@ -90,9 +110,10 @@ def issuance_create(request):
                 )
                 issuance.save()
 
-                # Process each request line
+                # Process each request line, in product order so stock rows are always locked in the same order
                 has_issuance = False
-                for request_line in item_request.items.all():
+                issued = {}
+                for request_line in item_request.items.select_related('product').order_by('product_id', 'id'):
                     # Get the issuance quantity from the form
                     qty_key = f'quantity_{request_line.id}'
                     quantity_issued = request.POST.get(qty_key, 0)
@@ -109,30 +130,42 @@ def issuance_create(request):
                         if quantity_issued > quantity_remaining:
                             raise ValueError(f'Issuance quantity for {request_line.product.name} exceeds remaining quantity')
 
-                        # Check if enough stock available
-                        if quantity_issued > request_line.product.quantity:
-                            raise ValueError(f'Insufficient stock for {request_line.product.name}. Available: {request_line.product.quantity}')
-
-                        # Create issuance line
-                        ItemIssuanceLine.objects.create(
-                            issuance=issuance,
-                            request_line=request_line,
-                            quantity_issued=quantity_issued,
+                        # Draw from the chosen location, or split across the product's locations
+                        location = None
+                        location_id = request.POST.get(f'location_{request_line.id}')
+                        if location_id:
+                            location = StorageLocation.objects.filter(id=location_id).first()
+                            if location is None:
+                                raise ValueError(f'Invalid location for {request_line.product.name}')
+                        plan = issue_stock(
+                            request_line.product, quantity_issued, location=location,
+                            reference=issuance.issue_number, user=request.user,
                         )
 
+                        # One issuance line per location drawn from
+                        ItemIssuanceLine.objects.bulk_create([
+                            ItemIssuanceLine(
+                                issuance=issuance,
+                                request_line=request_line,
+                                quantity_issued=quantity,
+                                location_id=plan_location_id,
+                            )
+                            for plan_location_id, quantity in plan
+                        ])
+
                         # Update request line quantity_issued
                         request_line.quantity_issued += quantity_issued
-                        request_line.save()
-
-                        # Update product stock
-                        request_line.product.quantity -= quantity_issued
-                        request_line.product.save()
+                        request_line.save(update_fields=['quantity_issued'])
+                        issued[request_line.product_id] = issued.get(request_line.product_id, 0) + quantity_issued
 
                         has_issuance = True
 
                 if not has_issuance:
                     raise ValueError('No items to issue. Please enter quantities.')
 
+                # What was issued no longer needs holding
+                release(issued)
+
                 # Check if request is fully issued
                 all_issued = True
                 for request_line in item_request.items.all():
@@ -145,7 +178,7 @@ def issuance_create(request):
                     item_request.status = 'completed'
                 else:
                     item_request.status = 'issued'  # Partially issued
-                item_request.save()
+                item_request.save(update_fields=['status', 'updated_at'])
 
                 messages.success(request, f'Issuance {issuance.issue_number} created successfully!')
                 return redirect('issuance_detail', issuance_id=issuance.id)
@@ -163,17 +196,103 @@ def issuance_create(request):
 
 
 @login_required
-def get_request_items(request, request_id):
-    """AJAX endpoint to get request items for issuance form"""
+def issuance_wave(request):
+    """Issue many approved requests at once as a picking wave - warehouse supervisors"""
+    can_create = roles.can_manage_inventory(request.user)
+
+    if not can_create:
+        messages.error(request, 'You do not have permission to create issuances.')
+        return redirect('issuance_list')
+
+    if request.method == 'POST':
+        try:
+            request_ids = [int(value) for value in request.POST.getlist('request_ids')]
+        except ValueError:
+            request_ids = []
+
+        if not request_ids:
+            messages.error(request, 'Select at least one request for the wave.')
+        else:
+            try:
+                wave = issue_wave(request_ids, request.user, notes=request.POST.get('notes', ''))
+            except ValueError as e:
+                messages.error(request, str(e))
+            else:
+                numbers = [issuance.issue_number for issuance in wave.issuances]
+                messages.success(
+                    request,
+                    f'Wave issued {wave.line_count} lines across {len(numbers)} requests: {", ".join(numbers)}'
+                )
+                for request_number, reason in wave.skipped:
+                    messages.warning(request, f'{request_number}: {reason}')
+                return redirect('issuance_list')
+
+    # Approved requests with something left to issue
+    approved_requests = ItemRequest.objects.for_list().filter(status='approved').annotate(
+        open_lines=Count('items', filter=Q(items__quantity_approved__gt=F('items__quantity_issued'))),
+        open_quantity=Sum(F('items__quantity_approved') - F('items__quantity_issued'),
+                          filter=Q(items__quantity_approved__gt=F('items__quantity_issued'))),
+    ).filter(open_lines__gt=0).order_by('required_by_date', 'id')
+
+    context = {
+        'approved_requests': approved_requests,
+        'selected': set(request.POST.getlist('request_ids')),
+    }
+    return render(request, 'issuance/issuance_wave.html', context)
+
+
+@login_required
+def issuance_pick_list(request):
+    """Printable pick list for the selected approved requests, in walking order"""
+    can_view = roles.can_issue_items(request.user)
+
+    if not can_view:
+        messages.error(request, 'You do not have permission to view issuances.')
+        return redirect('dashboard')
+
+    try:
+        request_ids = [int(value) for value in request.GET.getlist('request_ids')]
+    except ValueError:
+        request_ids = []
+    if not request_ids:
+        messages.error(request, 'Select at least one request for the pick list.')
+        return redirect('issuance_wave')
+
+    context = {
+        'pick_list': build_pick_list(request_ids),
+        'request_ids': request_ids,
+    }
+    return render(request, 'issuance/pick_list.html', context)
+
+
+@login_required
+async def get_request_items(request, request_id):
+    """AJAX endpoint to get request items for issuance form (async, read-only)"""
     from django.http import JsonResponse
 
-    item_request = get_object_or_404(ItemRequest, id=request_id)
+    item_request = await aget_object_or_404(ItemRequest.objects.for_detail(), id=request_id)
 
     if item_request.status != 'approved':
         return JsonResponse({'error': 'Request is not approved'}, status=400)
 
+    lines = [line async for line in item_request.items.select_related('product', 'product__unit_of_measure')]
+
+    # Stocked locations for every product on the request, in one query
+    locations = {}
+    async for balance in (
+        StockBalance.objects
+        .filter(product_id__in={line.product_id for line in lines}, quantity__gt=0)
+        .select_related('location')
+        .order_by('location__code')
+    ):
+        locations.setdefault(balance.product_id, []).append({
+            'id': balance.location_id,
+            'code': balance.location.code,
+            'quantity': balance.quantity,
+        })
+
     items = []
-    for line in item_request.items.all():
+    for line in lines:
         quantity_remaining = line.quantity_approved - line.quantity_issued
         items.append({
             'id': line.id,
@@ -184,7 +303,9 @@ def get_request_items(request, request_id):
             'quantity_issued': line.quantity_issued,
             'quantity_remaining': quantity_remaining,
             'stock_available': line.product.quantity,
+            'available_to_promise': line.product.available_quantity,
             'uom': line.product.unit_of_measure.abbreviation if line.product.unit_of_measure else '-',
+            'locations': locations.get(line.product_id, []),
         })
 
     return JsonResponse({
@@ -196,18 +317,16 @@ def get_request_items(request, request_id):
 
 
 @login_required
+@conditional(ISSUANCE, 'issuance_id')
 def issuance_detail(request, issuance_id):
     """View details of an issuance"""
-    can_view = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Staff', 'Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_view = roles.can_issue_items(request.user)
 
     if not can_view:
         messages.error(request, 'You do not have permission to view issuances.')
         return redirect('dashboard')
 
-    issuance = get_object_or_404(ItemIssuance, id=issuance_id)
+    issuance = get_object_or_404(ItemIssuance.objects.for_detail(), id=issuance_id)
 
     context = {
         'issuance': issuance,
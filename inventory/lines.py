@@ -0,0 +1,165 @@
+"""
+Purchase order and quotation line items - parse posted rows and save them as
+one batch of inserts, updates and deletes
+"""
+from decimal import Decimal, InvalidOperation
+
+from .models import Product, PurchaseOrder, PurchaseOrderItem, Quotation, QuotationItem
+from .totals import deferred_refresh
+
+
+# Purchase order and quotation lines store unit_price in the same column type
+PRICE_FIELD = PurchaseOrderItem._meta.get_field('unit_price')
+PRICE_LIMIT = Decimal(10) ** (PRICE_FIELD.max_digits - PRICE_FIELD.decimal_places)
+PRICE_STEP = Decimal(1).scaleb(-PRICE_FIELD.decimal_places)
+
+def _quantity(value, line):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'Line {line}: quantity must be a whole number')
+
+
+def _price(value, line):
+    if not value:
+        return Decimal('0')
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'Line {line}: invalid unit price "{value}"')
+    if not price.is_finite() or price < 0:
+        raise ValueError(f'Line {line}: invalid unit price "{value}"')
+    try:
+        price = price.quantize(PRICE_STEP)
+    except InvalidOperation:
+        raise ValueError(f'Line {line}: invalid unit price "{value}"')
+    if price >= PRICE_LIMIT:
+        raise ValueError(f'Line {line}: invalid unit price "{value}"')
+    return price
+
+
+def _whole(value, line):
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        raise ValueError(f'Line {line}: "{value}" is not a whole number')
+
+
+def _text(value, line):
+    return value.strip()
+
+
+class LineFormat:
+    """
+    How one document type's lines are posted and stored.
+
+    Lines arrive as product_<n>, quantity_<n>, ... keys, optionally with
+    item_id_<n> naming the existing line a row edits. fields maps each
+    posted prefix to (model field, parser).
+    """
+
+    def __init__(self, document_model, line_model, parent_field, fields):
+        self.document_model = document_model
+        self.line_model = line_model
+        self.parent_field = parent_field
+        self.fields = fields
+
+    def parse(self, data):
+        """
+        Posted rows as dicts, in form order. Rows without a product or with
+        a zero quantity are dropped; products are checked with one query.
+        """
+        rows = []
+        for key in data:
+            if not key.startswith('product_'):
+                continue
+            index = key[len('product_'):]
+            product_id = data.get(key, '').strip()
+            quantity = data.get(f'quantity_{index}', '').strip()
+            if not product_id or not quantity:
+                continue
+
+            line = len(rows) + 1
+            values = {
+                field: parse(data.get(f'{prefix}_{index}', ''), line)
+                for prefix, (field, parse) in self.fields.items()
+            }
+            if values[self.fields['quantity'][0]] <= 0:
+                continue
+            try:
+                row = {'product_id': int(product_id), 'item_id': _whole(data.get(f'item_id_{index}', ''), line)}
+            except ValueError:
+                raise ValueError(f'Line {line}: invalid product')
+            row.update(values)
+            rows.append(row)
+
+        if not rows:
+            raise ValueError('At least one line item is required')
+
+        product_ids = {row['product_id'] for row in rows}
+        found = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+        missing = product_ids - found
+        if missing:
+            raise ValueError(f'Product {min(missing)} does not exist')
+        return rows
+
+    def save(self, document, rows, existing=True):
+        """
+        Make the document's lines match rows with bulk inserts, updates and deletes.
+
+        A row edits the line named by its item_id, otherwise the next unused
+        line for the same product, so unchanged lines keep their ids. Pass
+        existing=False for a new document to skip loading its lines.
+        Returns (created, updated, deleted) counts.
+        """
+        lines = {}
+        if existing:
+            current = self.line_model.objects.filter(**{self.parent_field: document}).order_by('id')
+            lines = {line.pk: line for line in current}
+        by_product = {}
+        for line in lines.values():
+            by_product.setdefault(line.product_id, []).append(line)
+
+        to_create, to_update = [], []
+        for row in rows:
+            line = lines.pop(row['item_id'], None)
+            if line is None:
+                unused = [candidate for candidate in by_product.get(row['product_id'], []) if candidate.pk in lines]
+                line = lines.pop(unused[0].pk) if unused else None
+
+            values = {field: row[field] for field, _parse in self.fields.values()}
+            if line is None:
+                to_create.append(self.line_model(
+                    **{self.parent_field: document}, product_id=row['product_id'], **values,
+                ))
+                continue
+
+            values['product_id'] = row['product_id']
+            if any(getattr(line, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(line, field, value)
+                to_update.append(line)
+
+        with deferred_refresh() as pending:
+            if lines:
+                self.line_model.objects.filter(pk__in=lines.keys()).delete()
+            if to_update:
+                update_fields = ['product'] + [field for field, _parse in self.fields.values()]
+                self.line_model.objects.bulk_update(to_update, update_fields, batch_size=500)
+            if to_create:
+                self.line_model.objects.bulk_create(to_create, batch_size=500)
+            pending.add((self.document_model, document.pk))
+        return len(to_create), len(to_update), len(lines)
+
+
+PO_LINES = LineFormat(PurchaseOrder, PurchaseOrderItem, 'purchase_order', {
+    'quantity': ('quantity_ordered', _quantity),
+    'unit_price': ('unit_price', _price),
+})
+
+QUOTATION_LINES = LineFormat(Quotation, QuotationItem, 'quotation', {
+    'quantity': ('quantity', _quantity),
+    'unit_price': ('unit_price', _price),
+    'vendor_sku': ('vendor_sku', _text),
+    'lead_time': ('lead_time_days', _whole),
+})
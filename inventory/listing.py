@@ -0,0 +1,216 @@
+"""
+Shared list engine - keyset pagination, filters and sort keys for list views
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, time
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.http import urlencode
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class ListPage:
+    """One page of a keyset-paginated list plus the state needed to render its controls"""
+
+    def __init__(self, object_list, *, has_next, has_previous, next_cursor, previous_cursor,
+                 filters, sort, sort_choices, status_choices, page_size, owner_filter):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.filters = filters
+        self.sort = sort
+        self.sort_choices = sort_choices
+        self.status_choices = status_choices
+        self.page_size = page_size
+        self.owner_filter = owner_filter
+
+    def _query(self, **extra):
+        params = {key: value for key, value in self.filters.items() if value}
+        params['sort'] = self.sort
+        params.update(extra)
+        return urlencode(params)
+
+    @property
+    def next_query(self):
+        return self._query(after=self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query(before=self.previous_cursor)
+
+    @property
+    def first_query(self):
+        return self._query()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def encode_cursor(values):
+    """Encode keyset values as an opaque, URL-safe cursor"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor; returns None if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(values, list) or len(values) != 2 or not isinstance(values[1], int):
+        return None
+    return values
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _page_size(request, default):
+    try:
+        size = int(request.GET.get('per_page', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _order_fields(sort_field):
+    """Return (field name, descending) for a sort spec like '-created_at'"""
+    return sort_field.lstrip('-'), sort_field.startswith('-')
+
+
+def _cursor_values(obj, field_name, model):
+    if field_name == 'id':
+        return [None, obj.pk]
+    field = model._meta.get_field(field_name)
+    return [field.value_to_string(obj), obj.pk]
+
+
+def _seek_filter(field_name, descending, values, model):
+    """Q object selecting rows strictly after the cursor in (field, id) order"""
+    op = 'lt' if descending else 'gt'
+    raw_value, pk = values
+    if field_name == 'id':
+        return Q(**{f'id__{op}': pk})
+    value = model._meta.get_field(field_name).to_python(raw_value)
+    return Q(**{f'{field_name}__{op}': value}) | Q(**{field_name: value, f'id__{op}': pk})
+
+
+def paginate(request, queryset, *, sorts, default_sort, status_choices=None,
+             date_field=None, owner_field=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Filter, sort and keyset-paginate a queryset from request.GET.
+
+    sorts maps a sort key to (label, field), e.g. {'newest': ('Newest first', '-created_at')}.
+    Ordering is always (field, id) in the same direction so the cursor is unique, and each
+    page costs one indexed range scan regardless of how deep into the list it is.
+
+    Recognised query parameters: status, date_from, date_to, owner ('me' or a user id),
+    sort, per_page, and the opaque after/before cursors.
+    """
+    model = queryset.model
+    filters = {}
+
+    status = request.GET.get('status', '')
+    if status_choices and status in dict(status_choices):
+        queryset = queryset.filter(status=status)
+        filters['status'] = status
+
+    if date_field:
+        date_from = _parse_date(request.GET.get('date_from'))
+        date_to = _parse_date(request.GET.get('date_to'))
+        is_datetime = model._meta.get_field(date_field).get_internal_type() == 'DateTimeField'
+        if date_from:
+            start = timezone.make_aware(datetime.combine(date_from, time.min)) if is_datetime else date_from
+            queryset = queryset.filter(**{f'{date_field}__gte': start})
+            filters['date_from'] = date_from.isoformat()
+        if date_to:
+            end = timezone.make_aware(datetime.combine(date_to, time.max)) if is_datetime else date_to
+            queryset = queryset.filter(**{f'{date_field}__lte': end})
+            filters['date_to'] = date_to.isoformat()
+
+    if owner_field:
+        owner = request.GET.get('owner', '')
+        if owner == 'me' and request.user.is_authenticated:
+            queryset = queryset.filter(**{owner_field: request.user})
+            filters['owner'] = owner
+        elif owner.isdigit():
+            queryset = queryset.filter(**{f'{owner_field}_id': int(owner)})
+            filters['owner'] = owner
+
+    sort = request.GET.get('sort', default_sort)
+    if sort not in sorts:
+        sort = default_sort
+    field_name, descending = _order_fields(sorts[sort][1])
+    prefix = '-' if descending else ''
+    if field_name == 'id':
+        ordering = [f'{prefix}id']
+    else:
+        ordering = [f'{prefix}{field_name}', f'{prefix}id']
+
+    size = _page_size(request, page_size)
+    if 'per_page' in request.GET:
+        filters['per_page'] = str(size)
+    after = decode_cursor(request.GET.get('after'))
+    before = decode_cursor(request.GET.get('before')) if not after else None
+
+    # A tampered cursor falls back to the first page rather than a 500
+    try:
+        after_filter = _seek_filter(field_name, descending, after, model) if after else None
+        before_filter = _seek_filter(field_name, not descending, before, model) if before else None
+    except (ValidationError, TypeError, ValueError):
+        after = before = after_filter = before_filter = None
+
+    if before_filter is not None:
+        # Walk backwards from the cursor, then flip the slice back into display order
+        reverse_ordering = [f[1:] if f.startswith('-') else f'-{f}' for f in ordering]
+        rows = list(queryset.filter(before_filter).order_by(*reverse_ordering)[:size + 1])
+        has_previous = len(rows) > size
+        rows = rows[:size][::-1]
+        has_next = True
+    else:
+        if after_filter is not None:
+            queryset = queryset.filter(after_filter)
+        rows = list(queryset.order_by(*ordering)[:size + 1])
+        has_next = len(rows) > size
+        rows = rows[:size]
+        has_previous = after_filter is not None
+
+    next_cursor = encode_cursor(_cursor_values(rows[-1], field_name, model)) if rows and has_next else ''
+    previous_cursor = encode_cursor(_cursor_values(rows[0], field_name, model)) if rows and has_previous else ''
+
+    return ListPage(
+        rows,
+        has_next=has_next,
+        has_previous=has_previous,
+        next_cursor=next_cursor,
+        previous_cursor=previous_cursor,
+        filters=filters,
+        sort=sort,
+        sort_choices=[(key, label) for key, (label, _field) in sorts.items()],
+        status_choices=status_choices or [],
+        page_size=size,
+        owner_filter=bool(owner_field),
+    )
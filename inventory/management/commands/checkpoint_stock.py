@@ -0,0 +1,14 @@
+"""
+Management command to snapshot stock balances into StockCheckpoint rows
+"""
+from django.core.management.base import BaseCommand
+
+from inventory.stock import create_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'Write balance checkpoints for products with movements since their last checkpoint (run daily)'
+
+    def handle(self, *args, **options):
+        count = create_checkpoints()
+        self.stdout.write(self.style.SUCCESS(f'Created {count} stock checkpoints.'))
@@ -0,0 +1,58 @@
+"""
+Management command to bulk import products from a CSV or XLSX file
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importers import (
+    DEFAULT_CHUNK_SIZE, ImportFileError, import_products, iter_rows
+)
+
+
+class Command(BaseCommand):
+    help = 'Stream products from a CSV or XLSX file into the catalog using bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to a .csv or .xlsx file')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help=f'Rows validated and inserted per batch (default {DEFAULT_CHUNK_SIZE})')
+        parser.add_argument('--user', help='Username recorded as created_by')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+
+    def handle(self, *args, **options):
+        created_by = None
+        if options['user']:
+            try:
+                created_by = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["user"]}" does not exist')
+
+        def progress(result):
+            self.stdout.write(f'  {result.rows_read} rows read, {result.created} ok, {result.error_count} errors')
+
+        try:
+            with open(options['path'], 'rb') as handle:
+                result = import_products(
+                    iter_rows(handle, options['path']),
+                    chunk_size=max(1, options['chunk_size']),
+                    created_by=created_by,
+                    dry_run=options['dry_run'],
+                    progress=progress,
+                )
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["path"]}: {e}')
+        except ImportFileError as e:
+            raise CommandError(str(e))
+
+        for row_number, message in result.errors:
+            self.stdout.write(self.style.WARNING(f'  Row {row_number}: {message}'))
+        if result.error_count > len(result.errors):
+            self.stdout.write(self.style.WARNING(
+                f'  ... {result.error_count - len(result.errors)} more errors not shown'
+            ))
+
+        verb = 'validated' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.created} products {verb}, {result.error_count} rows rejected, '
+            f'{result.rows_read} rows in {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/s)'
+        ))
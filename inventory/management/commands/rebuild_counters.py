@@ -0,0 +1,31 @@
+"""
+Management command to check the maintained dashboard counters against their tables
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import StatCounter
+from inventory.stats import expected_counts, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Report dashboard counters that differ from a full recount and reset them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drift; exit with an error if any is found')
+
+    def handle(self, *args, **options):
+        stored = dict(StatCounter.objects.values_list('name', 'value'))
+        expected = expected_counts()
+        drifted = {name: value for name, value in expected.items() if stored.get(name) != value}
+
+        for name, value in sorted(drifted.items()):
+            self.stdout.write(self.style.WARNING(f'  {name}: {stored.get(name, "missing")} -> {value}'))
+
+        if options['check'] and drifted:
+            raise CommandError(f'{len(drifted)} counters are out of step')
+        if drifted:
+            rebuild_counters()
+            self.stdout.write(self.style.SUCCESS(f'Reset {len(drifted)} counters.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All counters match their tables.'))
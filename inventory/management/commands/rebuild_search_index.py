@@ -0,0 +1,22 @@
+"""
+Management command to rebuild the product full-text search index
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from inventory.search import install_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Create (if missing) and rebuild the product full-text search index'
+
+    def handle(self, *args, **options):
+        if not install_search_index(connection):
+            self.stdout.write(self.style.WARNING(
+                f'No full-text index available for the {connection.vendor} backend; '
+                'search will use LIKE lookups.'
+            ))
+            return
+
+        rebuild_search_index(connection)
+        self.stdout.write(self.style.SUCCESS('Product search index rebuilt.'))
@@ -0,0 +1,29 @@
+"""
+Management command to check stored product reservations against open request lines
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.reservations import find_drift, refresh_reservations
+
+
+class Command(BaseCommand):
+    help = 'Report products whose reserved_quantity differs from their open request lines and recompute it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drift; exit with an error if any is found')
+        parser.add_argument('--limit', type=int, default=10, help='Drifted products to list')
+
+    def handle(self, *args, **options):
+        drifted = list(find_drift().order_by('id').values_list('id', 'name', 'reserved_quantity', 'expected_reserved'))
+
+        for pk, name, stored, expected in drifted[:options['limit']]:
+            self.stdout.write(self.style.WARNING(f'  #{pk} {name}: reserved {stored} -> {expected}'))
+
+        if options['check'] and drifted:
+            raise CommandError(f'{len(drifted)} products have stale reservations')
+        if drifted:
+            refresh_reservations([pk for pk, *_ in drifted])
+            self.stdout.write(self.style.SUCCESS(f'Recomputed reservations for {len(drifted)} products.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All product reservations match their open request lines.'))
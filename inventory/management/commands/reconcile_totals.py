@@ -0,0 +1,43 @@
+"""
+Management command to check stored purchase order and quotation totals against their line items
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import PurchaseOrder, Quotation
+from inventory.totals import find_drift, refresh_totals
+
+
+class Command(BaseCommand):
+    help = 'Report documents whose stored total_amount/line_count differ from their lines and recompute them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drift; exit with an error if any is found')
+        parser.add_argument('--limit', type=int, default=10, help='Drifted documents to list per type')
+
+    def handle(self, *args, **options):
+        drifted_total = 0
+        for model in (PurchaseOrder, Quotation):
+            label = str(model._meta.verbose_name_plural).capitalize()
+            drift = find_drift(model)
+            count = drift.count()
+            drifted_total += count
+            if not count:
+                self.stdout.write(f'{label}: no drift')
+                continue
+
+            self.stdout.write(self.style.WARNING(f'{label}: {count} with drift'))
+            for document in drift.order_by('id')[:options['limit']]:
+                self.stdout.write(
+                    f'  #{document.pk}: total {document.total_amount} -> {document.expected_total}, '
+                    f'lines {document.line_count} -> {document.expected_count}'
+                )
+            if not options['check']:
+                refresh_totals(model, drift.values('pk'))
+
+        if options['check'] and drifted_total:
+            raise CommandError(f'{drifted_total} documents have stale totals')
+        if drifted_total:
+            self.stdout.write(self.style.SUCCESS(f'Recomputed totals for {drifted_total} documents.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All document totals match their lines.'))
@@ -0,0 +1,78 @@
+"""
+Management command to benchmark every inventory route at several data sizes
+"""
+import json
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from inventory.benchmark import SIZES, benchmark_routes, compare, environment, seed_data, write_results
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database at each size and record latency, SQL query count '
+            'and peak memory for every route in inventory/urls.py')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(str(size) for size in SIZES),
+                            help='Comma-separated product counts (default 1000,10000,100000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per route (default 5)')
+        parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write')
+        parser.add_argument('--baseline', help='Earlier results file to compare against')
+        parser.add_argument('--concurrency', type=int, default=0,
+                            help='Also send this many simultaneous requests to each async route')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {e}')
+
+        results = {**environment(), 'repeat': options['repeat'], 'concurrency': options['concurrency'], 'sizes': {}}
+
+        # Never touch the configured database: work in the test database, like manage.py test
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            for size in sizes:
+                call_command('flush', interactive=False, verbosity=0)
+                self.stdout.write(self.style.MIGRATE_HEADING(f'Size {size}'))
+                started = time.monotonic()
+                with transaction.atomic():
+                    counts = seed_data(size, log=self.stdout.write)
+                seed_seconds = time.monotonic() - started
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+
+                results['sizes'][str(size)] = {
+                    'seed_seconds': round(seed_seconds, 2),
+                    'counts': counts,
+                    'routes': benchmark_routes(max(1, options['repeat']), log=self.stdout.write,
+                                               concurrency=max(0, options['concurrency'])),
+                }
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        write_results(results, options['output'])
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if baseline:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Compared with {options["baseline"]}'))
+            for size, route, metric, before, after in compare(results, baseline):
+                if before and after > before * 1.2 and after - before >= 1:
+                    self.stdout.write(self.style.WARNING(
+                        f'  [{size}] {route} {metric}: {before} -> {after}'
+                    ))
@@ -0,0 +1,27 @@
+"""
+Management command to fill the database with synthetic benchmark data
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.benchmark import seed_data
+
+
+class Command(BaseCommand):
+    help = 'Generate realistic volumes of products, locations, vendors and documents with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1000,
+                            help='Number of products; documents scale with it (default 1000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        self.stdout.write(f'Seeding {options["size"]} products and related documents...')
+        with transaction.atomic():
+            counts = seed_data(max(1, options['size']), seed=options['seed'], log=self.stdout.write)
+        for label, count in counts.items():
+            self.stdout.write(f'  {label}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.monotonic() - started:.1f}s'))
@@ -0,0 +1,101 @@
+# Generated by Django 5.1 on 2026-10-16 22:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0007_transfer"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="itemissuance",
+            index=models.Index(fields=["created_at", "id"], name="iss_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="itemissuance",
+            index=models.Index(
+                fields=["status", "created_at", "id"], name="iss_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="itemissuance",
+            index=models.Index(
+                fields=["issued_by", "created_at", "id"], name="iss_owner_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="itemrequest",
+            index=models.Index(fields=["created_at", "id"], name="req_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="itemrequest",
+            index=models.Index(
+                fields=["status", "created_at", "id"], name="req_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="itemrequest",
+            index=models.Index(
+                fields=["requested_by", "created_at", "id"],
+                name="req_owner_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["name", "id"], name="product_name_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(fields=["created_at", "id"], name="po_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(
+                fields=["status", "created_at", "id"], name="po_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(
+                fields=["created_by", "created_at", "id"], name="po_owner_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="quotation",
+            index=models.Index(fields=["created_at", "id"], name="qtn_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="quotation",
+            index=models.Index(
+                fields=["status", "created_at", "id"], name="qtn_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="quotation",
+            index=models.Index(
+                fields=["created_by", "created_at", "id"], name="qtn_owner_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transfer",
+            index=models.Index(fields=["created_at", "id"], name="trf_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transfer",
+            index=models.Index(
+                fields=["status", "created_at", "id"], name="trf_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transfer",
+            index=models.Index(
+                fields=["requested_by", "created_at", "id"],
+                name="trf_owner_created_idx",
+            ),
+        ),
+    ]
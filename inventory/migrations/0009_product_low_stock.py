@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-16 22:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0008_list_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("quantity__lte", models.F("min_quantity"))),
+                fields=["quantity", "id"],
+                name="product_low_stock_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Full-text search index for products.
+#
+# SQLite gets an external-content FTS5 table kept in sync by triggers;
+# PostgreSQL gets a generated tsvector column with a GIN index. Other
+# backends fall back to icontains lookups in inventory.search.
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from inventory.search import install_search_index
+
+    install_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from inventory.search import remove_search_index
+
+    remove_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0009_product_low_stock"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
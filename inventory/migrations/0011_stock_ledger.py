@@ -0,0 +1,174 @@
+# Generated by Django 5.1 on 2026-10-16 22:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_opening_balances(apps, schema_editor):
+    """Seed the ledger with each product's current quantity so history sums to on-hand"""
+    Product = apps.get_model("inventory", "Product")
+    StockMovement = apps.get_model("inventory", "StockMovement")
+
+    batch = []
+    for product in (
+        Product.objects.exclude(quantity=0)
+        .only("id", "quantity", "location_id", "sku")
+        .iterator(chunk_size=2000)
+    ):
+        batch.append(
+            StockMovement(
+                product_id=product.id,
+                movement_type="opening",
+                quantity_change=product.quantity,
+                location_id=product.location_id,
+                reference=product.sku or "",
+            )
+        )
+        if len(batch) >= 2000:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        StockMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0010_product_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("as_of", models.DateTimeField()),
+                ("quantity", models.IntegerField()),
+                (
+                    "last_movement_id",
+                    models.BigIntegerField(
+                        help_text="Highest StockMovement id included in this balance"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_checkpoints",
+                        to="inventory.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Stock Checkpoint",
+                "verbose_name_plural": "Stock Checkpoints",
+                "ordering": ["-as_of"],
+                "indexes": [
+                    models.Index(
+                        fields=["product", "as_of"], name="checkpoint_product_time_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "movement_type",
+                    models.CharField(
+                        choices=[
+                            ("opening", "Opening Balance"),
+                            ("receipt", "Receipt"),
+                            ("issue", "Issue"),
+                            ("adjustment", "Adjustment"),
+                            ("transfer_out", "Transfer Out"),
+                            ("transfer_in", "Transfer In"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "quantity_change",
+                    models.IntegerField(help_text="Signed change in on-hand quantity"),
+                ),
+                (
+                    "reference",
+                    models.CharField(
+                        blank=True,
+                        help_text="Source document number (e.g., ISS-2025-0001)",
+                        max_length=100,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="stock_movements",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "location",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="stock_movements",
+                        to="inventory.storagelocation",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="stock_movements",
+                        to="inventory.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Stock Movement",
+                "verbose_name_plural": "Stock Movements",
+                "ordering": ["-created_at", "-id"],
+                "indexes": [
+                    models.Index(
+                        fields=["product", "created_at"],
+                        name="movement_product_time_idx",
+                    ),
+                    models.Index(
+                        fields=["product", "id"], name="movement_product_id_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(create_opening_balances, migrations.RunPython.noop),
+    ]
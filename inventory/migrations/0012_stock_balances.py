@@ -0,0 +1,116 @@
+# Generated by Django 5.1 on 2026-10-16 22:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_location_balances(apps, schema_editor):
+    """Move each located product's quantity into a balance row for its location"""
+    Product = apps.get_model("inventory", "Product")
+    StockBalance = apps.get_model("inventory", "StockBalance")
+
+    batch = []
+    for product in (
+        Product.objects.filter(location__isnull=False, quantity__gt=0)
+        .only("id", "quantity", "location_id")
+        .iterator(chunk_size=2000)
+    ):
+        batch.append(
+            StockBalance(
+                product_id=product.id,
+                location_id=product.location_id,
+                quantity=product.quantity,
+            )
+        )
+        if len(batch) >= 2000:
+            StockBalance.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        StockBalance.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0011_stock_ledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="itemissuanceline",
+            name="location",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Location the stock was drawn from",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="issuance_lines",
+                to="inventory.storagelocation",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="product",
+            name="location",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Primary storage location (per-location quantities are in StockBalance)",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="products",
+                to="inventory.storagelocation",
+            ),
+        ),
+        migrations.CreateModel(
+            name="StockBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "location",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="balances",
+                        to="inventory.storagelocation",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="balances",
+                        to="inventory.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Stock Balance",
+                "verbose_name_plural": "Stock Balances",
+                "indexes": [
+                    models.Index(
+                        fields=["location", "product"],
+                        name="balance_location_product_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("product", "location"),
+                        name="unique_product_location_balance",
+                    ),
+                    models.CheckConstraint(
+                        condition=models.Q(("quantity__gte", 0)),
+                        name="stock_balance_non_negative",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(create_location_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1 on 2026-10-16 22:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0012_stock_balances"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DocumentCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("prefix", models.CharField(max_length=50, unique=True)),
+                ("last_number", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Document Counter",
+                "verbose_name_plural": "Document Counters",
+                "ordering": ["prefix"],
+            },
+        ),
+    ]
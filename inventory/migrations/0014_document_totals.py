@@ -0,0 +1,84 @@
+# Generated by Django 5.1 on 2026-10-16 22:55
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+
+def backfill_totals(apps, schema_editor):
+    """Compute the stored totals of existing documents, one UPDATE per document type"""
+    amount = DecimalField(max_digits=14, decimal_places=2)
+    for model_name, line_name, parent_field, quantity_field in (
+        ("PurchaseOrder", "PurchaseOrderItem", "purchase_order", "quantity_ordered"),
+        ("Quotation", "QuotationItem", "quotation", "quantity"),
+    ):
+        model = apps.get_model("inventory", model_name)
+        lines = (
+            apps.get_model("inventory", line_name)
+            .objects.filter(**{parent_field: OuterRef("pk")})
+            .order_by()
+            .values(parent_field)
+        )
+        total = lines.annotate(
+            total=Sum(F(quantity_field) * F("unit_price"), output_field=amount)
+        ).values("total")
+        count = lines.annotate(count=Count("pk")).values("count")
+        model.objects.update(
+            total_amount=Round(
+                Coalesce(Subquery(total), Value(0), output_field=amount), 2
+            ),
+            line_count=Coalesce(Subquery(count), Value(0)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0013_document_counters"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="purchaseorder",
+            name="line_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="purchaseorder",
+            name="total_amount",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                help_text="Sum of line totals, maintained from the items",
+                max_digits=14,
+            ),
+        ),
+        migrations.AddField(
+            model_name="quotation",
+            name="line_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="quotation",
+            name="total_amount",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                help_text="Sum of line totals, maintained from the items",
+                max_digits=14,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(fields=["total_amount", "id"], name="po_total_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="quotation",
+            index=models.Index(fields=["total_amount", "id"], name="qtn_total_id_idx"),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
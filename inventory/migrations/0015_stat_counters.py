@@ -0,0 +1,35 @@
+# Generated by Django 5.1 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0014_document_totals"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("value", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Statistics Counter",
+                "verbose_name_plural": "Statistics Counters",
+                "ordering": ["name"],
+            },
+        ),
+    ]
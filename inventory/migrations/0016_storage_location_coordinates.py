@@ -0,0 +1,43 @@
+# Generated by Django 5.1 on 2026-10-16 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0015_stat_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="storagelocation",
+            name="aisle",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Aisle number within the zone", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="storagelocation",
+            name="bay",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Bay along the aisle, counted from the front",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="storagelocation",
+            name="level",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Shelf level, 1 = floor", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="storagelocation",
+            name="zone",
+            field=models.CharField(
+                blank=True, help_text="Zone or area (e.g., A, COLD)", max_length=20
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1 on 2026-10-16 23:27
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_reservations(apps, schema_editor):
+    """Reserve the open quantity of requests approved before reservations existed"""
+    Product = apps.get_model("inventory", "Product")
+    ItemRequestLine = apps.get_model("inventory", "ItemRequestLine")
+    open_lines = (
+        ItemRequestLine.objects.filter(
+            product=OuterRef("pk"),
+            item_request__status__in=("approved", "issued"),
+            quantity_approved__gt=F("quantity_issued"),
+        )
+        .order_by()
+        .values("product")
+        .annotate(reserved=Sum(F("quantity_approved") - F("quantity_issued")))
+        .values("reserved")
+    )
+    Product.objects.update(reserved_quantity=Coalesce(Subquery(open_lines), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0016_storage_location_coordinates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="reserved_quantity",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="available_quantity",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.expressions.CombinedExpression(
+                    models.F("quantity"), "-", models.F("reserved_quantity")
+                ),
+                help_text="Available to promise: on hand less reserved",
+                output_field=models.IntegerField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["available_quantity", "id"], name="product_atp_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_reservations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-16 23:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0017_product_reservations"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="receiving",
+            name="receiving_number",
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="receivingitem",
+            name="location",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="received_items",
+                to="inventory.storagelocation",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="receiving",
+            index=models.Index(
+                fields=["received_date", "id"], name="receiving_date_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1 on 2026-10-16 23:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0018_receiving_numbers"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="itemissuance",
+            index=models.Index(fields=["issued_date", "id"], name="iss_issued_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["quantity", "id"], name="product_quantity_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vendor",
+            index=models.Index(fields=["name", "id"], name="vendor_name_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="vendor",
+            index=models.Index(
+                fields=["created_at", "id"], name="vendor_created_id_idx"
+            ),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -26,24 +27,64 @@ class StorageLocation(models.Model):
     name = models.CharField(max_length=255, unique=True)
     code = models.CharField(max_length=50, unique=True, help_text="Location code (e.g., A1, B2, ZONE-1)")
     description = models.TextField(blank=True)
+    # Position on the floor, used to order pick lists into a walking route
+    zone = models.CharField(max_length=20, blank=True, help_text="Zone or area (e.g., A, COLD)")
+    aisle = models.PositiveIntegerField(null=True, blank=True, help_text="Aisle number within the zone")
+    bay = models.PositiveIntegerField(null=True, blank=True, help_text="Bay along the aisle, counted from the front")
+    level = models.PositiveIntegerField(null=True, blank=True, help_text="Shelf level, 1 = floor")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    @property
+    def has_coordinates(self):
+        return self.aisle is not None and self.bay is not None
+
     class Meta:
         ordering = ['code']
         verbose_name = "Storage Location"
         verbose_name_plural = "Storage Locations"
 
 
+class ProductQuerySet(models.QuerySet):
+    def low_stock(self):
+        """Products at or below their minimum stock level, evaluated in SQL"""
+        return self.filter(quantity__lte=F('min_quantity'))
+
+    def for_list(self):
+        """Rows for product tables - location and unit of measure joined in"""
+        return self.select_related('location', 'unit_of_measure')
+
+    def for_choices(self):
+        """Just what __str__ needs, for dropdowns listing every product"""
+        return self.select_related('unit_of_measure').only(
+            'id', 'name', 'sku', 'available_quantity', 'unit_of_measure', 'unit_of_measure__abbreviation',
+        )
+
+
+class LowStockManager(models.Manager):
+    """Manager restricted to low-stock products (Product.low_stock_items)"""
+
+    def get_queryset(self):
+        return ProductQuerySet(self.model, using=self._db).low_stock()
+
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
     quantity = models.IntegerField(default=0)
+    # Open quantity on approved request lines, maintained by inventory.reservations
+    reserved_quantity = models.IntegerField(default=0, editable=False)
+    available_quantity = models.GeneratedField(
+        expression=F('quantity') - F('reserved_quantity'),
+        output_field=models.IntegerField(),
+        db_persist=True,
+        help_text="Available to promise: on hand less reserved",
+    )
     min_quantity = models.IntegerField(default=10, help_text="Minimum stock level")
-    location = models.ForeignKey('StorageLocation', on_delete=models.PROTECT, related_name='products', null=True, blank=True, help_text="Warehouse storage location")
+    location = models.ForeignKey('StorageLocation', on_delete=models.PROTECT, related_name='products', null=True, blank=True, help_text="Primary storage location (per-location quantities are in StockBalance)")
     sku = models.CharField(max_length=100, unique=True, null=True, blank=True)
     unit_of_measure = models.ForeignKey('UnitOfMeasure', on_delete=models.PROTECT, related_name='products', null=True, blank=True)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
@@ -51,6 +92,9 @@ class Product(models.Model):
     updated_at = models.DateTimeField(auto_now=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='products_created')
 
+    objects = ProductQuerySet.as_manager()
+    low_stock_items = LowStockManager()
+
     def __str__(self):
         uom_display = f" ({self.unit_of_measure.abbreviation})" if self.unit_of_measure else ""
         return f"{self.name}{uom_display} [SKU: {self.sku}]"
@@ -67,6 +111,103 @@ class Product(models.Model):
             ('delete_inventory', 'Can delete inventory'),
         ]
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['quantity', 'id'], name='product_quantity_id_idx'),
+            # Partial index covering only low-stock rows, so counts and the low-stock page stay cheap
+            models.Index(
+                fields=['quantity', 'id'],
+                condition=Q(quantity__lte=F('min_quantity')),
+                name='product_low_stock_idx',
+            ),
+            models.Index(fields=['available_quantity', 'id'], name='product_atp_idx'),
+        ]
+
+
+# ==================== Stock Ledger ====================
+
+class StockBalance(models.Model):
+    """Quantity of a product held at one storage location"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='balances')
+    location = models.ForeignKey(StorageLocation, on_delete=models.PROTECT, related_name='balances')
+    quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.location_id}: {self.quantity}"
+
+    class Meta:
+        verbose_name = "Stock Balance"
+        verbose_name_plural = "Stock Balances"
+        constraints = [
+            # Also serves "where is SKU X" lookups
+            models.UniqueConstraint(fields=['product', 'location'], name='unique_product_location_balance'),
+            models.CheckConstraint(condition=Q(quantity__gte=0), name='stock_balance_non_negative'),
+        ]
+        indexes = [
+            # "What is in bin A1"
+            models.Index(fields=['location', 'product'], name='balance_location_product_idx'),
+        ]
+
+
+class StockMovement(models.Model):
+    """Append-only ledger of every change to Product.quantity"""
+    MOVEMENT_TYPES = [
+        ('opening', 'Opening Balance'),
+        ('receipt', 'Receipt'),
+        ('issue', 'Issue'),
+        ('adjustment', 'Adjustment'),
+        ('transfer_out', 'Transfer Out'),
+        ('transfer_in', 'Transfer In'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='stock_movements')
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
+    quantity_change = models.IntegerField(help_text="Signed change in on-hand quantity")
+    location = models.ForeignKey(StorageLocation, on_delete=models.PROTECT, related_name='stock_movements', null=True, blank=True)
+    reference = models.CharField(max_length=100, blank=True, help_text="Source document number (e.g., ISS-2025-0001)")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity_change:+d} ({self.movement_type})"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Stock movements are append-only and cannot be changed')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Stock movements are append-only and cannot be deleted')
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name = "Stock Movement"
+        verbose_name_plural = "Stock Movements"
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='movement_product_time_idx'),
+            models.Index(fields=['product', 'id'], name='movement_product_id_idx'),
+        ]
+
+
+class StockCheckpoint(models.Model):
+    """Balance snapshot: product quantity after every movement up to last_movement_id"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_checkpoints')
+    as_of = models.DateTimeField()
+    quantity = models.IntegerField()
+    last_movement_id = models.BigIntegerField(help_text="Highest StockMovement id included in this balance")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.as_of:%Y-%m-%d %H:%M}: {self.quantity}"
+
+    class Meta:
+        ordering = ['-as_of']
+        verbose_name = "Stock Checkpoint"
+        verbose_name_plural = "Stock Checkpoints"
+        indexes = [
+            models.Index(fields=['product', 'as_of'], name='checkpoint_product_time_idx'),
+        ]
 
 
 # ==================== Organization Structure ====================
@@ -174,6 +315,10 @@ class Vendor(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='vendor_name_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='vendor_created_id_idx'),
+        ]
 
 
 class VendorProduct(models.Model):
@@ -199,6 +344,17 @@ class VendorProduct(models.Model):
 
 # ==================== Purchase Order Management ====================
 
+class PurchaseOrderQuerySet(models.QuerySet):
+    def for_list(self):
+        """List rows: vendor and currency joined in, long text skipped"""
+        return self.select_related('vendor', 'currency').defer('notes', 'delivery_address')
+
+    def for_detail(self):
+        return self.select_related('vendor', 'currency', 'created_by', 'approved_by').prefetch_related(
+            models.Prefetch('items', queryset=PurchaseOrderItem.objects.select_related('product__unit_of_measure')),
+        )
+
+
 class PurchaseOrder(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -226,17 +382,17 @@ class PurchaseOrder(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='pos_created')
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='pos_approved')
     approved_date = models.DateTimeField(null=True, blank=True)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, help_text="Sum of line totals, maintained from the items")
+    line_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PurchaseOrderQuerySet.as_manager()
+
     def __str__(self):
         vendor_name = self.vendor.name if self.vendor else self.supplier_name
         return f"PO-{self.po_number} - {vendor_name}"
 
-    @property
-    def total_amount(self):
-        return sum(item.total_price for item in self.items.all())
-
     @property
     def display_vendor(self):
         """Get vendor name from vendor object or legacy field"""
@@ -246,6 +402,22 @@ class PurchaseOrder(models.Model):
         ordering = ['-created_at']
         verbose_name = "Purchase Order"
         verbose_name_plural = "Purchase Orders"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='po_created_id_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='po_status_created_idx'),
+            models.Index(fields=['created_by', 'created_at', 'id'], name='po_owner_created_idx'),
+            models.Index(fields=['total_amount', 'id'], name='po_total_id_idx'),
+        ]
+
+
+class QuotationQuerySet(models.QuerySet):
+    def for_list(self):
+        return self.select_related('vendor', 'currency').defer('notes')
+
+    def for_detail(self):
+        return self.select_related('vendor', 'currency', 'created_by').prefetch_related(
+            models.Prefetch('items', queryset=QuotationItem.objects.select_related('product__unit_of_measure')),
+        )
 
 
 class Quotation(models.Model):
@@ -267,19 +439,25 @@ class Quotation(models.Model):
     valid_until = models.DateField(null=True, blank=True)
     quotation_date = models.DateField(null=True, blank=True, help_text="Date vendor provided quotation")
     notes = models.TextField(blank=True)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, help_text="Sum of line totals, maintained from the items")
+    line_count = models.PositiveIntegerField(default=0, editable=False)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='quotations_created')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = QuotationQuerySet.as_manager()
+
     def __str__(self):
         return f"QTN-{self.quotation_number} - {self.vendor.name}"
 
-    @property
-    def total_amount(self):
-        return sum(item.total_price for item in self.items.all())
-
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='qtn_created_id_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='qtn_status_created_idx'),
+            models.Index(fields=['created_by', 'created_at', 'id'], name='qtn_owner_created_idx'),
+            models.Index(fields=['total_amount', 'id'], name='qtn_total_id_idx'),
+        ]
 
 
 class QuotationItem(models.Model):
@@ -325,6 +503,18 @@ class PurchaseOrderItem(models.Model):
 
 # ==================== Receiving Management ====================
 
+class ReceivingQuerySet(models.QuerySet):
+    def for_list(self):
+        return self.select_related('purchase_order__vendor', 'received_by').defer('notes')
+
+    def for_detail(self):
+        return self.select_related('purchase_order__vendor', 'received_by').prefetch_related(
+            models.Prefetch('items', queryset=ReceivingItem.objects.select_related(
+                'po_item__product__unit_of_measure', 'location',
+            )),
+        )
+
+
 class Receiving(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -332,6 +522,7 @@ class Receiving(models.Model):
         ('partial', 'Partial'),
     ]
 
+    receiving_number = models.CharField(max_length=100, unique=True, null=True, blank=True)
     purchase_order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE, related_name='receivings')
     received_date = models.DateTimeField(default=timezone.now)
     received_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='receivings_processed')
@@ -339,17 +530,23 @@ class Receiving(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ReceivingQuerySet.as_manager()
+
     def __str__(self):
         return f"Receiving for {self.purchase_order.po_number} on {self.received_date.date()}"
 
     class Meta:
         ordering = ['-received_date']
+        indexes = [
+            models.Index(fields=['received_date', 'id'], name='receiving_date_id_idx'),
+        ]
 
 
 class ReceivingItem(models.Model):
     receiving = models.ForeignKey(Receiving, on_delete=models.CASCADE, related_name='items')
     po_item = models.ForeignKey(PurchaseOrderItem, on_delete=models.CASCADE, related_name='received_items')
     quantity_received = models.IntegerField()
+    location = models.ForeignKey(StorageLocation, on_delete=models.PROTECT, related_name='received_items', null=True, blank=True)
     condition_notes = models.TextField(blank=True)
 
     def __str__(self):
@@ -358,6 +555,14 @@ class ReceivingItem(models.Model):
 
 # ==================== Item Request & Issuance ====================
 
+class ItemRequestQuerySet(models.QuerySet):
+    def for_list(self):
+        return self.select_related('requested_by', 'department').defer('rejection_reason')
+
+    def for_detail(self):
+        return self.select_related('requested_by', 'department__manager', 'approved_by')
+
+
 class ItemRequest(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -389,6 +594,8 @@ class ItemRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ItemRequestQuerySet.as_manager()
+
     def __str__(self):
         dept_display = f" ({self.department.code})" if self.department else ""
         return f"REQ-{self.request_number}{dept_display} - {self.requested_by.username}"
@@ -397,6 +604,11 @@ class ItemRequest(models.Model):
         ordering = ['-created_at']
         verbose_name = "Item Request"
         verbose_name_plural = "Item Requests"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='req_created_id_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='req_status_created_idx'),
+            models.Index(fields=['requested_by', 'created_at', 'id'], name='req_owner_created_idx'),
+        ]
 
 
 class ItemRequestLine(models.Model):
@@ -421,6 +633,19 @@ class ItemRequestLine(models.Model):
         verbose_name_plural = "Item Request Lines"
 
 
+class ItemIssuanceQuerySet(models.QuerySet):
+    def for_list(self):
+        return self.select_related('item_request', 'issued_by', 'issued_to').defer('notes', 'item_request__purpose',
+                                                                                   'item_request__rejection_reason')
+
+    def for_detail(self):
+        return self.select_related('item_request', 'issued_by', 'issued_to').prefetch_related(
+            models.Prefetch('lines', queryset=ItemIssuanceLine.objects.select_related(
+                'request_line__product__unit_of_measure', 'request_line__destination_site', 'location',
+            ).order_by('id')),
+        )
+
+
 class ItemIssuance(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -437,17 +662,26 @@ class ItemIssuance(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ItemIssuanceQuerySet.as_manager()
+
     def __str__(self):
         return f"ISS-{self.issue_number} for REQ-{self.item_request.request_number}"
 
     class Meta:
         ordering = ['-issued_date']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='iss_created_id_idx'),
+            models.Index(fields=['issued_date', 'id'], name='iss_issued_id_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='iss_status_created_idx'),
+            models.Index(fields=['issued_by', 'created_at', 'id'], name='iss_owner_created_idx'),
+        ]
 
 
 class ItemIssuanceLine(models.Model):
     issuance = models.ForeignKey(ItemIssuance, on_delete=models.CASCADE, related_name='lines')
     request_line = models.ForeignKey(ItemRequestLine, on_delete=models.CASCADE, related_name='issuance_lines')
     quantity_issued = models.IntegerField()
+    location = models.ForeignKey(StorageLocation, on_delete=models.PROTECT, related_name='issuance_lines', null=True, blank=True, help_text="Location the stock was drawn from")
 
     def __str__(self):
         return f"{self.request_line.product.name} - Issued: {self.quantity_issued}"
@@ -455,6 +689,16 @@ class ItemIssuanceLine(models.Model):
 
 # ==================== Transfer Management ====================
 
+class TransferQuerySet(models.QuerySet):
+    def for_list(self):
+        return self.select_related('product', 'from_location', 'to_location', 'requested_by').defer(
+            'notes', 'product__description',
+        )
+
+    def for_detail(self):
+        return self.select_related('product', 'from_location', 'to_location', 'requested_by', 'transferred_by')
+
+
 class Transfer(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -475,6 +719,8 @@ class Transfer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TransferQuerySet.as_manager()
+
     def __str__(self):
         return f"TRF-{self.transfer_number} - {self.product.name} ({self.from_location.code} → {self.to_location.code})"
 
@@ -482,3 +728,42 @@ class Transfer(models.Model):
         ordering = ['-created_at']
         verbose_name = "Transfer"
         verbose_name_plural = "Transfers"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='trf_created_id_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='trf_status_created_idx'),
+            models.Index(fields=['requested_by', 'created_at', 'id'], name='trf_owner_created_idx'),
+        ]
+
+
+# ==================== Document Numbering ====================
+
+class DocumentCounter(models.Model):
+    """Last number handed out for a document number prefix (e.g. "REQ-2025-", "PO")"""
+    prefix = models.CharField(max_length=50, unique=True)
+    last_number = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.prefix}{self.last_number}"
+
+    class Meta:
+        ordering = ['prefix']
+        verbose_name = "Document Counter"
+        verbose_name_plural = "Document Counters"
+
+
+# ==================== Statistics ====================
+
+class StatCounter(models.Model):
+    """A maintained dashboard count (e.g. "pending_requests"), kept by inventory.stats"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = "Statistics Counter"
+        verbose_name_plural = "Statistics Counters"
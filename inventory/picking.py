@@ -0,0 +1,204 @@
+"""
+Pick lists - the outstanding lines of one or many requests, grouped by the
+bin they are picked from and ordered into a short walking route
+"""
+import time
+from collections import defaultdict
+
+from django.db.models import F
+
+from .models import ItemRequestLine, StockBalance
+from .stock import plan_withdrawal
+from .waves import split_plan
+
+# Walking distances, in bays: one bay along an aisle is 1
+AISLE_WIDTH = 3       # from one aisle to the next along a cross-aisle
+ZONE_CHANGE = 40      # from the front of one zone to the front of the next
+LEVEL_CHANGE = 0.1    # reaching up or down at the same bay; orders the levels of a bay
+
+# Up to this many stops the route is seeded by nearest neighbour and 2-opt
+# compares every pair; above it the seed is an S-shaped sweep and 2-opt only
+# looks TWO_OPT_WINDOW stops ahead, which keeps 1,000+ stops well under a second
+NEAREST_NEIGHBOUR_LIMIT = 200
+TWO_OPT_WINDOW = 40
+TWO_OPT_SECONDS = 0.3
+
+# Dispatch, where every route starts and ends: the front of the first zone
+DEPOT = (0, 0, 0, 1, 0)
+
+
+# ==================== Routing ====================
+
+class Layout:
+    """
+    Maps locations to points (zone rank, aisle, bay, level, zone depth).
+
+    Each zone is a block of parallel aisles with a cross-aisle at the front
+    (bay 0) and one behind the deepest bay, so a picker leaves an aisle by
+    whichever end is shorter.
+    """
+
+    def __init__(self, locations):
+        zones = sorted({location.zone for location in locations})
+        self.zone_rank = {zone: rank + 1 for rank, zone in enumerate(zones)}
+        self.depth = defaultdict(int)
+        for location in locations:
+            self.depth[location.zone] = max(self.depth[location.zone], location.bay + 1)
+
+    def point(self, location):
+        return (self.zone_rank[location.zone], location.aisle, location.bay, location.level or 1,
+                self.depth[location.zone])
+
+
+def distance(a, b):
+    zone_a, aisle_a, bay_a, level_a, depth = a
+    zone_b, aisle_b, bay_b, level_b, _ = b
+    reach = LEVEL_CHANGE * abs(level_a - level_b)
+    if zone_a != zone_b:
+        # Out to the front of one zone, along to the other, and in from its front
+        return ZONE_CHANGE * abs(zone_a - zone_b) + AISLE_WIDTH * (aisle_a + aisle_b) + bay_a + bay_b + reach
+    if aisle_a == aisle_b:
+        return abs(bay_a - bay_b) + reach
+    return AISLE_WIDTH * abs(aisle_a - aisle_b) + min(bay_a + bay_b, 2 * depth - bay_a - bay_b) + reach
+
+
+def route_length(points):
+    """Length of the tour from the depot through points in order and back"""
+    tour = [DEPOT, *points, DEPOT]
+    return sum(distance(tour[i], tour[i + 1]) for i in range(len(tour) - 1))
+
+
+def _nearest_neighbour(points):
+    order, left, here = [], set(range(len(points))), DEPOT
+    while left:
+        index = min(left, key=lambda i: distance(here, points[i]))
+        left.remove(index)
+        order.append(index)
+        here = points[index]
+    return order
+
+
+def _sweep(points):
+    # Zone by zone, aisle by aisle, up one aisle and back down the next
+    def key(index):
+        zone, aisle, bay, level, _ = points[index]
+        return zone, aisle, bay if aisle % 2 else -bay, level
+    return sorted(range(len(points)), key=key)
+
+
+def _two_opt(points, order, window, deadline):
+    """Reverse stretches of the tour while that shortens it, until nothing improves or time runs out"""
+    tour = [DEPOT, *(points[index] for index in order), DEPOT]
+    indices = [None, *order, None]
+    last = len(tour) - 2
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, last):
+            if time.monotonic() > deadline:
+                return indices[1:-1]
+            a = tour[i - 1]
+            for j in range(i + 1, min(last, i + window) + 1):
+                b, c, e = tour[i], tour[j], tour[j + 1]
+                if distance(a, c) + distance(b, e) < distance(a, b) + distance(c, e) - 1e-9:
+                    tour[i:j + 1] = tour[i:j + 1][::-1]
+                    indices[i:j + 1] = indices[i:j + 1][::-1]
+                    improved = True
+    return indices[1:-1]
+
+
+def plan_route(points):
+    """Order in which to visit points (indices), for a short tour from the depot and back"""
+    if len(points) <= NEAREST_NEIGHBOUR_LIMIT:
+        order, window = _nearest_neighbour(points), len(points)
+    else:
+        order, window = _sweep(points), TWO_OPT_WINDOW
+    return _two_opt(points, order, window, time.monotonic() + TWO_OPT_SECONDS)
+
+
+# ==================== Pick Lists ====================
+
+class Stop:
+    """One bin on the route and what to take from it: picks is [(request line, quantity)]"""
+
+    def __init__(self, location):
+        self.location = location
+        self.picks = []
+
+
+class PickList:
+    """
+    Stops in walking order, then stops that cannot be routed (stock held at
+    no location, or locations without coordinates), plus lines stock cannot
+    cover as [(request line, quantity short)]
+    """
+
+    def __init__(self, stops, unrouted, short, distance):
+        self.stops = stops
+        self.unrouted = unrouted
+        self.short = short
+        self.distance = distance
+
+    @property
+    def line_count(self):
+        return sum(len(stop.picks) for stop in self.stops + self.unrouted)
+
+
+def build_pick_list(request_ids):
+    """
+    Pick list for the outstanding lines of the approved requests in
+    request_ids, drawing stock as a wave issuance of them would.
+    """
+    lines = list(
+        ItemRequestLine.objects
+        .filter(item_request_id__in=request_ids, item_request__status='approved',
+                quantity_approved__gt=F('quantity_issued'))
+        .select_related('item_request', 'product__unit_of_measure')
+        .order_by('item_request_id', 'id')
+    )
+    demand = defaultdict(int)
+    lines_by_product = defaultdict(list)
+    products = {}
+    for line in lines:
+        demand[line.product_id] += line.quantity_approved - line.quantity_issued
+        lines_by_product[line.product_id].append(line)
+        products[line.product_id] = line.product
+
+    held = defaultdict(list)
+    locations = {}
+    for balance in (
+        StockBalance.objects.filter(product_id__in=demand, quantity__gt=0)
+        .select_related('location')
+        .order_by('product_id', 'location_id')
+    ):
+        held[balance.product_id].append((balance.location_id, balance.quantity))
+        locations[balance.location_id] = balance.location
+
+    stops = {}
+    short = []
+    for product_id, product in products.items():
+        available = min(demand[product_id], max(product.quantity, 0))
+        plan = plan_withdrawal(product, available, held[product_id], product.quantity) if available else []
+        picked = defaultdict(int)
+        for line, location_id, quantity in split_plan(plan, lines_by_product[product_id]):
+            if location_id not in stops:
+                stops[location_id] = Stop(locations.get(location_id))
+            stops[location_id].picks.append((line, quantity))
+            picked[line.pk] += quantity
+        for line in lines_by_product[product_id]:
+            missing = line.quantity_approved - line.quantity_issued - picked[line.pk]
+            if missing:
+                short.append((line, missing))
+
+    routable, unrouted = [], []
+    for stop in stops.values():
+        located = stop.location is not None and stop.location.has_coordinates
+        (routable if located else unrouted).append(stop)
+    unrouted.sort(key=lambda stop: stop.location.code if stop.location else '')
+    layout = Layout([stop.location for stop in routable])
+    points = [layout.point(stop.location) for stop in routable]
+    order = plan_route(points)
+    return PickList(
+        [routable[index] for index in order], unrouted, short,
+        route_length([points[index] for index in order]),
+    )
@@ -1,10 +1,12 @@
 """
 Procurement Management Views - PO, Quotations, Vendors
 """
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
+from django.utils import timezone
 from datetime import datetime
 
 from .models import (
@@ -12,48 +14,59 @@ from .models import (
     Vendor, VendorProduct, Currency, Receiving, ReceivingItem, Product
 )
 from .utils import generate_vendor_code, generate_po_number, generate_quotation_number
+from .listing import paginate
+from .lines import PO_LINES, QUOTATION_LINES
+from .roles import acheck, can_procure
+from .totals import refresh_totals
+from .conditional import PURCHASE_ORDER, QUOTATION, conditional
+from . import reference, stats
+
+
+DOCUMENT_SORTS = {
+    'newest': ('Newest first', '-created_at'),
+    'oldest': ('Oldest first', 'created_at'),
+    'total': ('Highest total first', '-total_amount'),
+}
+
+VENDOR_SORTS = {
+    'name': ('Name (A-Z)', 'name'),
+    'newest': ('Newest first', '-created_at'),
+}
 
 
 def check_procurement_permission(user):
     """Check if user has procurement access (Warehouse Manager or Superuser)"""
-    if user.is_superuser:
-        return True
-    if user.groups.filter(name='Warehouse Manager').exists():
-        return True
-    return False
+    return can_procure(user)
 
 
 @login_required
-def procurement_dashboard(request):
-    """Procurement dashboard - POs, Quotations, Vendors"""
+async def procurement_dashboard(request):
+    """Procurement dashboard - POs, Quotations, Vendors (async, like the other dashboards)"""
 
     # Check permission
-    if not check_procurement_permission(request.user):
+    if not await acheck(request, check_procurement_permission):
         messages.error(request, 'You do not have permission to access Procurement.')
         return redirect('dashboard')
 
     # Get statistics
-    total_vendors = Vendor.objects.filter(is_active=True).count()
-    total_pos = PurchaseOrder.objects.count()
-    pending_pos = PurchaseOrder.objects.filter(status__in=['draft', 'submitted']).count()
-    total_quotations = Quotation.objects.count()
+    counts = await stats.adashboard_counts()
 
-    # Recent items
+    # Recent items - left lazy, so they are only queried if the template (rendered in a thread) uses them
     recent_pos = PurchaseOrder.objects.all().order_by('-created_at')[:5]
     recent_quotations = Quotation.objects.all().order_by('-created_at')[:5]
     active_vendors = Vendor.objects.filter(is_active=True).order_by('name')[:10]
 
     context = {
         'page_title': 'Procurement Dashboard',
-        'total_vendors': total_vendors,
-        'total_pos': total_pos,
-        'pending_pos': pending_pos,
-        'total_quotations': total_quotations,
+        'total_vendors': counts['total_vendors'],
+        'total_pos': counts['total_pos'],
+        'pending_pos': counts['pending_pos'],
+        'total_quotations': counts['total_quotations'],
         'recent_pos': recent_pos,
         'recent_quotations': recent_quotations,
         'active_vendors': active_vendors,
     }
-    return render(request, 'procurement/dashboard.html', context)
+    return await sync_to_async(render)(request, 'procurement/dashboard.html', context)
 
 
 @login_required
@@ -64,10 +77,16 @@ def vendor_list(request):
         messages.error(request, 'You do not have permission to access Vendors.')
         return redirect('dashboard')
 
-    vendors = Vendor.objects.all().order_by('name')
+    listing = paginate(
+        request,
+        Vendor.objects.all(),
+        sorts=VENDOR_SORTS,
+        default_sort='name',
+    )
 
     context = {
-        'vendors': vendors,
+        'vendors': listing.object_list,
+        'listing': listing,
         'page_title': 'Vendors',
     }
     return render(request, 'procurement/vendor_list.html', context)
@@ -81,10 +100,19 @@ def po_list(request):
         messages.error(request, 'You do not have permission to access Purchase Orders.')
         return redirect('dashboard')
 
-    purchase_orders = PurchaseOrder.objects.all().order_by('-created_at')
+    listing = paginate(
+        request,
+        PurchaseOrder.objects.for_list(),
+        sorts=DOCUMENT_SORTS,
+        default_sort='newest',
+        status_choices=PurchaseOrder.STATUS_CHOICES,
+        date_field='created_at',
+        owner_field='created_by',
+    )
 
     context = {
-        'purchase_orders': purchase_orders,
+        'purchase_orders': listing.object_list,
+        'listing': listing,
         'page_title': 'Purchase Orders',
     }
     return render(request, 'procurement/po_list.html', context)
@@ -98,10 +126,19 @@ def quotation_list(request):
         messages.error(request, 'You do not have permission to access Quotations.')
         return redirect('dashboard')
 
-    quotations = Quotation.objects.all().order_by('-created_at')
+    listing = paginate(
+        request,
+        Quotation.objects.for_list(),
+        sorts=DOCUMENT_SORTS,
+        default_sort='newest',
+        status_choices=Quotation.STATUS_CHOICES,
+        date_field='created_at',
+        owner_field='created_by',
+    )
 
     context = {
-        'quotations': quotations,
+        'quotations': listing.object_list,
+        'listing': listing,
         'page_title': 'Quotations',
     }
     return render(request, 'procurement/quotation_list.html', context)
@@ -163,7 +200,7 @@ def vendor_add(request):
             messages.error(request, f'Error adding vendor: {str(e)}')
 
     # Get currencies for dropdown
-    currencies = Currency.objects.filter(is_active=True).order_by('code')
+    currencies = reference.currencies()
 
     context = {
         'currencies': currencies,
@@ -232,7 +269,7 @@ def vendor_update(request, vendor_id):
             messages.error(request, f'Error updating vendor: {str(e)}')
 
     # Get currencies for dropdown
-    currencies = Currency.objects.filter(is_active=True).order_by('code')
+    currencies = reference.currencies()
 
     context = {
         'vendor': vendor,
@@ -293,6 +330,7 @@ def po_add(request):
                     raise ValueError('Vendor is required')
 
                 vendor = get_object_or_404(Vendor, id=vendor_id)
+                rows = PO_LINES.parse(request.POST)
 
                 # Auto-generate PO number
                 po_number = generate_po_number()
@@ -318,27 +356,8 @@ def po_add(request):
 
                 po.save()
 
-                # Process line items
-                item_count = 0
-                for key in request.POST:
-                    if key.startswith('product_'):
-                        index = key.split('_')[1]
-                        product_id = request.POST.get(f'product_{index}')
-                        quantity = request.POST.get(f'quantity_{index}', '0')
-                        unit_price = request.POST.get(f'unit_price_{index}', '0')
-
-                        if product_id and quantity and float(quantity) > 0:
-                            product = get_object_or_404(Product, id=product_id)
-                            PurchaseOrderItem.objects.create(
-                                purchase_order=po,
-                                product=product,
-                                quantity_ordered=int(quantity),
-                                unit_price=float(unit_price),
-                            )
-                            item_count += 1
-
-                if item_count == 0:
-                    raise ValueError('At least one line item is required')
+                # Save line items in bulk
+                item_count, _updated, _deleted = PO_LINES.save(po, rows, existing=False)
 
                 messages.success(request, f'Purchase Order {po.po_number} created successfully with {item_count} items!')
                 return redirect('po_detail', po_id=po.id)
@@ -349,9 +368,9 @@ def po_add(request):
             messages.error(request, f'Error creating purchase order: {str(e)}')
 
     # Get data for form
-    vendors = Vendor.objects.filter(is_active=True).order_by('name')
-    products = Product.objects.all().order_by('name')
-    currencies = Currency.objects.filter(is_active=True).order_by('code')
+    vendors = reference.vendors()
+    products = Product.objects.for_choices().order_by('name')
+    currencies = reference.currencies()
 
     context = {
         'vendors': vendors,
@@ -363,6 +382,7 @@ def po_add(request):
 
 
 @login_required
+@conditional(PURCHASE_ORDER, 'po_id')
 def po_detail(request, po_id):
     """View Purchase Order details"""
 
@@ -370,7 +390,7 @@ def po_detail(request, po_id):
         messages.error(request, 'You do not have permission to view purchase orders.')
         return redirect('dashboard')
 
-    po = get_object_or_404(PurchaseOrder, id=po_id)
+    po = get_object_or_404(PurchaseOrder.objects.for_detail(), id=po_id)
     items = po.items.all()
 
     context = {
@@ -402,6 +422,7 @@ def po_edit(request, po_id):
         try:
             with transaction.atomic():
                 # Update PO header
+                rows = PO_LINES.parse(request.POST)
                 vendor_id = request.POST.get('vendor')
                 po.external_po_number = request.POST.get('external_po_number', '').strip()
                 po.order_date = request.POST.get('order_date') or timezone.now().date()
@@ -419,30 +440,8 @@ def po_edit(request, po_id):
 
                 po.save()
 
-                # Delete existing items
-                po.items.all().delete()
-
-                # Add new items
-                item_count = 0
-                for key in request.POST:
-                    if key.startswith('product_'):
-                        index = key.split('_')[1]
-                        product_id = request.POST.get(f'product_{index}')
-                        quantity = request.POST.get(f'quantity_{index}', '0')
-                        unit_price = request.POST.get(f'unit_price_{index}', '0')
-
-                        if product_id and quantity and float(quantity) > 0:
-                            product = get_object_or_404(Product, id=product_id)
-                            PurchaseOrderItem.objects.create(
-                                purchase_order=po,
-                                product=product,
-                                quantity_ordered=int(quantity),
-                                unit_price=float(unit_price),
-                            )
-                            item_count += 1
-
-                if item_count == 0:
-                    raise ValueError('At least one line item is required')
+                # Apply line changes as bulk inserts, updates and deletes
+                PO_LINES.save(po, rows)
 
                 messages.success(request, f'Purchase Order {po.po_number} updated successfully!')
                 return redirect('po_detail', po_id=po.id)
@@ -453,10 +452,10 @@ def po_edit(request, po_id):
             messages.error(request, f'Error updating purchase order: {str(e)}')
 
     # Get data for form
-    vendors = Vendor.objects.filter(is_active=True).order_by('name')
-    products = Product.objects.all().order_by('name')
-    currencies = Currency.objects.filter(is_active=True).order_by('code')
-    items = po.items.all()
+    vendors = reference.vendors()
+    products = Product.objects.for_choices().order_by('name')
+    currencies = reference.currencies()
+    items = po.items.select_related('product__unit_of_measure')
 
     context = {
         'po': po,
@@ -554,6 +553,7 @@ def quotation_add(request):
                     raise ValueError('Vendor is required')
 
                 vendor = get_object_or_404(Vendor, id=vendor_id)
+                rows = QUOTATION_LINES.parse(request.POST)
 
                 # Auto-generate quotation number
                 quotation_number = generate_quotation_number()
@@ -582,31 +582,8 @@ def quotation_add(request):
 
                 quotation.save()
 
-                # Process line items
-                item_count = 0
-                for key in request.POST:
-                    if key.startswith('product_'):
-                        index = key.split('_')[1]
-                        product_id = request.POST.get(f'product_{index}')
-                        quantity = request.POST.get(f'quantity_{index}', '0')
-                        unit_price = request.POST.get(f'unit_price_{index}', '0')
-                        vendor_sku = request.POST.get(f'vendor_sku_{index}', '').strip()
-                        lead_time = request.POST.get(f'lead_time_{index}', '0')
-
-                        if product_id and quantity and float(quantity) > 0:
-                            product = get_object_or_404(Product, id=product_id)
-                            QuotationItem.objects.create(
-                                quotation=quotation,
-                                product=product,
-                                quantity=int(quantity),
-                                unit_price=float(unit_price) if unit_price else 0,
-                                vendor_sku=vendor_sku,
-                                lead_time_days=int(lead_time) if lead_time else 0,
-                            )
-                            item_count += 1
-
-                if item_count == 0:
-                    raise ValueError('At least one line item is required')
+                # Save line items in bulk
+                item_count, _updated, _deleted = QUOTATION_LINES.save(quotation, rows, existing=False)
 
                 messages.success(request, f'Quotation {quotation.quotation_number} created successfully with {item_count} items!')
                 return redirect('quotation_detail', quotation_id=quotation.id)
@@ -617,9 +594,9 @@ def quotation_add(request):
             messages.error(request, f'Error creating quotation: {str(e)}')
 
     # Get data for form
-    vendors = Vendor.objects.filter(is_active=True).order_by('name')
-    products = Product.objects.all().order_by('name')
-    currencies = Currency.objects.filter(is_active=True).order_by('code')
+    vendors = reference.vendors()
+    products = Product.objects.for_choices().order_by('name')
+    currencies = reference.currencies()
 
     context = {
         'vendors': vendors,
@@ -632,6 +609,7 @@ def quotation_add(request):
 
 
 @login_required
+@conditional(QUOTATION, 'quotation_id')
 def quotation_detail(request, quotation_id):
     """View Quotation details"""
 
@@ -639,7 +617,7 @@ def quotation_detail(request, quotation_id):
         messages.error(request, 'You do not have permission to view quotations.')
         return redirect('dashboard')
 
-    quotation = get_object_or_404(Quotation, id=quotation_id)
+    quotation = get_object_or_404(Quotation.objects.for_detail(), id=quotation_id)
     items = quotation.items.all()
 
     context = {
@@ -672,6 +650,7 @@ def quotation_edit(request, quotation_id):
         try:
             with transaction.atomic():
                 # Update quotation header
+                rows = QUOTATION_LINES.parse(request.POST)
                 vendor_id = request.POST.get('vendor')
                 quotation.request_date = request.POST.get('request_date') or timezone.now().date()
                 valid_until = request.POST.get('valid_until')
@@ -689,34 +668,8 @@ def quotation_edit(request, quotation_id):
 
                 quotation.save()
 
-                # Delete existing items
-                quotation.items.all().delete()
-
-                # Add new items
-                item_count = 0
-                for key in request.POST:
-                    if key.startswith('product_'):
-                        index = key.split('_')[1]
-                        product_id = request.POST.get(f'product_{index}')
-                        quantity = request.POST.get(f'quantity_{index}', '0')
-                        unit_price = request.POST.get(f'unit_price_{index}', '0')
-                        vendor_sku = request.POST.get(f'vendor_sku_{index}', '').strip()
-                        lead_time = request.POST.get(f'lead_time_{index}', '0')
-
-                        if product_id and quantity and float(quantity) > 0:
-                            product = get_object_or_404(Product, id=product_id)
-                            QuotationItem.objects.create(
-                                quotation=quotation,
-                                product=product,
-                                quantity=int(quantity),
-                                unit_price=float(unit_price) if unit_price else 0,
-                                vendor_sku=vendor_sku,
-                                lead_time_days=int(lead_time) if lead_time else 0,
-                            )
-                            item_count += 1
-
-                if item_count == 0:
-                    raise ValueError('At least one line item is required')
+                # Apply line changes as bulk inserts, updates and deletes
+                QUOTATION_LINES.save(quotation, rows)
 
                 messages.success(request, f'Quotation {quotation.quotation_number} updated successfully!')
                 return redirect('quotation_detail', quotation_id=quotation.id)
@@ -727,10 +680,10 @@ def quotation_edit(request, quotation_id):
             messages.error(request, f'Error updating quotation: {str(e)}')
 
     # Get data for form
-    vendors = Vendor.objects.filter(is_active=True).order_by('name')
-    products = Product.objects.all().order_by('name')
-    currencies = Currency.objects.filter(is_active=True).order_by('code')
-    items = quotation.items.all()
+    vendors = reference.vendors()
+    products = Product.objects.for_choices().order_by('name')
+    currencies = reference.currencies()
+    items = quotation.items.select_related('product__unit_of_measure')
 
     context = {
         'quotation': quotation,
@@ -806,13 +759,16 @@ def quotation_to_po(request, quotation_id):
                 )
 
                 # Copy items from quotation to PO
-                for item in quotation.items.all():
-                    PurchaseOrderItem.objects.create(
+                PurchaseOrderItem.objects.bulk_create([
+                    PurchaseOrderItem(
                         purchase_order=po,
-                        product=item.product,
+                        product_id=item.product_id,
                         quantity_ordered=item.quantity,
                         unit_price=item.unit_price,
                     )
+                    for item in quotation.items.all()
+                ], batch_size=500)
+                refresh_totals(PurchaseOrder, [po.pk])
 
                 # Mark quotation as accepted
                 quotation.status = 'accepted'
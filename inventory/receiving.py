@@ -0,0 +1,159 @@
+"""
+Goods receiving - post a whole delivery against a purchase order in a fixed
+number of statements, however many lines it has
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import stats
+from .models import (
+    Product, PurchaseOrder, PurchaseOrderItem, Receiving, ReceivingItem, StockBalance, StockMovement,
+)
+from .stock import per_row, record_movements
+from .utils import generate_receiving_number
+
+# Purchase orders that can still take deliveries
+RECEIVABLE_STATUSES = ('approved', 'ordered', 'partially_received')
+
+
+def post_receipt(purchase_order_id, quantities, user, location=None, notes='', condition_notes=None):
+    """
+    Receive a delivery against a purchase order.
+
+    quantities is {po_item_id: quantity}; zero quantities are skipped and
+    none may exceed what is still outstanding on its line. Stock goes into
+    location, or each product's primary location. The order, its products
+    and their balances are locked in that order and by id; stock, balances
+    and quantity_received are raised with one UPDATE each, and the order
+    moves to partially_received or received from its summed line totals.
+    Raises ValueError, posting nothing, if any line is over-received.
+    Returns the completed Receiving.
+    """
+    condition_notes = condition_notes or {}
+    quantities = {int(pk): quantity for pk, quantity in quantities.items() if quantity}
+    if any(quantity < 0 for quantity in quantities.values()):
+        raise ValueError('Received quantities cannot be negative.')
+    if not quantities:
+        raise ValueError('No items to receive. Please enter quantities.')
+
+    with transaction.atomic():
+        purchase_order = (
+            PurchaseOrder.objects.select_for_update()
+            .only('id', 'po_number', 'status')
+            .get(pk=purchase_order_id)
+        )
+        if purchase_order.status not in RECEIVABLE_STATUSES:
+            raise ValueError(f'A {purchase_order.get_status_display().lower()} purchase order cannot be received.')
+
+        lines = {
+            line.pk: line
+            for line in PurchaseOrderItem.objects.filter(purchase_order_id=purchase_order.pk, pk__in=quantities)
+            .select_related('product')
+            .only('id', 'product_id', 'product__name', 'quantity_ordered', 'quantity_received')
+        }
+        missing = set(quantities) - set(lines)
+        if missing:
+            raise ValueError('Some lines do not belong to this purchase order.')
+        over = [
+            f'{lines[pk].product.name} ({quantity} received, {lines[pk].quantity_remaining} outstanding)'
+            for pk, quantity in sorted(quantities.items()) if quantity > lines[pk].quantity_remaining
+        ]
+        if over:
+            raise ValueError('Received more than ordered for ' + '; '.join(over))
+
+        # Whether this delivery completes the order, from its summed line totals
+        totals = PurchaseOrderItem.objects.filter(purchase_order_id=purchase_order.pk).aggregate(
+            ordered=Sum('quantity_ordered'), received=Sum('quantity_received'),
+        )
+        complete = totals['received'] + sum(quantities.values()) >= totals['ordered']
+
+        supply = defaultdict(int)
+        for pk, quantity in quantities.items():
+            supply[lines[pk].product_id] += quantity
+        products = list(
+            Product.objects.select_for_update()
+            .filter(pk__in=supply)
+            .only('id', 'quantity', 'min_quantity', 'location_id')
+            .order_by('pk')
+        )
+        location_id = getattr(location, 'pk', location)
+        primary = {product.pk: product.location_id for product in products}
+
+        now = timezone.now()
+        receiving = Receiving.objects.create(
+            receiving_number=generate_receiving_number(),
+            purchase_order_id=purchase_order.pk,
+            received_date=now,
+            received_by=user,
+            status='completed' if complete else 'partial',
+            notes=notes,
+        )
+        items = ReceivingItem.objects.bulk_create([
+            ReceivingItem(
+                receiving=receiving,
+                po_item_id=pk,
+                quantity_received=quantity,
+                location_id=location_id or primary[lines[pk].product_id],
+                condition_notes=condition_notes.get(pk, ''),
+            )
+            for pk, quantity in sorted(quantities.items())
+        ], batch_size=500)
+
+        Product.objects.filter(pk__in=supply).update(quantity=F('quantity') + per_row(supply), updated_at=now)
+        changes = []
+        for product in products:
+            old_quantity = product.quantity
+            product.quantity += supply[product.pk]
+            changes.append((product, old_quantity, product.quantity, product.min_quantity))
+        stats.quantities_changed(changes)
+
+        # Balance rows are created on first use, then locked and raised together
+        stocked = defaultdict(int)
+        for item in items:
+            if item.location_id:
+                stocked[lines[item.po_item_id].product_id, item.location_id] += item.quantity_received
+        if stocked:
+            StockBalance.objects.bulk_create(
+                [StockBalance(product_id=product_id, location_id=pk) for product_id, pk in stocked],
+                ignore_conflicts=True,
+            )
+            amounts = {}
+            for balance_id, product_id, pk in (
+                StockBalance.objects.select_for_update()
+                .filter(product_id__in={product_id for product_id, _ in stocked},
+                        location_id__in={pk for _, pk in stocked})
+                .order_by('product_id', 'location_id')
+                .values_list('id', 'product_id', 'location_id')
+            ):
+                if (product_id, pk) in stocked:
+                    amounts[balance_id] = stocked[product_id, pk]
+            StockBalance.objects.filter(pk__in=amounts).update(
+                quantity=F('quantity') + per_row(amounts), updated_at=now,
+            )
+
+        record_movements(
+            StockMovement(
+                product_id=lines[item.po_item_id].product_id,
+                movement_type='receipt',
+                quantity_change=item.quantity_received,
+                location_id=item.location_id,
+                reference=receiving.receiving_number,
+                created_by=user,
+            )
+            for item in items
+        )
+
+        PurchaseOrderItem.objects.filter(pk__in=quantities).update(
+            quantity_received=F('quantity_received') + per_row(quantities),
+        )
+        purchase_order.status = 'received' if complete else 'partially_received'
+        PurchaseOrder.objects.filter(pk=purchase_order.pk).update(status=purchase_order.status, updated_at=now)
+        stats.updated_in_bulk([purchase_order])
+
+        receiving.purchase_order = purchase_order
+        receiving.line_count = len(items)
+
+    return receiving
@@ -0,0 +1,123 @@
+"""
+Receiving Views - Goods received against purchase orders
+"""
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth.decorators import login_required
+from django.contrib import messages
+
+from .models import PurchaseOrder, Receiving, StorageLocation
+from .receiving import RECEIVABLE_STATUSES, post_receipt
+from .listing import paginate
+from . import reference, roles
+
+
+RECEIVING_SORTS = {
+    'newest': ('Newest first', '-received_date'),
+    'oldest': ('Oldest first', 'received_date'),
+}
+
+
+# ==================== Receiving Management ====================
+
+@login_required
+def receiving_list(request):
+    """List goods receipts - warehouse supervisors and managers can view"""
+    if not roles.can_manage_inventory(request.user):
+        messages.error(request, 'You do not have permission to view receivings.')
+        return redirect('dashboard')
+
+    listing = paginate(
+        request,
+        Receiving.objects.for_list(),
+        sorts=RECEIVING_SORTS,
+        default_sort='newest',
+        status_choices=Receiving.STATUS_CHOICES,
+        date_field='received_date',
+        owner_field='received_by',
+    )
+
+    # Purchase orders still expecting deliveries, for the "receive against" picker
+    open_orders = PurchaseOrder.objects.for_list().filter(status__in=RECEIVABLE_STATUSES).order_by('po_number')
+
+    context = {
+        'receivings': listing.object_list,
+        'listing': listing,
+        'open_orders': open_orders,
+        'page_title': 'Goods Receiving',
+    }
+    return render(request, 'receiving/receiving_list.html', context)
+
+
+@login_required
+def receiving_create(request, po_id):
+    """Receive a delivery against a purchase order, posting every line at once"""
+    if not roles.can_manage_inventory(request.user):
+        messages.error(request, 'You do not have permission to receive stock.')
+        return redirect('dashboard')
+
+    purchase_order = get_object_or_404(PurchaseOrder.objects.for_detail(), id=po_id)
+
+    if purchase_order.status not in RECEIVABLE_STATUSES:
+        messages.error(request, f'A {purchase_order.get_status_display().lower()} purchase order cannot be received.')
+        return redirect('receiving_list')
+
+    lines = [line for line in purchase_order.items.all() if line.quantity_remaining > 0]
+
+    if request.method == 'POST':
+        try:
+            quantities, condition_notes = {}, {}
+            for line in lines:
+                try:
+                    quantity = int(request.POST.get(f'quantity_{line.id}') or 0)
+                except (ValueError, TypeError):
+                    raise ValueError(f'Quantity for {line.product.name} must be a valid number')
+                if quantity:
+                    quantities[line.id] = quantity
+                    condition_notes[line.id] = request.POST.get(f'condition_{line.id}', '').strip()
+
+            location = None
+            location_id = request.POST.get('location')
+            if location_id:
+                location = StorageLocation.objects.filter(id=location_id).first()
+                if location is None:
+                    raise ValueError('Invalid receiving location')
+
+            receiving = post_receipt(
+                purchase_order.pk, quantities, request.user, location=location,
+                notes=request.POST.get('notes', '').strip(), condition_notes=condition_notes,
+            )
+            messages.success(
+                request,
+                f'Receiving {receiving.receiving_number} posted {receiving.line_count} line(s); '
+                f'{purchase_order.po_number} is now {receiving.purchase_order.get_status_display().lower()}.'
+            )
+            return redirect('receiving_detail', receiving_id=receiving.id)
+
+        except ValueError as e:
+            messages.error(request, str(e))
+        except Exception as e:
+            messages.error(request, f'Error posting receipt: {str(e)}')
+
+    context = {
+        'purchase_order': purchase_order,
+        'lines': lines,
+        'locations': reference.storage_locations(),
+        'page_title': f'Receive {purchase_order.po_number}',
+    }
+    return render(request, 'receiving/receiving_create.html', context)
+
+
+@login_required
+def receiving_detail(request, receiving_id):
+    """View one goods receipt and the lines it posted"""
+    if not roles.can_manage_inventory(request.user):
+        messages.error(request, 'You do not have permission to view receivings.')
+        return redirect('dashboard')
+
+    receiving = get_object_or_404(Receiving.objects.for_detail(), id=receiving_id)
+
+    context = {
+        'receiving': receiving,
+        'page_title': f'Receiving {receiving.receiving_number or receiving.pk}',
+    }
+    return render(request, 'receiving/receiving_detail.html', context)
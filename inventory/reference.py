@@ -0,0 +1,45 @@
+"""
+Cached reads - the reference lists behind form dropdowns
+"""
+from .caching import CachedValue
+from .models import Currency, Department, Site, StorageLocation, UnitOfMeasure, Vendor
+
+
+def _active(model, order):
+    return CachedValue(
+        f'active-{model._meta.model_name}',
+        lambda: list(model.objects.filter(is_active=True).order_by(order)),
+        depends_on=(model,),
+    )
+
+
+ACTIVE_LOCATIONS = _active(StorageLocation, 'code')
+ACTIVE_UNITS = _active(UnitOfMeasure, 'name')
+ACTIVE_VENDORS = _active(Vendor, 'name')
+ACTIVE_CURRENCIES = _active(Currency, 'code')
+ACTIVE_DEPARTMENTS = _active(Department, 'code')
+ACTIVE_SITES = _active(Site, 'code')
+
+
+def storage_locations():
+    return ACTIVE_LOCATIONS.get()
+
+
+def units_of_measure():
+    return ACTIVE_UNITS.get()
+
+
+def vendors():
+    return ACTIVE_VENDORS.get()
+
+
+def currencies():
+    return ACTIVE_CURRENCIES.get()
+
+
+def departments():
+    return ACTIVE_DEPARTMENTS.get()
+
+
+def sites():
+    return ACTIVE_SITES.get()
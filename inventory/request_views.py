@@ -5,19 +5,45 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
+from django.urls import reverse
 from datetime import datetime
 
-from .models import ItemRequest, ItemRequestLine, Product, Department, Site
+from .models import ItemRequest, ItemRequestLine, Product
 from .forms import ItemRequestForm, ItemRequestLineFormSet
 from .utils import generate_request_number
+from .listing import paginate
+from .conditional import ITEM_REQUEST, conditional
+from .approvals import can_decide, cancel_requests, decide_requests
+from . import reference
+
+
+REQUEST_SORTS = {
+    'newest': ('Newest first', '-created_at'),
+    'oldest': ('Oldest first', 'created_at'),
+}
 
 
 @login_required
 def request_list(request):
     """List all item requests"""
-    requests = ItemRequest.objects.all().order_by('-created_at')
+    listing = paginate(
+        request,
+        ItemRequest.objects.for_list(),
+        sorts=REQUEST_SORTS,
+        default_sort='newest',
+        status_choices=ItemRequest.STATUS_CHOICES,
+        date_field='created_at',
+        owner_field='requested_by',
+    )
+    # Pending rows on this page the user may approve or reject from the list
+    decidable = {
+        item_request.pk for item_request in listing.object_list
+        if item_request.status == 'pending' and can_decide(request.user, item_request)
+    }
     context = {
-        'requests': requests,
+        'requests': listing.object_list,
+        'listing': listing,
+        'decidable': decidable,
         'page_title': 'Item Requests',
     }
     return render(request, 'requests/request_list.html', context)
@@ -67,9 +93,9 @@ def request_add(request):
         'formset': formset,
         'page_title': 'New Item Request',
         'is_edit': False,
-        'products': Product.objects.filter(quantity__gt=0).order_by('name'),
-        'departments': Department.objects.filter(is_active=True),
-        'sites': Site.objects.filter(is_active=True),
+        'products': Product.objects.for_choices().filter(quantity__gt=0).order_by('name'),
+        'departments': reference.departments(),
+        'sites': reference.sites(),
     }
     return render(request, 'requests/request_form.html', context)
 
@@ -126,18 +152,19 @@ def request_edit(request, request_id):
         'page_title': f'Edit Request {item_request.request_number}',
         'is_edit': True,
         'item_request': item_request,
-        'products': Product.objects.all().order_by('name'),
-        'departments': Department.objects.filter(is_active=True),
-        'sites': Site.objects.filter(is_active=True),
+        'products': Product.objects.for_choices().order_by('name'),
+        'departments': reference.departments(),
+        'sites': reference.sites(),
     }
     return render(request, 'requests/request_form.html', context)
 
 
 @login_required
+@conditional(ITEM_REQUEST, 'request_id')
 def request_detail(request, request_id):
     """View item request details"""
-    item_request = get_object_or_404(ItemRequest, id=request_id)
-    lines = item_request.items.all()
+    item_request = get_object_or_404(ItemRequest.objects.for_detail(), id=request_id)
+    lines = item_request.items.select_related('product__unit_of_measure', 'destination_site')
 
     context = {
         'item_request': item_request,
@@ -198,22 +225,16 @@ def request_approve(request, request_id):
 
     if request.method == 'POST':
         try:
-            with transaction.atomic():
-                item_request.status = 'approved'
-                item_request.approved_by = request.user
-                item_request.approved_date = datetime.now()
-                item_request.save()
-
-                # Auto-approve all line items with requested quantities
-                for line in item_request.items.all():
-                    line.quantity_approved = line.quantity_requested
-                    line.save()
-
+            # Approves every line with its requested quantity
+            decision, = decide_requests(request.user, [item_request.pk], approve=True)
+            if decision.ok:
                 messages.success(
                     request,
                     f'Request {item_request.request_number} has been approved successfully!'
                 )
-                return redirect('request_detail', request_id=request_id)
+            else:
+                messages.error(request, decision.message)
+            return redirect('request_detail', request_id=request_id)
 
         except Exception as e:
             messages.error(request, f'Error approving request: {str(e)}')
@@ -248,19 +269,79 @@ def request_reject(request, request_id):
             return redirect('request_detail', request_id=request_id)
 
         try:
-            item_request.status = 'rejected'
-            item_request.approved_by = request.user
-            item_request.approved_date = datetime.now()
-            item_request.rejection_reason = rejection_reason
-            item_request.save()
-
-            messages.warning(
-                request,
-                f'Request {item_request.request_number} has been rejected.'
-            )
+            decision, = decide_requests(request.user, [item_request.pk], approve=False, reason=rejection_reason)
+            if decision.ok:
+                messages.warning(
+                    request,
+                    f'Request {item_request.request_number} has been rejected.'
+                )
+            else:
+                messages.error(request, decision.message)
             return redirect('request_detail', request_id=request_id)
 
         except Exception as e:
             messages.error(request, f'Error rejecting request: {str(e)}')
 
     return redirect('request_detail', request_id=request_id)
+
+
+@login_required
+def request_cancel(request, request_id):
+    """Cancel an approved or partly issued request, releasing its reserved stock (only department heads)"""
+    item_request = get_object_or_404(ItemRequest, id=request_id)
+
+    if not can_decide(request.user, item_request):
+        messages.error(request, 'You do not have permission to cancel this request.')
+        return redirect('request_detail', request_id=request_id)
+
+    if request.method == 'POST':
+        try:
+            decision, = cancel_requests(request.user, [item_request.pk])
+            if decision.ok:
+                messages.warning(request, f'Request {item_request.request_number} has been cancelled.')
+            else:
+                messages.error(request, decision.message)
+        except Exception as e:
+            messages.error(request, f'Error cancelling request: {str(e)}')
+
+    return redirect('request_detail', request_id=request_id)
+
+
+@login_required
+def request_bulk_decide(request):
+    """Approve or reject the requests ticked on the request list (department heads)"""
+    back = reverse('request_list')
+    if request.POST.get('query'):
+        back = f"{back}?{request.POST['query']}"
+
+    if request.method != 'POST':
+        return redirect(back)
+
+    action = request.POST.get('action')
+    try:
+        request_ids = [int(value) for value in request.POST.getlist('request_ids')]
+    except ValueError:
+        request_ids = []
+    if action not in ('approve', 'reject') or not request_ids:
+        messages.error(request, 'Select at least one request and choose Approve or Reject.')
+        return redirect(back)
+
+    try:
+        decisions = decide_requests(
+            request.user, request_ids,
+            approve=action == 'approve',
+            reason=request.POST.get('rejection_reason', '').strip(),
+        )
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect(back)
+
+    # One line for everything that went through, one per request that did not
+    done = [decision.request_number for decision in decisions if decision.ok]
+    if done:
+        verb = 'Approved' if action == 'approve' else 'Rejected'
+        messages.success(request, f'{verb} {len(done)} request(s): {", ".join(done)}')
+    for decision in decisions:
+        if not decision.ok:
+            messages.error(request, f'{decision.request_number or decision.request_id}: {decision.message}')
+    return redirect(back)
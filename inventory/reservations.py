@@ -0,0 +1,79 @@
+"""
+Stock reservations - the open quantity (approved less issued) of lines on
+approved and partly issued requests is held against the product in
+Product.reserved_quantity, so available-to-promise is a single column
+"""
+from collections import defaultdict
+
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ItemRequestLine, Product
+from .stock import per_row
+
+# Requests whose open lines hold stock
+RESERVING_STATUSES = ('approved', 'issued')
+
+
+def reserve(amounts):
+    """Add {product_id: quantity} to the products' reservations in one UPDATE"""
+    amounts = {pk: amount for pk, amount in amounts.items() if amount}
+    if amounts:
+        Product.objects.filter(pk__in=amounts).update(
+            reserved_quantity=F('reserved_quantity') + per_row(amounts), updated_at=timezone.now(),
+        )
+
+
+def release(amounts):
+    """Take {product_id: quantity} off the products' reservations in one UPDATE"""
+    amounts = {pk: amount for pk, amount in amounts.items() if amount}
+    if amounts:
+        Product.objects.filter(pk__in=amounts).update(
+            reserved_quantity=F('reserved_quantity') - per_row(amounts), updated_at=timezone.now(),
+        )
+
+
+def open_quantities(request_ids):
+    """{product_id: open quantity} over the lines of the given requests"""
+    totals = defaultdict(int)
+    for product_id, quantity in (
+        ItemRequestLine.objects
+        .filter(item_request_id__in=request_ids, quantity_approved__gt=F('quantity_issued'))
+        .order_by()
+        .values_list('product_id')
+        .annotate(open=Sum(F('quantity_approved') - F('quantity_issued')))
+    ):
+        totals[product_id] += quantity
+    return totals
+
+
+# ==================== Reconciliation ====================
+
+def expected_reserved():
+    """Correlated subquery giving each product's reservation recomputed from its open lines"""
+    open_lines = (
+        ItemRequestLine.objects.filter(
+            product=OuterRef('pk'),
+            item_request__status__in=RESERVING_STATUSES,
+            quantity_approved__gt=F('quantity_issued'),
+        )
+        .order_by()
+        .values('product')
+        .annotate(reserved=Sum(F('quantity_approved') - F('quantity_issued')))
+        .values('reserved')
+    )
+    return Coalesce(Subquery(open_lines), Value(0))
+
+
+def find_drift():
+    """Products whose stored reservation no longer matches their open lines, with the expected value annotated"""
+    return Product.objects.annotate(expected_reserved=expected_reserved()).exclude(
+        reserved_quantity=F('expected_reserved'),
+    )
+
+
+def refresh_reservations(ids=None):
+    """Recompute reservations for the given products (all of them if ids is None) in one UPDATE"""
+    products = Product.objects.all() if ids is None else Product.objects.filter(pk__in=ids)
+    return products.update(reserved_quantity=expected_reserved(), updated_at=timezone.now())
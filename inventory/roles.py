@@ -0,0 +1,139 @@
+"""
+Role resolution - a user's group names, loaded once per request and cached across requests
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+
+INVENTORY_MANAGERS = ('Warehouse Supervisor', 'Warehouse Manager')
+WAREHOUSE_STAFF = ('Warehouse Staff', 'Warehouse Supervisor', 'Warehouse Manager')
+PROCUREMENT_MANAGERS = ('Warehouse Manager',)
+
+VERSION_KEY = 'inventory:roles:version'
+
+
+def _cache_key(user_id):
+    version = cache.get_or_set(VERSION_KEY, 1, None)
+    return f'inventory:roles:{version}:{user_id}'
+
+
+def user_roles(user):
+    """
+    Names of the groups a user belongs to, as a frozenset.
+
+    The result is kept on the user object for the rest of the request and in
+    the cache between requests; the signal handlers below drop cached entries
+    when group membership changes.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_inventory_roles', None)
+    if roles is None:
+        key = _cache_key(user.pk)
+        roles = cache.get(key)
+        if roles is None:
+            roles = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(key, roles, getattr(settings, 'ROLE_CACHE_TIMEOUT', 300))
+        user._inventory_roles = roles
+    return roles
+
+
+def has_role(user, names):
+    """True for superusers and members of any of the named groups"""
+    return user.is_superuser or not user_roles(user).isdisjoint(names)
+
+
+def can_manage_inventory(user):
+    return has_role(user, INVENTORY_MANAGERS)
+
+
+def can_issue_items(user):
+    return has_role(user, WAREHOUSE_STAFF)
+
+
+def can_procure(user):
+    return has_role(user, PROCUREMENT_MANAGERS)
+
+
+def can_view_diagnostics(user):
+    """Staff only: diagnostics expose per-view SQL timings, which no warehouse role needs"""
+    return user.is_active and (user.is_staff or user.is_superuser)
+
+
+async def acheck(request, check):
+    """
+    Run a check such as can_manage_inventory from an async view.
+
+    request.user is replaced by the resolved user, so a template rendered
+    afterwards does not load the user a second time.
+    """
+    user = await request.auser()
+    request.user = user
+    return await sync_to_async(check)(user)
+
+
+# ==================== Invalidation ====================
+
+def forget_user_roles(user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def forget_all_roles():
+    """Start a new key version so every cached entry is ignored"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed handler for User.groups, from either side of the relation"""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        forget_user_roles([instance.pk])
+    elif pk_set:
+        forget_user_roles(pk_set)
+    else:
+        # group.user_set.clear() does not say which users were removed
+        forget_all_roles()
+
+
+def group_changed(sender, **kwargs):
+    """post_save / post_delete handler for Group - a rename or delete affects all members"""
+    forget_all_roles()
+
+
+# ==================== Templates ====================
+
+class Roles:
+    """Role checks for templates, evaluated on first use"""
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def names(self):
+        return user_roles(self.user)
+
+    @property
+    def can_manage_inventory(self):
+        return can_manage_inventory(self.user)
+
+    @property
+    def can_issue_items(self):
+        return can_issue_items(self.user)
+
+    @property
+    def can_procure(self):
+        return can_procure(self.user)
+
+    @property
+    def can_view_diagnostics(self):
+        return can_view_diagnostics(self.user)
+
+
+def roles(request):
+    """Context processor exposing the current user's roles as {{ roles }}"""
+    return {'roles': Roles(request.user)}
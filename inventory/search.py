@@ -0,0 +1,236 @@
+"""
+Product full-text search - SQLite FTS5 or PostgreSQL tsvector, depending on the backend
+"""
+import re
+
+from django.db import OperationalError, connection as default_connection
+from django.db.models import Q
+
+from .models import Product
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Nobody pages this deep; it also keeps OFFSET within the database's integer range
+MAX_OFFSET = 10000
+
+FTS_TABLE = 'inventory_product_fts'
+
+SQLITE_TRIGGERS = {
+    'inventory_product_fts_ai': """
+        CREATE TRIGGER IF NOT EXISTS inventory_product_fts_ai AFTER INSERT ON inventory_product BEGIN
+            INSERT INTO inventory_product_fts(rowid, name, sku, description)
+            VALUES (new.id, new.name, coalesce(new.sku, ''), new.description);
+        END
+    """,
+    'inventory_product_fts_ad': """
+        CREATE TRIGGER IF NOT EXISTS inventory_product_fts_ad AFTER DELETE ON inventory_product BEGIN
+            INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, sku, description)
+            VALUES ('delete', old.id, old.name, coalesce(old.sku, ''), old.description);
+        END
+    """,
+    'inventory_product_fts_au': """
+        CREATE TRIGGER IF NOT EXISTS inventory_product_fts_au
+        AFTER UPDATE OF name, sku, description ON inventory_product BEGIN
+            INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, sku, description)
+            VALUES ('delete', old.id, old.name, coalesce(old.sku, ''), old.description);
+            INSERT INTO inventory_product_fts(rowid, name, sku, description)
+            VALUES (new.id, new.name, coalesce(new.sku, ''), new.description);
+        END
+    """,
+}
+
+SQLITE_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS inventory_product_fts USING fts5(
+        name, sku, description,
+        content='inventory_product', content_rowid='id',
+        tokenize='unicode61'
+    )
+"""
+
+POSTGRES_STATEMENTS = [
+    """
+    ALTER TABLE inventory_product ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(sku, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS inventory_product_search_idx
+    ON inventory_product USING GIN (search_vector)
+    """,
+]
+
+# bm25() column weights for name, sku, description
+SQLITE_WEIGHTS = (10.0, 10.0, 1.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchResults:
+    """A page of ranked search results"""
+
+    def __init__(self, products, query, page, page_size, has_next):
+        self.products = products
+        self.query = query
+        self.page = page
+        self.page_size = page_size
+        self.has_next = has_next
+        self.has_previous = page > 1
+
+    @property
+    def next_page(self):
+        return self.page + 1
+
+    @property
+    def previous_page(self):
+        return self.page - 1
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def __len__(self):
+        return len(self.products)
+
+
+# ==================== Index Maintenance ====================
+
+def _sqlite_has_fts(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+    return cursor.fetchone() is not None
+
+
+def install_search_index(connection=None):
+    """
+    Create the search index for the active backend if it is missing.
+
+    Safe to run repeatedly. On SQLite, schema changes to inventory_product
+    rebuild the table and drop its triggers, so this also runs after every
+    migrate to restore them and rebuild the FTS content.
+    """
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(SQLITE_TABLE)
+            except OperationalError:
+                # SQLite compiled without FTS5: search falls back to LIKE lookups
+                return False
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'inventory_product'"
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            if missing:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            return True
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_STATEMENTS:
+                cursor.execute(statement)
+            return True
+    return False
+
+
+def remove_search_index(connection=None):
+    """Drop the search index objects created by install_search_index"""
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS inventory_product_search_idx')
+            cursor.execute('ALTER TABLE inventory_product DROP COLUMN IF EXISTS search_vector')
+
+
+def rebuild_search_index(connection=None):
+    """Re-sync the SQLite FTS table with inventory_product (PostgreSQL needs nothing)"""
+    connection = connection or default_connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            if _sqlite_has_fts(cursor):
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+# ==================== Queries ====================
+
+def _tokens(query):
+    return TOKEN_RE.findall(query or '')[:10]
+
+
+def _sqlite_match(tokens):
+    # Every token must match, as a prefix, in any column
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _postgres_tsquery(tokens):
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def _search_ids(tokens, limit, offset):
+    """Return ranked product ids, or None when no full-text index is available"""
+    connection = default_connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            if not _sqlite_has_fts(cursor):
+                return None
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, %s, %s, %s), rowid LIMIT %s OFFSET %s",
+                [_sqlite_match(tokens), *SQLITE_WEIGHTS, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT id FROM inventory_product "
+                "WHERE search_vector @@ to_tsquery('simple', %s) "
+                "ORDER BY ts_rank(search_vector, to_tsquery('simple', %s)) DESC, id "
+                "LIMIT %s OFFSET %s",
+                [_postgres_tsquery(tokens), _postgres_tsquery(tokens), limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+    return None
+
+
+def _fallback_ids(tokens, limit, offset):
+    queryset = Product.objects.all()
+    for token in tokens:
+        queryset = queryset.filter(
+            Q(name__icontains=token) | Q(sku__icontains=token) | Q(description__icontains=token)
+        )
+    return list(queryset.order_by('name', 'id').values_list('id', flat=True)[offset:offset + limit])
+
+
+def search_products(query, page=1, page_size=DEFAULT_PAGE_SIZE, queryset=None):
+    """
+    Ranked product search over name, SKU and description.
+
+    Tokens are prefix-matched and all must match, so "bolt m8" finds
+    "Hex Bolt M8x40". Name and SKU hits rank above description hits.
+    Pass queryset to control select_related/only() on the returned rows.
+    """
+    tokens = _tokens(query)
+    page = max(1, page)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    if not tokens:
+        return SearchResults([], query, page, page_size, has_next=False)
+
+    offset = (page - 1) * page_size
+    if offset > MAX_OFFSET:
+        return SearchResults([], query, page, page_size, has_next=False)
+    ids = _search_ids(tokens, page_size + 1, offset)
+    if ids is None:
+        ids = _fallback_ids(tokens, page_size + 1, offset)
+
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+
+    queryset = queryset if queryset is not None else Product.objects.for_list()
+    by_id = queryset.in_bulk(ids)
+    products = [by_id[pk] for pk in ids if pk in by_id]
+    return SearchResults(products, query, page, page_size, has_next)
@@ -0,0 +1,204 @@
+"""
+Dashboard statistics - counts kept in StatCounter rows and moved by +1/-1 as
+records are created, deleted or change status, so reading them costs one query
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import ItemIssuance, ItemRequest, Product, PurchaseOrder, Quotation, StatCounter, Vendor
+
+
+class Counter:
+    """
+    One maintained count: the rows of model matching condition.
+
+    condition is a Q for rebuilding the count in SQL; test is the same rule
+    applied to an instance, used to tell whether a save moved a row in or
+    out of the count. fields are the model fields test reads.
+    """
+
+    def __init__(self, name, model, condition=None, test=None, fields=()):
+        self.name = name
+        self.model = model
+        self.condition = condition
+        self.test = test
+        self.fields = fields
+
+    def matches(self, instance):
+        return self.test is None or self.test(instance)
+
+
+PENDING_PO_STATUSES = ('draft', 'submitted')
+
+COUNTERS = [
+    Counter('total_products', Product),
+    Counter('low_stock_count', Product, Q(quantity__lte=F('min_quantity')),
+            lambda product: product.quantity <= product.min_quantity, ('quantity', 'min_quantity')),
+    Counter('pending_requests', ItemRequest, Q(status='pending'),
+            lambda item_request: item_request.status == 'pending', ('status',)),
+    Counter('total_issuances', ItemIssuance),
+    Counter('total_vendors', Vendor, Q(is_active=True),
+            lambda vendor: vendor.is_active, ('is_active',)),
+    Counter('total_pos', PurchaseOrder),
+    Counter('pending_pos', PurchaseOrder, Q(status__in=PENDING_PO_STATUSES),
+            lambda po: po.status in PENDING_PO_STATUSES, ('status',)),
+    Counter('total_quotations', Quotation),
+]
+
+COUNTED_MODELS = {counter.model for counter in COUNTERS}
+
+
+def _counters_for(model):
+    return [counter for counter in COUNTERS if counter.model is model]
+
+
+# ==================== Reading ====================
+
+def dashboard_counts():
+    """All counters as {name: value}; the first call on an empty table builds them"""
+    values = dict(StatCounter.objects.values_list('name', 'value'))
+    if len(values) < len(COUNTERS):
+        values = rebuild_counters()
+    return values
+
+
+async def adashboard_counts():
+    """dashboard_counts() for async views"""
+    values = {name: value async for name, value in StatCounter.objects.values_list('name', 'value')}
+    if len(values) < len(COUNTERS):
+        values = await sync_to_async(rebuild_counters)()
+    return values
+
+
+# ==================== Rebuilding ====================
+
+def expected_counts():
+    """Every counter recomputed from its table - one conditional-aggregation query per model"""
+    values = {}
+    for model in COUNTED_MODELS:
+        values.update(model.objects.aggregate(**{
+            counter.name: Count('pk', filter=counter.condition) if counter.condition else Count('pk')
+            for counter in _counters_for(model)
+        }))
+    return values
+
+
+def rebuild_counters(models=None):
+    """Reset counters (all, or those of the given models) to their recomputed values"""
+    values = expected_counts()
+    if models is not None:
+        names = {counter.name for counter in COUNTERS if counter.model in models}
+        values = {name: value for name, value in values.items() if name in names}
+    now = timezone.now()
+    StatCounter.objects.bulk_create(
+        [StatCounter(name=name, value=value, updated_at=now) for name, value in values.items()],
+        update_conflicts=True, unique_fields=['name'], update_fields=['value', 'updated_at'],
+    )
+    return values
+
+
+# ==================== Incremental Updates ====================
+
+def _apply(deltas):
+    # A counter row that does not exist yet is skipped; the next read builds it
+    for name, delta in deltas.items():
+        if delta:
+            StatCounter.objects.filter(name=name).update(value=F('value') + delta, updated_at=timezone.now())
+
+
+def _state(instance):
+    """Which counters an instance is in, or None if their fields were not loaded"""
+    counters = _counters_for(type(instance))
+    deferred = instance.get_deferred_fields()
+    if any(field in deferred for counter in counters for field in counter.fields):
+        return None
+    return frozenset(counter.name for counter in counters if counter.matches(instance))
+
+
+def track(instance):
+    """Remember the instance's current state as the baseline for its next save"""
+    instance._stat_state = _state(instance)
+
+
+def loaded(sender, instance, **kwargs):
+    """post_init handler - baseline for rows loaded from the database"""
+    # _state.adding is not set yet during __init__; unsaved instances have no pk
+    if instance.pk is not None:
+        track(instance)
+
+
+def saving(sender, instance, raw=False, **kwargs):
+    """pre_save handler - fetch the baseline when the instance was loaded with fields deferred"""
+    if raw or instance._state.adding or getattr(instance, '_stat_state', None) is not None:
+        return
+    fields = {field for counter in _counters_for(sender) for field in counter.fields}
+    stored = sender.objects.filter(pk=instance.pk).only(*fields).first() if fields else None
+    instance._stat_state = _state(stored) if stored is not None else None
+
+
+def saved(sender, instance, created, raw=False, **kwargs):
+    """post_save handler - move the instance between counters"""
+    if raw:
+        return
+    before = frozenset() if created else getattr(instance, '_stat_state', None)
+    after = _state(instance)
+    if before is None or after is None:
+        return
+    deltas = {name: 1 for name in after - before}
+    deltas.update({name: -1 for name in before - after})
+    _apply(deltas)
+    instance._stat_state = after
+
+
+def deleted(sender, instance, **kwargs):
+    """post_delete handler - drop the row from every counter it was in"""
+    state = getattr(instance, '_stat_state', None)
+    if state is None:
+        state = _state(instance)
+    if state is None:
+        # Loaded with the counted fields deferred and now gone - recount this model
+        rebuild_counters([sender])
+        return
+    _apply({name: -1 for name in state})
+
+
+def created_in_bulk(instances):
+    """Count rows inserted with bulk_create, which sends no signals"""
+    deltas = {}
+    for instance in instances:
+        for name in _state(instance) or ():
+            deltas[name] = deltas.get(name, 0) + 1
+        track(instance)
+    _apply(deltas)
+
+
+def updated_in_bulk(instances):
+    """Move counters for rows changed with update(), which sends no signals; instances carry the new values"""
+    deltas = {}
+    for instance in instances:
+        before = getattr(instance, '_stat_state', None)
+        after = _state(instance)
+        if before is None or after is None:
+            rebuild_counters([type(instance)])
+            return
+        for name in after - before:
+            deltas[name] = deltas.get(name, 0) + 1
+        for name in before - after:
+            deltas[name] = deltas.get(name, 0) - 1
+        instance._stat_state = after
+    _apply(deltas)
+
+
+def quantity_changed(product, old_quantity, new_quantity, min_quantity):
+    """Keep the low-stock count right when stock moves with UPDATE, which sends no signals"""
+    quantities_changed([(product, old_quantity, new_quantity, min_quantity)])
+
+
+def quantities_changed(changes):
+    """quantity_changed() for many products at once; changes is [(product, old, new, min_quantity)]"""
+    delta = 0
+    for product, old_quantity, new_quantity, min_quantity in changes:
+        delta += (new_quantity <= min_quantity) - (old_quantity <= min_quantity)
+        track(product)
+    _apply({'low_stock_count': delta})
@@ -0,0 +1,366 @@
+"""
+Stock ledger services - movement recording, per-location balances, checkpoints
+and point-in-time balances
+"""
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.utils import timezone
+
+from . import stats
+from .models import Product, StockBalance, StockMovement, StockCheckpoint
+
+
+class InsufficientStock(ValueError):
+    """Raised when a withdrawal would take a balance below zero"""
+
+
+def _pk(value):
+    return getattr(value, 'pk', value)
+
+
+# ==================== Movements ====================
+
+def record_movement(product, quantity_change, movement_type, reference='', user=None, location=None):
+    """Append one movement to the ledger. Call inside the transaction that changes Product.quantity."""
+    if not quantity_change:
+        return None
+    return StockMovement.objects.create(
+        product=product,
+        movement_type=movement_type,
+        quantity_change=quantity_change,
+        location=location if location is not None else product.location,
+        reference=reference,
+        created_by=user,
+    )
+
+
+def record_movements(movements):
+    """Append many unsaved StockMovement rows with a single bulk insert"""
+    movements = [movement for movement in movements if movement.quantity_change]
+    if movements:
+        StockMovement.objects.bulk_create(movements, batch_size=500)
+    return movements
+
+
+# ==================== Location Balances ====================
+
+def adjust_balance(product, location, quantity_change):
+    """
+    Apply a signed change to the product's balance at one location.
+
+    The row is created on first use; decrements are a conditional UPDATE
+    that only matches while enough stock remains, so a balance never goes
+    negative.
+    """
+    if not quantity_change:
+        return
+    balance, _ = StockBalance.objects.get_or_create(product_id=_pk(product), location_id=_pk(location))
+    updated = StockBalance.objects.filter(
+        pk=balance.pk, quantity__gte=-quantity_change,
+    ).update(quantity=F('quantity') + quantity_change, updated_at=timezone.now())
+    if not updated:
+        raise InsufficientStock(f'Insufficient stock at that location. Available: {balance.quantity}')
+
+
+def locate_stock(product, quantity, on_hand=None, location=None):
+    """
+    Decide which locations a withdrawal of `quantity` is drawn from.
+
+    With a location, all of it must come from that bin. Otherwise the
+    primary location is used first, then the fullest bins, then any stock
+    not assigned to a location. Returns a list of (location_id, quantity)
+    where location_id is None for unassigned stock. The balance rows are
+    locked (in location order) until the transaction ends.
+    """
+    balances = list(
+        StockBalance.objects.select_for_update()
+        .filter(product_id=product.pk)
+        .order_by('location_id')
+        .values_list('location_id', 'quantity')
+    )
+    balances = [(location_id, available) for location_id, available in balances if available > 0]
+
+    if location is not None:
+        available = dict(balances).get(location.pk, 0)
+        if available < quantity:
+            raise InsufficientStock(
+                f'Insufficient stock for {product.name} at {location.code}. Available: {available}'
+            )
+        return [(location.pk, quantity)]
+
+    return plan_withdrawal(product, quantity, balances, product.quantity if on_hand is None else on_hand)
+
+
+def plan_withdrawal(product, quantity, balances, on_hand):
+    """
+    The locate_stock() ordering over balances already read and locked:
+    primary location first, then the fullest bins, then unassigned stock.
+    balances is [(location_id, available)] with available > 0.
+    """
+    balances = list(balances)
+    balances.sort(key=lambda balance: (balance[0] != product.location_id, -balance[1]))
+    unassigned = on_hand - sum(available for _, available in balances)
+    if unassigned > 0:
+        balances.append((None, unassigned))
+
+    plan = []
+    remaining = quantity
+    for location_id, available in balances:
+        if not remaining:
+            break
+        take = min(available, remaining)
+        plan.append((location_id, take))
+        remaining -= take
+    if remaining:
+        raise InsufficientStock(f'Insufficient stock for {product.name}. Available: {quantity - remaining}')
+    return plan
+
+
+def per_row(amounts):
+    """{pk: amount} as one CASE over primary keys (0 for other rows), for set-based UPDATEs"""
+    return Case(
+        *[When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()],
+        default=Value(0), output_field=IntegerField(),
+    )
+
+
+def _withdraw(product, plan, movement_type, reference, user):
+    for location_id, quantity in plan:
+        if location_id is not None:
+            adjust_balance(product, location_id, -quantity)
+    record_movements(
+        StockMovement(
+            product_id=product.pk,
+            movement_type=movement_type,
+            quantity_change=-quantity,
+            location_id=location_id,
+            reference=reference,
+            created_by=user,
+        )
+        for location_id, quantity in plan
+    )
+
+
+# ==================== Stock Mutations ====================
+#
+# All changes to on-hand stock go through the functions below. Product.quantity
+# is only changed with UPDATE ... SET quantity = quantity + n (conditional on
+# enough stock for decrements), never read, modified in Python and saved. Rows
+# are locked in one order - document, product, then balances by location id -
+# so concurrent callers queue instead of deadlocking or losing updates.
+
+def _change_on_hand(product, quantity_change):
+    """Apply a signed change to Product.quantity in one statement; returns the new quantity"""
+    products = Product.objects.filter(pk=product.pk)
+    if quantity_change < 0:
+        products = products.filter(quantity__gte=-quantity_change)
+    if not products.update(quantity=F('quantity') + quantity_change, updated_at=timezone.now()):
+        available = Product.objects.filter(pk=product.pk).values_list('quantity', flat=True).first() or 0
+        raise InsufficientStock(f'Insufficient stock for {product.name}. Available: {available}')
+    product.quantity, min_quantity = Product.objects.filter(pk=product.pk).values_list('quantity', 'min_quantity').get()
+    # UPDATE sends no signals; the low-stock count depends on quantity
+    stats.quantity_changed(product, product.quantity - quantity_change, product.quantity, min_quantity)
+    return product.quantity
+
+
+def receive_stock(product, quantity, location=None, movement_type='receipt', reference='', user=None):
+    """Add stock at a location (default: the product's primary location)"""
+    if quantity <= 0:
+        raise ValueError('Quantity must be greater than 0')
+    location_id = _pk(location) if location is not None else product.location_id
+    with transaction.atomic():
+        _change_on_hand(product, quantity)
+        if location_id:
+            adjust_balance(product, location_id, quantity)
+        record_movements([
+            StockMovement(product_id=product.pk, movement_type=movement_type, quantity_change=quantity,
+                          location_id=location_id, reference=reference, created_by=user),
+        ])
+
+
+def issue_stock(product, quantity, location=None, movement_type='issue', reference='', user=None):
+    """
+    Take stock out, from one location or spread as in locate_stock().
+
+    Raises InsufficientStock (a ValueError) if there is not enough; returns
+    the [(location_id, quantity)] plan that was drawn.
+    """
+    if quantity <= 0:
+        raise ValueError('Quantity must be greater than 0')
+    with transaction.atomic():
+        on_hand = _change_on_hand(product, -quantity) + quantity
+        plan = locate_stock(product, quantity, on_hand=on_hand, location=location)
+        _withdraw(product, plan, movement_type, reference, user)
+    return plan
+
+
+def move_stock(product, from_location, to_location, quantity, reference='', user=None):
+    """
+    Move quantity between two location balances; the product total is unchanged.
+
+    If the source was the product's primary location and is now empty, the
+    destination becomes the primary location.
+    """
+    from_id, to_id = _pk(from_location), _pk(to_location)
+    with transaction.atomic():
+        primary_id = Product.objects.select_for_update().values_list('location_id', flat=True).get(pk=product.pk)
+        StockBalance.objects.get_or_create(product_id=product.pk, location_id=to_id)
+        held = dict(
+            StockBalance.objects.select_for_update()
+            .filter(product_id=product.pk, location_id__in=[from_id, to_id])
+            .order_by('location_id')
+            .values_list('location_id', 'quantity')
+        )
+        if held.get(from_id, 0) < quantity:
+            raise InsufficientStock(
+                f'Insufficient stock for {product.name} at the source location. Available: {held.get(from_id, 0)}'
+            )
+        adjust_balance(product, from_id, -quantity)
+        adjust_balance(product, to_id, quantity)
+
+        record_movements([
+            StockMovement(product_id=product.pk, movement_type='transfer_out', quantity_change=-quantity,
+                          location_id=from_id, reference=reference, created_by=user),
+            StockMovement(product_id=product.pk, movement_type='transfer_in', quantity_change=quantity,
+                          location_id=to_id, reference=reference, created_by=user),
+        ])
+
+        if primary_id == from_id and held[from_id] == quantity:
+            Product.objects.filter(pk=product.pk).update(location_id=to_id)
+            primary_id = to_id
+    product.location_id = primary_id
+
+
+def set_stock_level(product, quantity, location=None, movement_type='adjustment', reference='', user=None):
+    """
+    Set a product's total quantity and primary location, e.g. from a manual edit.
+
+    The difference from the current (locked) quantity is posted as a
+    receipt into the primary location or an issue as in locate_stock().
+    Changing the primary location carries the stock held at the old one
+    along.
+    """
+    if quantity < 0:
+        raise ValueError('Quantity cannot be negative')
+    location_id = _pk(location)
+    # Ids posted from forms arrive as strings; compare them as the integers stored on the product
+    location_id = int(location_id) if location_id not in (None, '') else None
+    with transaction.atomic():
+        current = Product.objects.select_for_update().only('id', 'quantity', 'location_id').get(pk=product.pk)
+        product.location_id = current.location_id
+
+        if current.location_id and location_id and current.location_id != location_id:
+            held = StockBalance.objects.filter(
+                product_id=product.pk, location_id=current.location_id,
+            ).values_list('quantity', flat=True).first()
+            if held:
+                move_stock(product, current.location_id, location_id, held, reference, user)
+        if product.location_id != location_id:
+            Product.objects.filter(pk=product.pk).update(location_id=location_id)
+            product.location_id = location_id
+
+        product.quantity = current.quantity
+        change = quantity - current.quantity
+        if change > 0:
+            receive_stock(product, change, movement_type=movement_type, reference=reference, user=user)
+        elif change < 0:
+            issue_stock(product, -change, movement_type=movement_type, reference=reference, user=user)
+
+
+# ==================== Checkpoints ====================
+
+def latest_checkpoint(product_id, when=None):
+    checkpoints = StockCheckpoint.objects.filter(product_id=product_id)
+    if when is not None:
+        checkpoints = checkpoints.filter(as_of__lte=when)
+    return checkpoints.order_by('-as_of', '-id').first()
+
+
+def on_hand_at(product, when):
+    """
+    Quantity on hand for a product at a point in time.
+
+    Starts from the nearest checkpoint at or before `when` and adds only the
+    movements recorded after it, so the cost is bounded by the checkpoint
+    interval rather than the product's full history.
+    """
+    product_id = getattr(product, 'pk', product)
+    checkpoint = latest_checkpoint(product_id, when)
+
+    movements = StockMovement.objects.filter(product_id=product_id, created_at__lte=when)
+    balance = 0
+    if checkpoint:
+        movements = movements.filter(id__gt=checkpoint.last_movement_id)
+        balance = checkpoint.quantity
+
+    return balance + (movements.aggregate(total=Sum('quantity_change'))['total'] or 0)
+
+
+def _wait_for_movement_writers():
+    """
+    Let transactions still inserting movements commit before a boundary is read.
+
+    Movement ids are handed out at insert time but become visible at
+    commit, so without this a movement could commit below a boundary that
+    was already taken and never be counted. On PostgreSQL a SHARE lock
+    waits for open writers and holds new ones off until the checkpoint
+    commits; SQLite only ever has one writer, so it needs nothing.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {StockMovement._meta.db_table} IN SHARE MODE')
+
+
+def create_checkpoints():
+    """
+    Snapshot balances for every product with movements since its last checkpoint.
+
+    Each checkpoint covers every movement up to the highest committed
+    movement id when it is taken - by id, not by timestamp, since
+    created_at is stamped before the insert and does not follow id order.
+    One grouped query computes each product's delta since its latest
+    checkpoint; the new checkpoints are written with one bulk insert.
+    Returns the number of checkpoints created.
+    """
+    with transaction.atomic():
+        _wait_for_movement_writers()
+        as_of = timezone.now()
+        boundary = StockMovement.objects.aggregate(last=Max('id'))['last']
+        if boundary is None:
+            return 0
+
+        last_checkpoint = StockCheckpoint.objects.filter(
+            product_id=OuterRef('product_id'),
+        ).order_by('-last_movement_id', '-id')
+
+        deltas = (
+            StockMovement.objects
+            .filter(id__lte=boundary)
+            .annotate(checkpoint_movement_id=Subquery(last_checkpoint.values('last_movement_id')[:1]))
+            .filter(Q(checkpoint_movement_id__isnull=True) | Q(id__gt=F('checkpoint_movement_id')))
+            .order_by()
+            .values('product_id')
+            .annotate(delta=Sum('quantity_change'))
+        )
+        deltas = {row['product_id']: row['delta'] for row in deltas}
+        if not deltas:
+            return 0
+
+        previous = {
+            row['product_id']: row['quantity']
+            for row in StockCheckpoint.objects.filter(
+                id__in=Subquery(last_checkpoint.values('id')[:1]),
+                product_id__in=deltas.keys(),
+            ).values('product_id', 'quantity')
+        }
+
+        StockCheckpoint.objects.bulk_create([
+            StockCheckpoint(
+                product_id=product_id,
+                as_of=as_of,
+                quantity=previous.get(product_id, 0) + delta,
+                last_movement_id=boundary,
+            )
+            for product_id, delta in deltas.items()
+        ], batch_size=500)
+    return len(deltas)
@@ -0,0 +1,22 @@
+"""
+Test helpers
+"""
+from contextlib import contextmanager
+
+from .instrumentation import QueryStats
+
+
+class QueryBudgetMixin:
+    """Mix into a TestCase to fail any block that runs more queries than its budget"""
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        stats = QueryStats()
+        with stats.capture():
+            yield stats
+        if stats.count > budget:
+            message = f'{stats.count} queries executed, budget is {budget}'
+            repeated = stats.repeated(10)
+            if repeated:
+                message += '\nRepeated queries:\n' + '\n'.join(f'  {count}x {sql}' for sql, count in repeated)
+            self.fail(message)
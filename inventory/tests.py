@@ -1,3 +1,1353 @@
-from django.test import TestCase
+import csv
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Currency, Department, DocumentCounter, ItemIssuance, ItemRequest, ItemRequestLine, Product, PurchaseOrder, PurchaseOrderItem, Quotation, QuotationItem,
+    Receiving, ReceivingItem, StatCounter, StockBalance, StockCheckpoint, StockMovement, StorageLocation, Transfer, Vendor,
+)
+from .admin import ProductAdmin
+from .api import RESOURCES
+from .approvals import decide_requests
+from .benchmark import ROUTE_ARGUMENTS, benchmark_routes, is_async_route, route_cases, seed_data
+from .caching import CachedValue
+from .exports import DATASETS, stream_csv, stream_ndjson
+from .forms import ItemRequestLineForm
+from .importers import import_products, iter_csv_rows
+from .instrumentation import fingerprint, query_log
+from .issuance_views import ISSUANCE_SORTS
+from .lines import PO_LINES
+from .listing import encode_cursor, paginate
+from .picking import build_pick_list, plan_route, route_length
+from .procurement_views import DOCUMENT_SORTS, VENDOR_SORTS
+from .receiving import post_receipt
+from .receiving_views import RECEIVING_SORTS
+from .request_views import REQUEST_SORTS
+from .reservations import find_drift, refresh_reservations
+from .roles import can_manage_inventory, can_procure, user_roles
+from .search import search_products
+from .stats import adashboard_counts, created_in_bulk, dashboard_counts, expected_counts, rebuild_counters
+from .stock import (
+    InsufficientStock, create_checkpoints, issue_stock, move_stock, on_hand_at, receive_stock, set_stock_level,
+)
+from .testing import QueryBudgetMixin
+from .transfer_views import TRANSFER_SORTS
+from .utils import allocate_numbers, allocate_product_skus, generate_request_number
+from .views import PRODUCT_SORTS
+from .waves import issue_wave
+
+
+def run_threads(worker, count):
+    """Start `count` threads running worker(index) together and wait for them all"""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def target(index):
+        try:
+            barrier.wait()
+            worker(index)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=target, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    """
+    Hammer the stock service from many threads and check nothing is lost or oversold.
+
+    Run with DATABASE_URL pointing at PostgreSQL to exercise row locks; on
+    SQLite the same checks run against its database-level write lock.
+    """
+
+    THREADS = 16
+    OPERATIONS = 25
+
+    def setUp(self):
+        self.bin_a = StorageLocation.objects.create(name='Bin A', code='A')
+        self.bin_b = StorageLocation.objects.create(name='Bin B', code='B')
+        self.product = Product.objects.create(name='Widget', description='Test', sku='W-1', location=self.bin_a)
+
+    def assertConsistent(self, expected):
+        self.product.refresh_from_db()
+        ledger = StockMovement.objects.filter(product=self.product).aggregate(total=Sum('quantity_change'))['total']
+        balances = StockBalance.objects.filter(product=self.product).aggregate(total=Sum('quantity'))['total']
+        self.assertEqual(self.product.quantity, expected)
+        self.assertEqual(ledger or 0, expected)
+        self.assertEqual(balances or 0, expected)
+        self.assertFalse(StockBalance.objects.filter(quantity__lt=0).exists())
+
+    def test_concurrent_issues_never_oversell(self):
+        receive_stock(self.product, 200)
+        issued = []
+
+        def worker(index):
+            product = Product.objects.get(pk=self.product.pk)
+            for _ in range(self.OPERATIONS):
+                try:
+                    issue_stock(product, 1, reference=f'T{index}')
+                    issued.append(1)
+                except InsufficientStock:
+                    pass
+
+        self.assertEqual(run_threads(worker, self.THREADS), [])
+        self.assertEqual(len(issued), 200)
+        self.assertConsistent(0)
+
+    def test_concurrent_receipts_and_issues_lose_no_updates(self):
+        receive_stock(self.product, 1000)
+
+        def worker(index):
+            product = Product.objects.get(pk=self.product.pk)
+            operation = receive_stock if index % 2 else issue_stock
+            for _ in range(self.OPERATIONS):
+                operation(product, 3, reference=f'T{index}')
+
+        self.assertEqual(run_threads(worker, self.THREADS), [])
+        self.assertConsistent(1000)
+
+    def test_concurrent_transfers_keep_totals(self):
+        receive_stock(self.product, 100, location=self.bin_a)
+        receive_stock(self.product, 100, location=self.bin_b)
+
+        def worker(index):
+            product = Product.objects.get(pk=self.product.pk)
+            source, destination = (self.bin_a, self.bin_b) if index % 2 else (self.bin_b, self.bin_a)
+            for _ in range(self.OPERATIONS):
+                try:
+                    move_stock(product, source, destination, 5)
+                except InsufficientStock:
+                    pass
+
+        self.assertEqual(run_threads(worker, self.THREADS), [])
+        self.assertConsistent(200)
+
+
+class StockServiceTests(TestCase):
+    def setUp(self):
+        self.bin_a = StorageLocation.objects.create(name='Bin A', code='A')
+        self.bin_b = StorageLocation.objects.create(name='Bin B', code='B')
+        self.product = Product.objects.create(name='Widget', description='Test', sku='W-1', location=self.bin_a)
+
+    def balances(self):
+        return dict(StockBalance.objects.filter(product=self.product).values_list('location__code', 'quantity'))
+
+    def test_issue_is_a_conditional_update(self):
+        receive_stock(self.product, 5)
+        with self.assertRaises(InsufficientStock):
+            issue_stock(self.product, 6)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 5)
+
+    def test_issue_spreads_across_locations_primary_first(self):
+        receive_stock(self.product, 4, location=self.bin_a)
+        receive_stock(self.product, 10, location=self.bin_b)
+        plan = issue_stock(self.product, 7)
+        self.assertEqual(plan, [(self.bin_a.pk, 4), (self.bin_b.pk, 3)])
+
+    def test_receipts_split_balances_by_location(self):
+        receive_stock(self.product, 4)
+        receive_stock(self.product, 6, location=self.bin_b)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 10)
+        self.assertEqual(self.balances(), {'A': 4, 'B': 6})
+        self.assertEqual(
+            dict(StockMovement.objects.filter(product=self.product).values_list('location__code', 'quantity_change')),
+            {'A': 4, 'B': 6},
+        )
+
+    def test_overdraw_at_a_location_changes_nothing(self):
+        receive_stock(self.product, 4, location=self.bin_a)
+        receive_stock(self.product, 6, location=self.bin_b)
+        with self.assertRaises(InsufficientStock):
+            issue_stock(self.product, 5, location=self.bin_a)
+        with self.assertRaises(InsufficientStock):
+            move_stock(self.product, self.bin_a, self.bin_b, 5)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 10)
+        self.assertEqual(self.balances(), {'A': 4, 'B': 6})
+        self.assertEqual(StockMovement.objects.filter(product=self.product).count(), 2)
+
+    def test_transfer_moves_balance_and_keeps_total(self):
+        receive_stock(self.product, 4, location=self.bin_a)
+        move_stock(self.product, self.bin_a, self.bin_b, 3)
+        self.assertEqual(self.balances(), {'A': 1, 'B': 3})
+        self.assertEqual(
+            list(StockMovement.objects.filter(movement_type__startswith='transfer')
+                 .order_by('id').values_list('movement_type', 'location__code', 'quantity_change')),
+            [('transfer_out', 'A', -3), ('transfer_in', 'B', 3)],
+        )
+
+        # Emptying the primary location hands the primary role to the destination
+        move_stock(self.product, self.bin_a, self.bin_b, 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.location_id, self.bin_b.pk)
+        self.assertEqual(self.product.quantity, 4)
+        self.assertEqual(self.balances(), {'A': 0, 'B': 4})
+
+    def test_edit_with_unchanged_location_writes_no_transfers(self):
+        receive_stock(self.product, 5)
+        self.client.force_login(User.objects.create_superuser('editor', 'editor@example.com', 'password'))
+        self.client.post(reverse('update_inventory', args=[self.product.pk]), {
+            'name': 'Widget', 'description': 'Test', 'sku': 'W-1', 'quantity': '5', 'location': str(self.bin_a.pk),
+        })
+        set_stock_level(self.product, 5, str(self.bin_a.pk))
+        self.assertFalse(StockMovement.objects.filter(movement_type__startswith='transfer').exists())
+        self.assertEqual(StockBalance.objects.get(product=self.product, location=self.bin_a).quantity, 5)
+
+class CheckpointTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Widget', description='Test', sku='W-1')
+
+    def test_on_hand_at_matches_full_history_around_a_checkpoint(self):
+        start = timezone.now()
+        receive_stock(self.product, 10)
+        self.assertEqual(create_checkpoints(), 1)
+        issue_stock(self.product, 4)
+        receive_stock(self.product, 2)
+        StockMovement.objects.filter(product=self.product).update(created_at=start)
+        later = timezone.now() + timedelta(hours=1)
+
+        self.assertEqual(on_hand_at(self.product, start - timedelta(seconds=1)), 0)
+        self.assertEqual(on_hand_at(self.product, later), 8)
+        with self.assertMaxQueries(2):
+            on_hand_at(self.product, later)
+
+    def test_create_checkpoints_is_idempotent(self):
+        receive_stock(self.product, 10)
+        self.assertEqual(create_checkpoints(), 1)
+        self.assertEqual(create_checkpoints(), 0)
+        receive_stock(self.product, 3)
+        self.assertEqual(create_checkpoints(), 1)
+        latest = StockCheckpoint.objects.filter(product=self.product).order_by('-last_movement_id').first()
+        self.assertEqual(latest.quantity, 13)
+        self.assertEqual(StockCheckpoint.objects.count(), 2)
+
+    def test_movement_stamped_after_a_later_insert_is_not_lost(self):
+        # created_at is stamped before the insert, so a lower id can carry a later timestamp
+        receive_stock(self.product, 5)
+        StockMovement.objects.filter(product=self.product).update(created_at=timezone.now() + timedelta(hours=1))
+        receive_stock(self.product, 3)
+
+        self.assertEqual(create_checkpoints(), 1)
+        checkpoint = StockCheckpoint.objects.get(product=self.product)
+        self.assertEqual(checkpoint.quantity, 8)
+        self.assertEqual(checkpoint.last_movement_id, StockMovement.objects.order_by('-id').first().id)
+        self.assertEqual(on_hand_at(self.product, timezone.now() + timedelta(hours=2)), 8)
+
+
+
+class DocumentNumberTests(TransactionTestCase):
+    def test_concurrent_allocations_are_unique(self):
+        numbers = []
+
+        def worker(index):
+            for _ in range(20):
+                numbers.append(allocate_numbers('TEST-'))
+
+        self.assertEqual(run_threads(worker, 8), [])
+        self.assertEqual(sorted(numbers), list(range(1, 161)))
+
+    def test_block_allocation(self):
+        self.assertEqual(allocate_product_skus(3), ['PRD-0001', 'PRD-0002', 'PRD-0003'])
+        self.assertEqual(allocate_product_skus(1), ['PRD-0004'])
+
+    def test_counter_continues_from_existing_numbers_past_9999(self):
+        user = User.objects.create_user('requester')
+        prefix = f'REQ-{datetime.now().year}-'
+        for number in ('9999', '10000', '0042'):
+            ItemRequest.objects.create(request_number=f'{prefix}{number}', requested_by=user, purpose='Test')
+        self.assertEqual(generate_request_number(), f'{prefix}10001')
+
+    def test_admin_cannot_wind_counters_back(self):
+        allocate_numbers('TEST-', 5)
+        counter = DocumentCounter.objects.get(prefix='TEST-')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.client.post(reverse('admin:inventory_documentcounter_change', args=[counter.pk]),
+                         {'prefix': 'TEST-', 'last_number': '1'})
+        counter.refresh_from_db()
+        self.assertEqual(counter.last_number, 5)
+        self.assertEqual(self.client.get(reverse('admin:inventory_documentcounter_add')).status_code, 403)
+        self.assertEqual(allocate_numbers('TEST-'), 6)
+
+
+class QueryInstrumentationTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.user)
+        location = StorageLocation.objects.create(name='Bin A', code='A')
+        for n in range(5):
+            Product.objects.create(name=f'Widget {n}', description='Test', sku=f'W-{n}', location=location)
+
+    def test_server_timing_header_and_summary(self):
+        query_log.clear()
+        response = self.client.get(reverse('stock_lookup'), {'location': 'A'})
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('queries', response['Server-Timing'])
+
+        response = self.client.get(reverse('query_summary'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('stock_lookup', [row['view'] for row in response.context['rows']])
+
+    def test_timings_and_summary_are_staff_only(self):
+        manager = User.objects.create_user('manager')
+        manager.groups.add(Group.objects.create(name='Warehouse Manager'))
+        self.client.force_login(manager)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('stock_lookup'), {'location': 'A'}))
+        self.assertNotIn('Server-Timing', self.client.get(reverse('dashboard')))
+        self.assertRedirects(self.client.get(reverse('query_summary')), reverse('dashboard'))
+
+        self.client.logout()
+        self.assertNotIn('Server-Timing', self.client.get(reverse('dashboard')))
+        with self.settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.client.get(reverse('dashboard')))
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT  *  FROM t WHERE id IN (%s)'),
+        )
+        self.assertEqual(fingerprint("SELECT 1 WHERE name = 'a'"), fingerprint("SELECT 2 WHERE name = 'bb'"))
+
+    def test_query_budget_fails_with_repeated_queries(self):
+        with self.assertRaises(AssertionError) as raised:
+            with self.assertMaxQueries(2):
+                for product in Product.objects.all():
+                    product.location.code
+        self.assertIn('Repeated queries', str(raised.exception))
+
+    def test_product_search_budget(self):
+        with self.assertMaxQueries(6):
+            self.client.get(reverse('product_search'), {'q': 'widget'})
+
+
+class RoleResolverTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.supervisor = Group.objects.create(name='Warehouse Supervisor')
+        self.manager = Group.objects.create(name='Warehouse Manager')
+        self.user = User.objects.create_user('clerk')
+        self.user.groups.add(self.supervisor)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_roles_are_cached_across_requests(self):
+        user_roles(self.fresh_user())
+        user = self.fresh_user()
+        with self.assertMaxQueries(0):
+            self.assertTrue(can_manage_inventory(user))
+            self.assertFalse(can_procure(user))
+
+    def test_membership_changes_invalidate(self):
+        self.assertFalse(can_procure(self.fresh_user()))
+        self.user.groups.add(self.manager)
+        self.assertTrue(can_procure(self.fresh_user()))
+        self.manager.user_set.remove(self.user)
+        self.assertFalse(can_procure(self.fresh_user()))
+        self.supervisor.user_set.clear()
+        self.assertFalse(can_manage_inventory(self.fresh_user()))
+
+    def test_group_rename_invalidates(self):
+        self.assertTrue(can_manage_inventory(self.fresh_user()))
+        self.supervisor.name = 'Former Supervisors'
+        self.supervisor.save()
+        self.assertFalse(can_manage_inventory(self.fresh_user()))
+
+    def test_one_group_query_per_request(self):
+        self.client.force_login(self.user)
+        with self.assertMaxQueries(20) as stats:
+            response = self.client.get(reverse('inventory_dashboard'))
+        self.assertTrue(response.context['roles'].can_manage_inventory)
+        group_queries = [sql for sql in stats.fingerprints if 'auth_user_groups' in sql]
+        self.assertEqual(sum(stats.fingerprints[sql] for sql in group_queries), 1)
+
+
+class QueryPlanTests(QueryBudgetMixin, TestCase):
+    """List and detail pages run a fixed number of queries however many rows they show"""
+
+    BUDGETS = {
+        'dashboard': 10,
+        'inventory_list': 10,
+        'low_stock_list': 10,
+        'request_list': 10,
+        'request_add': 12,
+        'po_list': 10,
+        'quotation_list': 10,
+        'issuance_list': 10,
+        'issuance_create': 10,
+        'transfer_list': 10,
+        'transfer_create': 10,
+    }
+    DETAIL_BUDGETS = {
+        'request_detail': ('request_id', 10),
+        'issuance_detail': ('issuance_id', 10),
+        'transfer_detail': ('transfer_id', 10),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(40)
+        cls.user = User.objects.create_superuser('planner', 'planner@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_list_pages(self):
+        for name, budget in self.BUDGETS.items():
+            with self.subTest(name):
+                with self.assertMaxQueries(budget):
+                    response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+
+    def test_detail_pages(self):
+        for name, (argument, budget) in self.DETAIL_BUDGETS.items():
+            with self.subTest(name):
+                url = reverse(name, kwargs={argument: ROUTE_ARGUMENTS[argument]()})
+                with self.assertMaxQueries(budget):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+
+class DocumentTotalTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Widget', description='Test', sku='W-1')
+        self.order = PurchaseOrder.objects.create(po_number='PO0001')
+        currency = Currency.objects.create(code='USD', name='US Dollar', symbol='$')
+        vendor = Vendor.objects.create(name='Acme', code='VEN-0001')
+        self.quotation = Quotation.objects.create(quotation_number='QTN-1', vendor=vendor, currency=currency)
+
+    def test_totals_follow_line_changes(self):
+        line = PurchaseOrderItem.objects.create(purchase_order=self.order, product=self.product,
+                                                quantity_ordered=3, unit_price=Decimal('2.10'))
+        PurchaseOrderItem.objects.create(purchase_order=self.order, product=self.product,
+                                         quantity_ordered=1, unit_price=Decimal('0.75'))
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.total_amount, self.order.line_count), (Decimal('7.05'), 2))
+
+        line.delete()
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.total_amount, self.order.line_count), (Decimal('0.75'), 1))
+
+        QuotationItem.objects.create(quotation=self.quotation, product=self.product, quantity=4, unit_price=Decimal('1.25'))
+        self.quotation.refresh_from_db()
+        self.assertEqual((self.quotation.total_amount, self.quotation.line_count), (Decimal('5.00'), 1))
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        PurchaseOrderItem.objects.create(purchase_order=self.order, product=self.product,
+                                         quantity_ordered=2, unit_price=Decimal('5.00'))
+        PurchaseOrder.objects.filter(pk=self.order.pk).update(total_amount=Decimal('1.00'))
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_totals', '--check', stdout=StringIO())
+
+        out = StringIO()
+        call_command('reconcile_totals', stdout=out)
+        self.assertIn('1 with drift', out.getvalue())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal('10.00'))
+        call_command('reconcile_totals', '--check', stdout=StringIO())
+
+
+class LineItemBatchTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('buyer', 'buyer@example.com', 'password')
+        self.client.force_login(self.user)
+        self.vendor = Vendor.objects.create(name='Acme', code='VEN-0001')
+        self.products = [
+            Product.objects.create(name=f'Part {n}', description='Test', sku=f'P-{n}') for n in range(60)
+        ]
+
+    def post_data(self, lines, **extra):
+        data = {'vendor': self.vendor.pk, 'order_date': '2026-01-15'}
+        for index, (product, quantity, price) in enumerate(lines):
+            data.update({f'product_{index}': product.pk, f'quantity_{index}': quantity, f'unit_price_{index}': price})
+        data.update(extra)
+        return {key: str(value) for key, value in data.items()}
+
+    def test_po_add_query_count_does_not_grow_with_lines(self):
+        # The first document also creates its number counter, so measure from the second on
+        counts = []
+        for size in (1, 3, 60):
+            lines = [(product, 2, '1.50') for product in self.products[:size]]
+            with self.assertMaxQueries(30) as stats:
+                response = self.client.post(reverse('po_add'), self.post_data(lines))
+            self.assertEqual(response.status_code, 302)
+            counts.append(stats.count)
+        self.assertEqual(counts[1], counts[2])
+
+        po = PurchaseOrder.objects.order_by('-id').first()
+        self.assertEqual((po.line_count, po.total_amount), (60, Decimal('180.00')))
+
+    def test_po_edit_diffs_lines(self):
+        self.client.post(reverse('po_add'), self.post_data([(product, 1, '2.00') for product in self.products[:3]]))
+        po = PurchaseOrder.objects.get()
+        kept, changed, dropped = po.items.order_by('id')
+
+        lines = [(self.products[0], 1, '2.00'), (self.products[1], 5, '2.00'), (self.products[10], 1, '3.00')]
+        response = self.client.post(reverse('po_edit', args=[po.pk]), self.post_data(lines))
+        self.assertEqual(response.status_code, 302)
+
+        items = {item.pk: item for item in po.items.all()}
+        self.assertIn(kept.pk, items)
+        self.assertEqual(items[changed.pk].quantity_ordered, 5)
+        self.assertNotIn(dropped.pk, items)
+        self.assertEqual(len(items), 3)
+        po.refresh_from_db()
+        self.assertEqual((po.line_count, po.total_amount), (3, Decimal('15.00')))
+
+    def test_parse_validates_every_line(self):
+        data = self.post_data([(self.products[0], 1, '1.00'), (self.products[1], 0, '1.00')])
+        self.assertEqual(len(PO_LINES.parse(data)), 1)
+        with self.assertRaisesMessage(ValueError, 'Product 999999 does not exist'):
+            PO_LINES.parse(dict(data, product_9='999999', quantity_9='1'))
+        with self.assertRaisesMessage(ValueError, 'Line 1: quantity must be a whole number'):
+            PO_LINES.parse(self.post_data([(self.products[0], '1.5', '1.00')]))
+        for price in ('1e999999', '123456789012', '99999999.999', 'NaN'):
+            with self.subTest(price=price), self.assertRaisesMessage(ValueError, f'Line 1: invalid unit price "{price}"'):
+                PO_LINES.parse(self.post_data([(self.products[0], 1, price)]))
+        self.assertEqual(PO_LINES.parse(self.post_data([(self.products[0], 1, '99999999.99')]))[0]['unit_price'],
+                         Decimal('99999999.99'))
+
+
+class ApiTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(40)
+        cls.user = User.objects.create_superuser('reader', 'reader@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get(self, resource, **params):
+        response = self.client.get(reverse('api_list', args=[resource]), params)
+        return response, json.loads(response.content)
+
+    def test_cursor_walks_every_row_once(self):
+        seen, params = [], {'limit': 7, 'fields': 'sku'}
+        while True:
+            response, page = self.get('products', **params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(set(page['results'][0]), {'id', 'sku'})
+            seen += [record['id'] for record in page['results']]
+            if not page['next_cursor']:
+                break
+            params['cursor'] = page['next_cursor']
+        self.assertEqual(seen, list(Product.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_query_count_is_fixed_per_page(self):
+        for resource in RESOURCES:
+            with self.subTest(resource):
+                with self.assertMaxQueries(4) as s:
+                    response, page = self.get(resource, limit=200)
+                self.assertEqual(response.status_code, 200)
+
+    def test_lines_and_detail(self):
+        po = PurchaseOrder.objects.order_by('id').first()
+        response = self.client.get(reverse('api_detail', args=['purchase-orders', po.pk]), {'fields': 'po_number,items'})
+        record = json.loads(response.content)
+        self.assertEqual(record['po_number'], po.po_number)
+        self.assertEqual(len(record['items']), po.items.count())
+        self.assertEqual(Decimal(record['items'][0]['unit_price']), po.items.order_by('id')[0].unit_price)
+
+    def test_errors(self):
+        self.assertEqual(self.get('products', fields='nope')[0].status_code, 400)
+        self.assertEqual(self.get('products', cursor='garbage')[0].status_code, 400)
+        self.assertEqual(self.get('widgets')[0].status_code, 404)
+        self.assertEqual(self.client.post(reverse('api_list', args=['products'])).status_code, 405)
+        self.client.force_login(User.objects.create_user('visitor'))
+        self.assertEqual(self.get('purchase-orders')[0].status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.get('products')[0].status_code, 401)
+
+
+class ConditionalGetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(20)
+        cls.user = User.objects.create_superuser('poller', 'poller@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_unchanged_request_returns_304_without_rendering(self):
+        item_request = ItemRequest.objects.order_by('id').first()
+        url = reverse('request_detail', args=[item_request.pk])
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        with self.assertMaxQueries(3):
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.templates, [])
+
+        item_request.items.order_by('id').last().delete()
+        third = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+    def test_etag_differs_per_user(self):
+        transfer_id = ROUTE_ARGUMENTS['transfer_id']()
+        url = reverse('transfer_detail', args=[transfer_id])
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(User.objects.create_superuser('other', 'other@example.com', 'password'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_api_detail_and_line_edits(self):
+        po = PurchaseOrder.objects.filter(items__isnull=False).order_by('id').first()
+        url = reverse('api_detail', args=['purchase-orders', po.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        line = po.items.order_by('id').first()
+        line.quantity_ordered += 1
+        line.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CachedValueTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def counted(self, name='test-value'):
+        def compute():
+            self.calls.append(1)
+            return StorageLocation.objects.filter(is_active=True).count()
+        return CachedValue(name, compute, depends_on=(StorageLocation,))
+
+    def test_value_is_reused_until_a_dependency_changes(self):
+        value = self.counted()
+        self.assertEqual(value.get(), 0)
+        self.assertEqual(value.get(), 0)
+        self.assertEqual(len(self.calls), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StorageLocation.objects.create(name='Aisle 1', code='A1')
+        self.assertEqual(value.get(), 1)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_callers_during_recompute_get_the_previous_value(self):
+        value = self.counted()
+        value.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            StorageLocation.objects.create(name='Aisle 1', code='A1')
+        # Another process holds the recompute lock for the new generation
+        cache.add(f'{value.key()}:lock', 'elsewhere', 30)
+        self.assertEqual(value.get(), 0)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_dashboard_reads_maintained_counts(self):
+        user = User.objects.create_superuser('boss', 'boss@example.com', 'password')
+        self.client.force_login(user)
+        self.client.get(reverse('inventory_dashboard'))
+        with self.assertMaxQueries(3) as stats:
+            response = self.client.get(reverse('inventory_dashboard'))
+        self.assertFalse([sql for sql in stats.fingerprints if 'COUNT' in sql])
+        self.assertEqual(response.context['total_products'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Widget', description='Test', sku='W-1')
+        response = self.client.get(reverse('inventory_dashboard'))
+        self.assertEqual(response.context['total_products'], 1)
+
+
+class StatCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('requester')
+        self.product = Product.objects.create(name='Widget', description='Test', sku='W-1', min_quantity=5)
+        rebuild_counters()
+
+    def assertCountersMatch(self):
+        self.assertEqual(dashboard_counts(), expected_counts())
+
+    def test_status_transitions_move_counters(self):
+        item_request = ItemRequest.objects.create(request_number='REQ-1', requested_by=self.user, purpose='Test')
+        self.assertEqual(dashboard_counts()['pending_requests'], 1)
+        item_request = ItemRequest.objects.get(pk=item_request.pk)
+        item_request.status = 'approved'
+        item_request.save()
+        self.assertEqual(dashboard_counts()['pending_requests'], 0)
+
+        po = PurchaseOrder.objects.create(po_number='PO0001')
+        po.status = 'approved'
+        po.save()
+        PurchaseOrder.objects.create(po_number='PO0002').delete()
+        self.assertEqual((dashboard_counts()['total_pos'], dashboard_counts()['pending_pos']), (1, 0))
+        self.assertCountersMatch()
+
+    def test_stock_movements_cross_the_low_stock_line(self):
+        self.assertEqual(dashboard_counts()['low_stock_count'], 1)
+        receive_stock(self.product, 10)
+        self.assertEqual(dashboard_counts()['low_stock_count'], 0)
+        issue_stock(self.product, 8)
+        self.assertEqual(dashboard_counts()['low_stock_count'], 1)
+        self.assertCountersMatch()
+
+    def test_deferred_loads_and_bulk_inserts(self):
+        product = Product.objects.only('id', 'name').get(pk=self.product.pk)
+        product.min_quantity = 0
+        product.save()
+        created_in_bulk(Product.objects.bulk_create([
+            Product(name=f'Part {n}', description='Test', sku=f'P-{n}', quantity=n, min_quantity=1) for n in range(3)
+        ]))
+        self.assertCountersMatch()
+
+    def test_rebuild_command(self):
+        StatCounter.objects.filter(name='total_products').update(value=99)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--check', stdout=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCountersMatch()
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_data(20)
+        cls.user = User.objects.create_superuser('poller', 'poller@example.com', 'password')
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+
+    def test_read_only_routes_are_coroutines(self):
+        for name, args in [('dashboard', []), ('inventory_dashboard', []), ('procurement_dashboard', []),
+                           ('stock_lookup', []), ('get_request_items', [1]),
+                           ('api_list', ['products']), ('api_detail', ['products', 1])]:
+            with self.subTest(name):
+                self.assertTrue(is_async_route(reverse(name, args=args)))
+
+    async def test_api_and_dashboards_over_async_client(self):
+        product = await Product.objects.order_by('id').afirst()
+        response = await self.async_client.get(reverse('api_detail', args=['products', product.pk]))
+        self.assertEqual(json.loads(response.content)['id'], product.pk)
+        response = await self.async_client.get(reverse('api_detail', args=['products', product.pk]),
+                                               headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        for name, counter in [('dashboard', 'total_products'), ('inventory_dashboard', 'total_products'),
+                              ('procurement_dashboard', 'total_pos')]:
+            response = await self.async_client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context[counter], (await adashboard_counts())[counter])
+
+    async def test_procurement_dashboard_redirects_without_access(self):
+        visitor = await User.objects.acreate(username='visitor')
+        await self.async_client.aforce_login(visitor)
+        response = await self.async_client.get(reverse('procurement_dashboard'))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+
+
+class BulkDecisionTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.head = User.objects.create_user('head')
+        cls.ops = Department.objects.create(name='Operations', code='OPS', manager=cls.head)
+        cls.other = Department.objects.create(name='Finance', code='FIN')
+        cls.product = Product.objects.create(name='Bolt', description='Test', sku='B-1', quantity=200)
+        cls.mine = [cls.make_request(f'R{n}', cls.ops) for n in range(30)]
+        cls.theirs = cls.make_request('R-FIN', cls.other)
+
+    @classmethod
+    def make_request(cls, number, department):
+        item_request = ItemRequest.objects.create(
+            request_number=number, requested_by=cls.head, department=department, purpose='Test',
+        )
+        ItemRequestLine.objects.bulk_create([
+            ItemRequestLine(item_request=item_request, product=cls.product, quantity_requested=n + 1) for n in range(3)
+        ])
+        return item_request
+
+    def test_approves_in_set_based_statements(self):
+        ids = [item_request.pk for item_request in self.mine]
+        with self.assertMaxQueries(9):
+            decisions = decide_requests(self.head, ids + [self.theirs.pk])
+        self.assertEqual([decision.ok for decision in decisions], [True] * 30 + [False])
+        self.assertFalse(ItemRequestLine.objects.filter(item_request_id__in=ids)
+                         .exclude(quantity_approved=F('quantity_requested')).exists())
+        self.assertEqual(ItemRequest.objects.get(pk=self.theirs.pk).status, 'pending')
+        self.assertEqual(dashboard_counts()['pending_requests'], 1)
+        self.assertEqual(dashboard_counts(), expected_counts())
+
+        again = decide_requests(self.head, ids[:1])
+        self.assertEqual(again[0].message, 'Only pending requests can be approved.')
+
+    def test_bulk_view_reports_each_request(self):
+        self.client.force_login(self.head)
+        response = self.client.get(reverse('request_list'))
+        self.assertContains(response, f'name="request_ids" value="{self.mine[-1].pk}"')
+        self.assertNotContains(response, f'name="request_ids" value="{self.theirs.pk}"')
+
+        response = self.client.post(reverse('request_bulk_decide'), {
+            'action': 'reject', 'rejection_reason': 'Over budget',
+            'request_ids': [self.mine[0].pk, self.theirs.pk],
+        }, follow=True)
+        notes = [str(message) for message in response.context['messages']]
+        self.assertEqual(notes, ['Rejected 1 request(s): R0',
+                                 'R-FIN: You do not have permission to reject this request.'])
+        self.assertEqual(ItemRequest.objects.get(pk=self.mine[0].pk).rejection_reason, 'Over budget')
+
+        response = self.client.post(reverse('request_bulk_decide'), {
+            'action': 'reject', 'request_ids': [self.mine[1].pk],
+        }, follow=True)
+        self.assertEqual(ItemRequest.objects.get(pk=self.mine[1].pk).status, 'pending')
+
+
+class WaveIssuanceTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('picker', 'picker@example.com', 'password')
+        cls.bin_a = StorageLocation.objects.create(name='Bin A', code='A')
+        cls.bin_b = StorageLocation.objects.create(name='Bin B', code='B')
+        cls.products = []
+        for n in range(4):
+            product = Product.objects.create(name=f'Part {n}', description='Test', sku=f'W-{n}',
+                                             location=cls.bin_a, min_quantity=5)
+            receive_stock(product, 30, cls.bin_a)
+            receive_stock(product, 30, cls.bin_b)
+            cls.products.append(product)
+
+    def make_requests(self, count, quantity=2):
+        requests = []
+        for n in range(count):
+            item_request = ItemRequest.objects.create(
+                request_number=f'W{len(requests)}-{count}-{quantity}', requested_by=self.user,
+                purpose='Test', status='approved',
+            )
+            ItemRequestLine.objects.bulk_create([
+                ItemRequestLine(item_request=item_request, product=product,
+                                quantity_requested=quantity, quantity_approved=quantity)
+                for product in self.products
+            ])
+            requests.append(item_request.pk)
+        refresh_reservations([product.pk for product in self.products])
+        return requests
+
+    def test_issues_whole_wave_in_fixed_statements(self):
+        small_wave, large_wave = self.make_requests(2), self.make_requests(20)
+        with self.assertMaxQueries(24) as small:
+            issue_wave(small_wave, self.user)
+        with self.assertMaxQueries(small.count):
+            wave = issue_wave(large_wave, self.user)
+        self.assertEqual((len(wave.issuances), wave.line_count), (20, 80))
+
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.quantity, 60 - 22 * 2)
+            self.assertEqual(product.reserved_quantity, 0)
+            self.assertEqual(StockBalance.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'],
+                             product.quantity)
+        # Primary bin drained first, then the other
+        self.assertEqual(StockBalance.objects.get(product=self.products[0], location=self.bin_a).quantity, 0)
+        self.assertFalse(ItemRequestLine.objects.exclude(quantity_issued=F('quantity_approved')).exists())
+        self.assertEqual(set(ItemRequest.objects.values_list('status', flat=True)), {'completed'})
+        self.assertEqual(StockMovement.objects.filter(movement_type='issue').aggregate(total=Sum('quantity_change'))['total'],
+                         -22 * 2 * len(self.products))
+        self.assertEqual(dashboard_counts(), expected_counts())
+
+    def test_short_wave_issues_nothing(self):
+        ids = self.make_requests(3, quantity=25)
+        with self.assertRaisesMessage(InsufficientStock, 'wave needs 75, available 60'):
+            issue_wave(ids, self.user)
+        self.assertFalse(ItemIssuance.objects.exists())
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity, 60)
+
+    def test_wave_view(self):
+        self.client.force_login(self.user)
+        ids = self.make_requests(2)
+        self.assertContains(self.client.get(reverse('issuance_wave')), 'name="request_ids"', count=2)
+        response = self.client.post(reverse('issuance_wave'), {'request_ids': ids}, follow=True)
+        self.assertContains(response, 'Wave issued 8 lines across 2 requests')
+
+
+class PickListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('issuer', 'issuer@example.com', 'password')
+        # Codes deliberately out of walking order
+        cls.bins = [
+            StorageLocation.objects.create(name=f'Bin {code}', code=code, zone='A', aisle=aisle, bay=bay, level=1)
+            for code, aisle, bay in [('A-3', 1, 1), ('A-1', 3, 9), ('A-2', 1, 8), ('A-4', 2, 9)]
+        ]
+        cls.request = ItemRequest.objects.create(request_number='PICK-1', requested_by=cls.user,
+                                                 purpose='Test', status='approved')
+        for n, location in enumerate(cls.bins):
+            product = Product.objects.create(name=f'Part {n}', description='Test', sku=f'K-{n}', location=location)
+            receive_stock(product, 10, location)
+            ItemRequestLine.objects.create(item_request=cls.request, product=product,
+                                           quantity_requested=4, quantity_approved=4)
+        loose = Product.objects.create(name='Loose part', description='Test', sku='K-L', quantity=3)
+        ItemRequestLine.objects.create(item_request=cls.request, product=loose,
+                                       quantity_requested=5, quantity_approved=5)
+
+    def test_orders_stops_into_a_route(self):
+        pick_list = build_pick_list([self.request.pk])
+        self.assertEqual([stop.location.code for stop in pick_list.stops], ['A-3', 'A-2', 'A-4', 'A-1'])
+        self.assertEqual(pick_list.line_count, 5)
+        self.assertEqual([(stop.location, stop.picks[0][1]) for stop in pick_list.unrouted], [(None, 3)])
+        self.assertEqual([(line.product.sku, missing) for line, missing in pick_list.short], [('K-L', 2)])
+
+    def test_large_waves_route_quickly(self):
+        rng = random.Random(7)
+        points = list({(rng.randint(1, 3), rng.randint(1, 20), rng.randint(0, 29), rng.randint(1, 4), 30)
+                       for _ in range(1500)})
+        started = time.monotonic()
+        order = plan_route(points)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(sorted(order), list(range(len(points))))
+        self.assertLess(route_length([points[i] for i in order]), route_length(sorted(points)))
+
+    def test_pick_list_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('issuance_pick_list'), {'request_ids': [self.request.pk]})
+        self.assertContains(response, 'A-4')
+        self.assertContains(response, 'Not enough stock')
+
+
+class ReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.head = User.objects.create_superuser('head', 'head@example.com', 'password')
+        cls.ops = Department.objects.create(name='Operations', code='OPS', manager=cls.head)
+        cls.bin = StorageLocation.objects.create(name='Bin', code='BIN')
+        cls.product = Product.objects.create(name='Bolt', description='Test', sku='B-1', location=cls.bin)
+        receive_stock(cls.product, 10, cls.bin)
+        cls.first, cls.second = [
+            ItemRequest.objects.create(request_number=f'R{n}', requested_by=cls.head, department=cls.ops,
+                                       purpose='Test')
+            for n in range(2)
+        ]
+        for item_request in (cls.first, cls.second):
+            ItemRequestLine.objects.create(item_request=item_request, product=cls.product, quantity_requested=6)
+
+    def assertReserved(self, reserved):
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.reserved_quantity, self.product.available_quantity),
+                         (reserved, self.product.quantity - reserved))
+        self.assertFalse(find_drift().exists())
+
+    def test_approval_reserves_until_stock_runs_out(self):
+        first, second = decide_requests(self.head, [self.first.pk, self.second.pk])
+        self.assertTrue(first.ok)
+        self.assertEqual((second.ok, second.message), (False, 'Only 4 of Bolt available to promise.'))
+        self.assertEqual(ItemRequest.objects.get(pk=self.second.pk).status, 'pending')
+        self.assertReserved(6)
+
+        field = ItemRequestLineForm().fields['product']
+        self.assertIn('- 4 available', field.label_from_instance(field.queryset.get()))
+
+    def test_issuing_and_cancelling_release(self):
+        decide_requests(self.head, [self.first.pk])
+        line = self.first.items.get()
+        self.client.force_login(self.head)
+        item, = self.client.get(reverse('get_request_items', args=[self.first.pk])).json()['items']
+        self.assertEqual((item['stock_available'], item['available_to_promise']), (10, 4))
+
+        self.client.post(reverse('issuance_create'), {'request_id': self.first.pk, f'quantity_{line.pk}': 2})
+        self.assertReserved(4)
+        self.assertEqual(self.product.quantity, 8)
+
+        self.client.post(reverse('request_cancel', args=[self.first.pk]))
+        self.assertEqual(ItemRequest.objects.get(pk=self.first.pk).status, 'cancelled')
+        self.assertReserved(0)
+        self.assertTrue(decide_requests(self.head, [self.second.pk])[0].ok)
+        self.assertReserved(6)
+
+    def test_admin_save_keeps_concurrent_reservations(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        decide_requests(self.head, [self.first.pk])
+        stale.name = 'Hex bolt'
+        request = RequestFactory().post('/')
+        request.user = self.head
+        ProductAdmin(Product, admin.site).save_model(request, stale, None, change=True)
+        self.assertReserved(6)
+        self.assertEqual(self.product.name, 'Hex bolt')
+
+    def test_reconcile_command_repairs_drift(self):
+        decide_requests(self.head, [self.first.pk])
+        Product.objects.update(reserved_quantity=0)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_reservations', '--check', stdout=StringIO())
+        call_command('reconcile_reservations', stdout=StringIO())
+        self.assertReserved(6)
+
+
+class ReceivingTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('receiver', 'receiver@example.com', 'password')
+        cls.dock = StorageLocation.objects.create(name='Dock', code='DOCK')
+        cls.shelf = StorageLocation.objects.create(name='Shelf', code='SHELF')
+
+    def make_order(self, count, quantity=10):
+        number = PurchaseOrder.objects.count() + 1
+        purchase_order = PurchaseOrder.objects.create(po_number=f'PO-R{number}', supplier_name='Acme', status='ordered')
+        products = Product.objects.bulk_create([
+            Product(name=f'Part {number}-{n}', description='Test', sku=f'R{number}-{n}', location=self.shelf)
+            for n in range(count)
+        ])
+        lines = PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(purchase_order=purchase_order, product=product, quantity_ordered=quantity,
+                              unit_price=Decimal('1.00'))
+            for product in products
+        ])
+        return purchase_order, lines
+
+    def test_posts_whole_delivery_in_fixed_statements(self):
+        small_order, small_lines = self.make_order(5)
+        large_order, large_lines = self.make_order(500)
+        # The first receipt also creates the RCV- number counter
+        with self.assertMaxQueries(24):
+            post_receipt(small_order.pk, {line.pk: 4 for line in small_lines}, self.user)
+        # Only SQLite's bound-parameter limit splits the 500-row inserts into a few batches
+        with self.assertMaxQueries(26):
+            receiving = post_receipt(large_order.pk, {line.pk: 4 for line in large_lines}, self.user,
+                                     location=self.dock)
+
+        self.assertEqual((receiving.status, receiving.line_count), ('partial', 500))
+        self.assertEqual(PurchaseOrder.objects.get(pk=large_order.pk).status, 'partially_received')
+        self.assertEqual(Product.objects.filter(po_items__in=large_lines, quantity=4).count(), 500)
+        self.assertEqual(StockBalance.objects.filter(location=self.dock, quantity=4).count(), 500)
+        self.assertEqual(StockMovement.objects.filter(reference=receiving.receiving_number).count(), 500)
+        self.assertEqual(StockBalance.objects.filter(location=self.shelf, quantity=4).count(), 5)
+
+        rest = post_receipt(large_order.pk, {line.pk: 6 for line in large_lines}, self.user, location=self.dock)
+        self.assertEqual(rest.status, 'completed')
+        self.assertEqual(PurchaseOrder.objects.get(pk=large_order.pk).status, 'received')
+        self.assertFalse(PurchaseOrderItem.objects.filter(purchase_order=large_order)
+                         .exclude(quantity_received=F('quantity_ordered')).exists())
+        self.assertEqual(StockBalance.objects.filter(location=self.dock, quantity=10).count(), 500)
+
+    def test_over_receipt_posts_nothing(self):
+        purchase_order, lines = self.make_order(2)
+        with self.assertRaisesMessage(ValueError, 'Received more than ordered'):
+            post_receipt(purchase_order.pk, {lines[0].pk: 5, lines[1].pk: 11}, self.user)
+        self.assertFalse(Receiving.objects.exists())
+        self.assertFalse(Product.objects.filter(quantity__gt=0).exists())
+
+        purchase_order.status = 'draft'
+        purchase_order.save()
+        with self.assertRaisesMessage(ValueError, 'cannot be received'):
+            post_receipt(purchase_order.pk, {lines[0].pk: 5}, self.user)
+
+    def test_receiving_views(self):
+        purchase_order, lines = self.make_order(2)
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('receiving_list')), purchase_order.po_number)
+        self.assertContains(self.client.get(reverse('receiving_create', args=[purchase_order.pk])),
+                            f'name="quantity_{lines[1].pk}"')
+
+        response = self.client.post(reverse('receiving_create', args=[purchase_order.pk]), {
+            f'quantity_{lines[0].pk}': 10, f'quantity_{lines[1].pk}': 10,
+            f'condition_{lines[0].pk}': 'Box dented', 'location': self.dock.pk,
+        }, follow=True)
+        self.assertContains(response, 'Box dented')
+        self.assertContains(response, 'is now fully received')
+        self.assertEqual(ReceivingItem.objects.get(po_item=lines[0]).location, self.dock)
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('importer', 'importer@example.com', 'password')
+        self.client.force_login(self.user)
+
+    def upload(self, name, content):
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post(reverse('import_inventory'), {'file': upload}, follow=True)
+
+    def test_unreadable_files_are_reported_not_raised(self):
+        cases = [
+            ('latin1.csv', 'name,description\nCaf\xe9,Test\n'.encode('latin-1'), 'not a UTF-8 CSV'),
+            ('renamed.xlsx', b'name,description\nBolt,Test\n', 'not a valid XLSX'),
+            ('truncated.xlsx', b'PK\x03\x04garbage', 'not a valid XLSX'),
+        ]
+        for name, content, message in cases:
+            with self.subTest(name):
+                response = self.upload(name, content)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, message)
+        self.assertFalse(Product.objects.exists())
+
+    def test_bad_rows_are_rejected_individually(self):
+        rows = [('name', 'description', 'sku'), ('Long', 'Test', 'X' * 101), ('Bolt', 'Test', 'B-1'),
+                ('Dup', 'Test', 'B-1'), ('Nut', 'Test', '')]
+        result = import_products(iter_csv_rows(BytesIO('\n'.join(map(','.join, rows)).encode())))
+        self.assertEqual((result.created, result.error_count), (2, 2))
+        self.assertEqual([row_number for row_number, _ in result.errors], [2, 4])
+        self.assertIn('longer than 100', result.errors[0][1])
+
+    def import_rows(self, column, values):
+        lines = [f'name,description,{column}'] + [f'Item {n},Test,{value}' for n, value in enumerate(values)]
+        return import_products(iter_csv_rows(BytesIO('\n'.join(lines).encode())))
+
+    def test_unstorable_prices_are_row_errors(self):
+        result = self.import_rows('unit_price', ['NaN', '123456789012', 'Infinity', '1e999999', '99999999.999', '12.346'])
+        self.assertEqual(result.created, 1)
+        self.assertEqual([row_number for row_number, _ in result.errors], [2, 3, 4, 5, 6])
+        self.assertEqual(Product.objects.get().unit_price, Decimal('12.35'))
+
+    def test_quantities_must_be_whole_numbers_that_fit(self):
+        result = self.import_rows('quantity', ['1.9', '1e3', '99999999999999', '-2', '5.0', '7'])
+        self.assertEqual(result.created, 2)
+        self.assertEqual([row_number for row_number, _ in result.errors], [2, 3, 4, 5])
+        self.assertEqual(sorted(Product.objects.values_list('quantity', flat=True)), [5, 7])
+
+    def test_explicit_generated_style_skus_are_not_reallocated(self):
+        allocate_product_skus(1)
+        csv_file = BytesIO(b'name,description,sku\nBolt,Test,PRD-0007\nNut,Test,\n')
+        result = import_products(iter_csv_rows(csv_file))
+        self.assertEqual(result.created, 2)
+        self.assertEqual(Product.objects.get(name='Nut').sku, 'PRD-0008')
+        self.assertEqual(allocate_product_skus(1), ['PRD-0009'])
+
+
+class ListingIndexTests(TestCase):
+    def test_every_sort_has_a_keyset_index(self):
+        listings = [
+            (Product, PRODUCT_SORTS), (ItemIssuance, ISSUANCE_SORTS), (PurchaseOrder, DOCUMENT_SORTS),
+            (Quotation, DOCUMENT_SORTS), (Vendor, VENDOR_SORTS), (Receiving, RECEIVING_SORTS),
+            (ItemRequest, REQUEST_SORTS), (Transfer, TRANSFER_SORTS),
+        ]
+        for model, sorts in listings:
+            indexed = {tuple(index.fields[:2]) for index in model._meta.indexes if index.condition is None}
+            for key, (_, field) in sorts.items():
+                field = field.lstrip('-')
+                with self.subTest(model=model.__name__, sort=key):
+                    self.assertTrue(field == 'id' or (field, 'id') in indexed)
+
+
+class KeysetPaginationTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user('lister')
+        self.products = [
+            Product.objects.create(name=f'Item {n:02d}', description='Test', sku=f'K-{n}', quantity=n % 3)
+            for n in range(11)
+        ]
+
+    def get(self, **params):
+        request = self.factory.get('/', params)
+        request.user = self.user
+        return request
+
+    def product_page(self, **params):
+        return paginate(self.get(**params), Product.objects.all(), sorts=PRODUCT_SORTS, default_sort='newest')
+
+    def test_cursor_walks_every_row_once_across_tied_sort_values(self):
+        expected = [p.pk for p in sorted(self.products, key=lambda p: (p.quantity, p.pk))]
+        seen, params = [], {'sort': 'quantity', 'per_page': 4}
+        while True:
+            with self.assertMaxQueries(1):
+                listing = self.product_page(**params)
+            seen.extend(p.pk for p in listing)
+            if not listing.has_next:
+                break
+            params['after'] = listing.next_cursor
+        self.assertEqual(seen, expected)
+
+        # Walking back from the last page returns the previous page in display order
+        listing = self.product_page(sort='quantity', per_page=4, before=listing.previous_cursor)
+        self.assertEqual([p.pk for p in listing], expected[4:8])
+        self.assertTrue(listing.has_previous)
+
+    def test_tampered_cursor_falls_back_to_the_first_page(self):
+        first = [p.pk for p in self.product_page(sort='quantity', per_page=4)]
+        for cursor in ('not-a-cursor', encode_cursor(['many', 1]), encode_cursor([1, 'x']), encode_cursor([1])):
+            with self.subTest(cursor=cursor):
+                listing = self.product_page(sort='quantity', per_page=4, after=cursor)
+                self.assertEqual([p.pk for p in listing], first)
+                self.assertFalse(listing.has_previous)
+
+    def test_status_date_and_owner_filters(self):
+        other = User.objects.create_user('other')
+        rows = [
+            ('R-1', self.user, 'pending', datetime(2025, 1, 10, 9, 0)),
+            ('R-2', self.user, 'approved', datetime(2025, 1, 20, 23, 30)),
+            ('R-3', other, 'pending', datetime(2025, 1, 20, 8, 0)),
+            ('R-4', other, 'approved', datetime(2025, 2, 1, 0, 0)),
+        ]
+        for number, user, status, created in rows:
+            item_request = ItemRequest.objects.create(request_number=number, requested_by=user, status=status, purpose='Test')
+            ItemRequest.objects.filter(pk=item_request.pk).update(created_at=timezone.make_aware(created))
+
+        def numbers(**params):
+            listing = paginate(
+                self.get(sort='oldest', **params), ItemRequest.objects.all(), sorts=REQUEST_SORTS, default_sort='newest',
+                status_choices=ItemRequest.STATUS_CHOICES, date_field='created_at', owner_field='requested_by',
+            )
+            return [item_request.request_number for item_request in listing]
+
+        self.assertEqual(numbers(status='pending'), ['R-1', 'R-3'])
+        self.assertEqual(numbers(status='bogus'), ['R-1', 'R-3', 'R-2', 'R-4'])
+        self.assertEqual(numbers(date_from='2025-01-20', date_to='2025-01-20'), ['R-3', 'R-2'])
+        self.assertEqual(numbers(owner='me'), ['R-1', 'R-2'])
+        self.assertEqual(numbers(owner=str(other.pk), status='approved'), ['R-4'])
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.bolt = Product.objects.create(name='Hex Bolt M8x40', description='Zinc plated', sku='HB-840')
+        self.washer = Product.objects.create(name='Flat Washer', description='Fits any bolt', sku='FW-8')
+        self.nut = Product.objects.create(name='Hex Nut M8', description='Steel', sku='HN-8')
+
+    def names(self, query, **kwargs):
+        return [product.name for product in search_products(query, **kwargs)]
+
+    def test_every_token_must_match_as_a_prefix(self):
+        self.assertEqual(self.names('bolt m8'), ['Hex Bolt M8x40'])
+        self.assertCountEqual(self.names('hex'), ['Hex Bolt M8x40', 'Hex Nut M8'])
+        self.assertEqual(self.names('hn-8'), ['Hex Nut M8'])
+        self.assertEqual(self.names('   '), [])
+
+    def test_name_hits_rank_above_description_hits(self):
+        self.assertEqual(self.names('bolt'), ['Hex Bolt M8x40', 'Flat Washer'])
+
+    def test_pages_are_contiguous(self):
+        first = search_products('hex', page_size=1)
+        second = search_products('hex', page=2, page_size=1)
+        self.assertTrue(first.has_next)
+        self.assertFalse(second.has_next)
+        self.assertEqual([p.pk for p in first] + [p.pk for p in second], [p.pk for p in search_products('hex')])
+        self.assertCountEqual([p.pk for p in first] + [p.pk for p in second], [self.bolt.pk, self.nut.pk])
+
+    def test_huge_page_numbers_return_an_empty_page(self):
+        self.assertEqual(self.names('hex', page=10 ** 20), [])
+        self.client.force_login(User.objects.create_user('searcher'))
+        response = self.client.get(reverse('product_search'), {'q': 'hex', 'page': '99999999999999999999'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get(reverse('inventory_list'), {'q': 'hex', 'page': '99999999999999999999'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_index_follows_creates_updates_and_deletes(self):
+        anchor = Product.objects.create(name='Anchor Plug', description='Nylon', sku='AP-1')
+        self.assertEqual(self.names('anchor'), ['Anchor Plug'])
+
+        anchor.name = 'Wall Plug'
+        anchor.save()
+        self.assertEqual(self.names('anchor'), [])
+        self.assertEqual(self.names('wall'), ['Wall Plug'])
+
+        Product.objects.filter(pk=self.washer.pk).update(description='Spring steel')
+        self.assertEqual(self.names('bolt'), ['Hex Bolt M8x40'])
+
+        anchor.delete()
+        self.assertEqual(self.names('wall'), [])
+
+
+class ExportTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('exporter', 'exporter@example.com', 'password')
+        self.client.force_login(self.user)
+        bin_a = StorageLocation.objects.create(name='Bin A', code='A')
+        bin_b = StorageLocation.objects.create(name='Bin B', code='B')
+        self.products = [
+            Product.objects.create(name=f'Item {n}', description='Comma, "quoted"', sku=f'E-{n}', location=bin_a)
+            for n in range(3)
+        ]
+        with_lines = ItemRequest.objects.create(request_number='REQ-1', requested_by=self.user, purpose='Test')
+        for product in self.products[:2]:
+            ItemRequestLine.objects.create(item_request=with_lines, product=product, quantity_requested=2)
+        ItemRequest.objects.create(request_number='REQ-2', requested_by=self.user, purpose='Test')
+        order = PurchaseOrder.objects.create(po_number='PO-1')
+        PurchaseOrderItem.objects.create(purchase_order=order, product=self.products[0], quantity_ordered=5, unit_price=Decimal('1.50'))
+        PurchaseOrder.objects.create(po_number='PO-2')
+        Transfer.objects.create(transfer_number='TRF-1', product=self.products[0], quantity=1,
+                                from_location=bin_a, to_location=bin_b, requested_by=self.user)
+
+    def export(self, dataset, export_format):
+        response = self.client.get(reverse('export_dataset', args=[dataset]), {'format': export_format})
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_row_per_document_line(self):
+        expected_rows = {'products': 3, 'requests': 3, 'purchase-orders': 2, 'transfers': 1}
+        for name, count in expected_rows.items():
+            with self.subTest(dataset=name):
+                rows = list(csv.reader(StringIO(self.export(name, 'csv'))))
+                self.assertEqual(rows[0], DATASETS[name].columns)
+                self.assertEqual(len(rows) - 1, count)
+                self.assertTrue(all(len(row) == len(rows[0]) for row in rows))
+
+        products = list(csv.DictReader(StringIO(self.export('products', 'csv'))))
+        self.assertEqual([row['sku'] for row in products], ['E-0', 'E-1', 'E-2'])
+        self.assertEqual(products[0]['description'], 'Comma, "quoted"')
+        self.assertEqual(products[0]['location'], 'A')
+
+    def test_ndjson_nests_lines_under_each_document(self):
+        records = [json.loads(line) for line in self.export('requests', 'ndjson').splitlines()]
+        self.assertEqual([record['request_number'] for record in records], ['REQ-1', 'REQ-2'])
+        self.assertEqual([line['product_sku'] for line in records[0]['lines']], ['E-0', 'E-1'])
+        self.assertEqual(records[1]['lines'], [])
+
+        orders = [json.loads(line) for line in self.export('purchase-orders', 'ndjson').splitlines()]
+        self.assertEqual([len(order['items']) for order in orders], [1, 0])
+        self.assertEqual(orders[0]['items'][0]['unit_price'], '1.50')
+
+    def test_stream_reads_each_dataset_in_one_query(self):
+        for name, dataset in DATASETS.items():
+            for stream in (stream_csv, stream_ndjson):
+                with self.subTest(dataset=name, stream=stream.__name__), self.assertMaxQueries(1):
+                    list(stream(dataset))
+
+
+class BenchmarkTests(TestCase):
+    def test_seeded_data_keeps_counters_consistent(self):
+        counts = seed_data(30)
+        self.assertEqual(counts['inventory.Product'], 30)
+        self.assertEqual(counts['inventory.ItemRequest'], ItemRequest.objects.count())
+        self.assertEqual(dashboard_counts(), expected_counts())
+
+        on_hand = Product.objects.aggregate(total=Sum('quantity'))['total']
+        self.assertEqual(StockMovement.objects.aggregate(total=Sum('quantity_change'))['total'], on_hand)
+        numbers = set(ItemRequest.objects.values_list('request_number', flat=True))
+        self.assertNotIn(generate_request_number(), numbers)
+
+    def test_seeding_again_adds_a_batch_without_lowering_counters(self):
+        DocumentCounter.objects.create(prefix='PO', last_number=500)
+        seed_data(20)
+        counts = seed_data(20, seed=1)
+        self.assertEqual(counts['inventory.Product'], 40)
+        self.assertEqual(User.objects.filter(username__startswith='bench_user_').count(), 25)
+        self.assertEqual(PurchaseOrder.objects.order_by('po_number').first().po_number, 'PO000501')
+        self.assertEqual(dashboard_counts(), expected_counts())
+        self.assertEqual(allocate_product_skus(1), ['PRD-0041'])
+        self.assertNotIn(generate_request_number(), set(ItemRequest.objects.values_list('request_number', flat=True)))
+
+    def test_every_route_runs_against_seeded_data(self):
+        seed_data(30)
+        cases = route_cases()
+        self.assertEqual(len({label for label, _url in cases}), len(cases))
+
+        results = benchmark_routes(repeat=1)
+        self.assertEqual(list(results), [label for label, _url in cases])
+        for label, result in results.items():
+            with self.subTest(label):
+                self.assertNotIn('error', result)
+                self.assertTrue('skipped' in result or result['queries'] > 0)
+        # Routes run inside rolled-back transactions, so nothing they wrote survives
+        self.assertEqual(dashboard_counts(), expected_counts())
@@ -0,0 +1,101 @@
+"""
+Stored document totals - PurchaseOrder/Quotation total_amount and line_count
+kept in step with their line items
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from .models import PurchaseOrder, PurchaseOrderItem, Quotation, QuotationItem
+
+
+_local = threading.local()
+
+# document model -> (line model, FK from line to document, quantity field)
+LINES = {
+    PurchaseOrder: (PurchaseOrderItem, 'purchase_order', 'quantity_ordered'),
+    Quotation: (QuotationItem, 'quotation', 'quantity'),
+}
+
+
+def line_aggregates(model):
+    """
+    Correlated subqueries giving each document's line total and line count.
+
+    Usable in annotate() and update(); the total is rounded to cents in SQL
+    so stored and recomputed values compare equal on every backend.
+    """
+    line_model, parent_field, quantity_field = LINES[model]
+    lines = line_model.objects.filter(**{parent_field: OuterRef('pk')}).order_by().values(parent_field)
+    amount = DecimalField(max_digits=14, decimal_places=2)
+    total = lines.annotate(
+        total=Sum(F(quantity_field) * F('unit_price'), output_field=amount),
+    ).values('total')
+    count = lines.annotate(count=Count('pk')).values('count')
+    return (
+        Round(Coalesce(Subquery(total), Value(0), output_field=amount), 2),
+        Coalesce(Subquery(count), Value(0)),
+    )
+
+
+def refresh_totals(model, ids=None):
+    """
+    Recompute stored totals for the given documents (all of them if ids is None) in one UPDATE.
+
+    updated_at moves too, so a line edit changes the document's conditional-GET version.
+    """
+    total, count = line_aggregates(model)
+    documents = model.objects.all() if ids is None else model.objects.filter(pk__in=ids)
+    return documents.update(total_amount=total, line_count=count, updated_at=timezone.now())
+
+
+def find_drift(model):
+    """Documents whose stored totals no longer match their lines, with the expected values annotated"""
+    total, count = line_aggregates(model)
+    return (
+        model.objects
+        .annotate(expected_total=total, expected_count=count)
+        .filter(~Q(total_amount=F('expected_total')) | ~Q(line_count=F('expected_count')))
+    )
+
+
+@contextmanager
+def deferred_refresh():
+    """
+    Collect documents whose lines change inside the block and refresh each
+    one once on the way out, instead of once per line.
+
+    Yields the pending set so bulk writers, which send no signals, can add
+    (model, pk) pairs themselves. Nothing is refreshed if the block raises.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        yield pending
+        return
+
+    _local.pending = pending = set()
+    try:
+        yield pending
+    finally:
+        _local.pending = None
+
+    by_model = {}
+    for model, pk in pending:
+        by_model.setdefault(model, set()).add(pk)
+    for model, ids in by_model.items():
+        refresh_totals(model, ids)
+
+
+def line_changed(sender, instance, **kwargs):
+    """post_save / post_delete handler for line items - refresh the parent document"""
+    for model, (line_model, parent_field, _quantity_field) in LINES.items():
+        if sender is line_model:
+            document_id = getattr(instance, f'{parent_field}_id')
+            pending = getattr(_local, 'pending', None)
+            if pending is not None:
+                pending.add((model, document_id))
+            else:
+                refresh_totals(model, [document_id])
@@ -7,23 +7,39 @@ from django.contrib import messages
 from django.utils import timezone
 from django.db import transaction
 
-from .models import Transfer, Product, StorageLocation
+from .models import Transfer, Product, StorageLocation, StockBalance
 from .utils import generate_transfer_number
+from .stock import move_stock
+from .listing import paginate
+from .conditional import TRANSFER, conditional
+from . import reference, roles
+
+
+TRANSFER_SORTS = {
+    'newest': ('Newest first', '-created_at'),
+    'oldest': ('Oldest first', 'created_at'),
+}
 
 
 @login_required
 def transfer_list(request):
     """List all transfers"""
-    transfers = Transfer.objects.all().order_by('-created_at')
+    listing = paginate(
+        request,
+        Transfer.objects.for_list(),
+        sorts=TRANSFER_SORTS,
+        default_sort='newest',
+        status_choices=Transfer.STATUS_CHOICES,
+        date_field='created_at',
+        owner_field='requested_by',
+    )
 
     # Check if user can create transfers (Warehouse Supervisor/Manager)
-    can_create_transfer = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_create_transfer = roles.can_manage_inventory(request.user)
 
     context = {
-        'transfers': transfers,
+        'transfers': listing.object_list,
+        'listing': listing,
         'can_create_transfer': can_create_transfer,
         'page_title': 'Transfers',
     }
@@ -34,10 +50,7 @@ def transfer_list(request):
 def transfer_create(request):
     """Create a new transfer"""
     # Only Warehouse Supervisor and Warehouse Manager can create transfers
-    can_create = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_create = roles.can_manage_inventory(request.user)
 
     if not can_create:
         messages.error(request, 'You do not have permission to create transfers.')
@@ -76,13 +89,12 @@ def transfer_create(request):
             from_location = get_object_or_404(StorageLocation, id=from_location_id)
             to_location = get_object_or_404(StorageLocation, id=to_location_id)
 
-            # Check if product is currently at the from_location
-            if product.location != from_location:
-                raise ValueError(f'Product is not currently at {from_location.code}. Current location: {product.location.code if product.location else "Not Set"}')
-
-            # Check if there's enough quantity
-            if product.quantity < quantity:
-                raise ValueError(f'Insufficient quantity. Available: {product.quantity}')
+            # Check there is enough stock held at the from_location
+            available = StockBalance.objects.filter(
+                product=product, location=from_location,
+            ).values_list('quantity', flat=True).first() or 0
+            if available < quantity:
+                raise ValueError(f'Insufficient quantity at {from_location.code}. Available: {available}')
 
             # Auto-generate transfer number
             transfer_number = generate_transfer_number()
@@ -109,8 +121,8 @@ def transfer_create(request):
             messages.error(request, f'Error creating transfer: {str(e)}')
 
     # Get products and locations for dropdowns
-    products = Product.objects.all().order_by('name')
-    locations = StorageLocation.objects.filter(is_active=True).order_by('code')
+    products = Product.objects.select_related('location').defer('description').order_by('name')
+    locations = reference.storage_locations()
 
     context = {
         'products': products,
@@ -121,15 +133,13 @@ def transfer_create(request):
 
 
 @login_required
+@conditional(TRANSFER, 'transfer_id')
 def transfer_detail(request, transfer_id):
     """View transfer details"""
-    transfer = get_object_or_404(Transfer, id=transfer_id)
+    transfer = get_object_or_404(Transfer.objects.for_detail(), id=transfer_id)
 
     # Check if user can complete transfers
-    can_complete_transfer = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_complete_transfer = roles.can_manage_inventory(request.user)
 
     context = {
         'transfer': transfer,
@@ -145,10 +155,7 @@ def transfer_complete(request, transfer_id):
     transfer = get_object_or_404(Transfer, id=transfer_id)
 
     # Only Warehouse Supervisor and Warehouse Manager can complete transfers
-    can_complete = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_complete = roles.can_manage_inventory(request.user)
 
     if not can_complete:
         messages.error(request, 'You do not have permission to complete transfers.')
@@ -161,24 +168,23 @@ def transfer_complete(request, transfer_id):
 
     try:
         with transaction.atomic():
-            # Update product location
+            # Lock the transfer so it cannot be completed twice
+            transfer = Transfer.objects.select_for_update().get(pk=transfer.pk)
+            if transfer.status != 'pending':
+                raise ValueError(f'Transfer is already {transfer.status}')
             product = transfer.product
 
-            # Verify product is still at from_location
-            if product.location != transfer.from_location:
-                raise ValueError(f'Product is no longer at {transfer.from_location.code}')
-
-            # Update product location
-            product.location = transfer.to_location
-            product.save()
+            # Move only the transferred quantity between the two location balances
+            move_stock(product, transfer.from_location, transfer.to_location, transfer.quantity,
+                       reference=transfer.transfer_number, user=request.user)
 
             # Update transfer status
             transfer.status = 'completed'
             transfer.transferred_by = request.user
             transfer.transfer_date = timezone.now()
-            transfer.save()
+            transfer.save(update_fields=['status', 'transferred_by', 'transfer_date', 'updated_at'])
 
-        messages.success(request, f'Transfer {transfer.transfer_number} completed successfully! {product.name} moved from {transfer.from_location.code} to {transfer.to_location.code}')
+        messages.success(request, f'Transfer {transfer.transfer_number} completed successfully! {transfer.quantity} x {product.name} moved from {transfer.from_location.code} to {transfer.to_location.code}')
         return redirect('transfer_detail', transfer_id=transfer_id)
 
     except Exception as e:
@@ -192,10 +198,7 @@ def transfer_cancel(request, transfer_id):
     transfer = get_object_or_404(Transfer, id=transfer_id)
 
     # Only Warehouse Supervisor and Warehouse Manager can cancel transfers
-    can_cancel = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_cancel = roles.can_manage_inventory(request.user)
 
     if not can_cancel:
         messages.error(request, 'You do not have permission to cancel transfers.')
@@ -1,5 +1,8 @@
 from django.urls import path
-from . import views, request_views, auth_views, procurement_views, issuance_views, transfer_views
+from . import (
+    views, request_views, auth_views, procurement_views, issuance_views, transfer_views, receiving_views,
+    export_views, diagnostics_views, api_views,
+)
 
 urlpatterns = [
     # Authentication
@@ -15,17 +18,23 @@ urlpatterns = [
 
     # Inventory Management
     path('inventory/products/', views.inventory_list, name='inventory_list'),
+    path('inventory/products/low-stock/', views.low_stock_list, name='low_stock_list'),
+    path('inventory/products/search/', views.product_search, name='product_search'),
+    path('inventory/stock/lookup/', views.stock_lookup, name='stock_lookup'),
     path('inventory/products/add/', views.add_inventory, name='add_inventory'),
+    path('inventory/products/import/', views.import_inventory, name='import_inventory'),
     path('inventory/products/update/<int:product_id>/', views.update_inventory, name='update_inventory'),
 
     # Item Request Management
     path('requests/', request_views.request_list, name='request_list'),
     path('requests/add/', request_views.request_add, name='request_add'),
+    path('requests/bulk-decide/', request_views.request_bulk_decide, name='request_bulk_decide'),
     path('requests/<int:request_id>/', request_views.request_detail, name='request_detail'),
     path('requests/<int:request_id>/edit/', request_views.request_edit, name='request_edit'),
     path('requests/<int:request_id>/delete/', request_views.request_delete, name='request_delete'),
     path('requests/<int:request_id>/approve/', request_views.request_approve, name='request_approve'),
     path('requests/<int:request_id>/reject/', request_views.request_reject, name='request_reject'),
+    path('requests/<int:request_id>/cancel/', request_views.request_cancel, name='request_cancel'),
 
     # Procurement Management
     path('procurement/', procurement_views.procurement_dashboard, name='procurement_dashboard'),
@@ -55,6 +64,8 @@ urlpatterns = [
     # Issuance Management
     path('issuance/', issuance_views.issuance_list, name='issuance_list'),
     path('issuance/create/', issuance_views.issuance_create, name='issuance_create'),
+    path('issuance/wave/', issuance_views.issuance_wave, name='issuance_wave'),
+    path('issuance/pick-list/', issuance_views.issuance_pick_list, name='issuance_pick_list'),
     path('issuance/<int:issuance_id>/', issuance_views.issuance_detail, name='issuance_detail'),
     path('issuance/request-items/<int:request_id>/', issuance_views.get_request_items, name='get_request_items'),
 
@@ -64,4 +75,19 @@ urlpatterns = [
     path('transfer/<int:transfer_id>/', transfer_views.transfer_detail, name='transfer_detail'),
     path('transfer/<int:transfer_id>/complete/', transfer_views.transfer_complete, name='transfer_complete'),
     path('transfer/<int:transfer_id>/cancel/', transfer_views.transfer_cancel, name='transfer_cancel'),
+
+    # Receiving
+    path('receiving/', receiving_views.receiving_list, name='receiving_list'),
+    path('receiving/po/<int:po_id>/', receiving_views.receiving_create, name='receiving_create'),
+    path('receiving/<int:receiving_id>/', receiving_views.receiving_detail, name='receiving_detail'),
+
+    # Exports (?format=csv|ndjson)
+    path('export/<slug:dataset>/', export_views.export_dataset, name='export_dataset'),
+
+    # Diagnostics
+    path('diagnostics/queries/', diagnostics_views.query_summary, name='query_summary'),
+
+    # JSON API (v1)
+    path('api/v1/<slug:resource>/', api_views.api_list, name='api_list'),
+    path('api/v1/<slug:resource>/<int:pk>/', api_views.api_detail, name='api_detail'),
 ]
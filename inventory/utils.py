@@ -2,155 +2,154 @@
 Utility functions for the inventory app
 """
 from datetime import datetime
-from .models import PurchaseOrder, ItemRequest, ItemIssuance, Receiving, Quotation, Vendor, Product, Transfer
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import (
+    PurchaseOrder, ItemRequest, ItemIssuance, Receiving, Quotation, Vendor, Product, Transfer,
+    DocumentCounter
+)
+
+
+# ==================== Document Numbers ====================
+
+def _highest_used(model, field, prefix):
+    """Highest number already used after `prefix`, compared numerically (so 10000 > 9999)"""
+    highest = 0
+    for value in model.objects.filter(**{f'{field}__startswith': prefix}).values_list(field, flat=True).iterator():
+        suffix = value[len(prefix):]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def allocate_numbers(prefix, count=1, seed=None):
+    """
+    Reserve `count` consecutive numbers for a prefix and return the first one.
+
+    The counter row is bumped with one UPDATE ... SET last_number =
+    last_number + count, which holds its row lock until the surrounding
+    transaction ends, so concurrent callers always get distinct blocks. The
+    first use of a prefix creates its counter starting from seed(), the
+    highest number already in use.
+    """
+    if count <= 0:
+        raise ValueError('count must be positive')
+
+    with transaction.atomic():
+        counters = DocumentCounter.objects.filter(prefix=prefix)
+        if not counters.update(last_number=F('last_number') + count):
+            try:
+                with transaction.atomic():
+                    DocumentCounter.objects.create(prefix=prefix, last_number=(seed() if seed else 0) + count)
+            except IntegrityError:
+                # Another request created the counter first
+                counters.update(last_number=F('last_number') + count)
+        last_number = counters.values_list('last_number', flat=True).get()
+    return last_number - count + 1
+
+
+def advance_counter(prefix, number, seed=None):
+    """
+    Make sure the next number allocated for a prefix comes after `number`,
+    for numbers that were used without being allocated (e.g. typed in).
+    """
+    with transaction.atomic():
+        counters = DocumentCounter.objects.filter(prefix=prefix)
+        if not counters.update(last_number=Greatest(F('last_number'), Value(number))):
+            try:
+                with transaction.atomic():
+                    DocumentCounter.objects.create(prefix=prefix, last_number=max(seed() if seed else 0, number))
+            except IntegrityError:
+                # Another request created the counter first
+                counters.update(last_number=Greatest(F('last_number'), Value(number)))
 
 
 def generate_po_number():
     """Generate next PO number in format: PO000001"""
     prefix = "PO"
-
-    # Get last PO
-    last_po = PurchaseOrder.objects.filter(
-        po_number__startswith=prefix
-    ).order_by('-po_number').first()
-
-    if last_po:
-        try:
-            # Extract number and increment
-            last_number = int(last_po.po_number.replace(prefix, ''))
-            new_number = last_number + 1
-        except (ValueError, IndexError):
-            # If the last PO number is not in expected format, count all POs
-            new_number = PurchaseOrder.objects.count() + 1
-    else:
-        new_number = 1
-
-    return f"{prefix}{new_number:06d}"
+    number = allocate_numbers(prefix, seed=lambda: _highest_used(PurchaseOrder, 'po_number', prefix))
+    return f"{prefix}{number:06d}"
 
 
 def generate_request_number():
     """Generate next request number in format: REQ-YYYY-NNNN"""
     year = datetime.now().year
     prefix = f"REQ-{year}-"
-
-    last_request = ItemRequest.objects.filter(
-        request_number__startswith=prefix
-    ).order_by('-request_number').first()
-
-    if last_request:
-        last_number = int(last_request.request_number.split('-')[-1])
-        new_number = last_number + 1
-    else:
-        new_number = 1
-
-    return f"{prefix}{new_number:04d}"
+    number = allocate_numbers(prefix, seed=lambda: _highest_used(ItemRequest, 'request_number', prefix))
+    return f"{prefix}{number:04d}"
 
 
 def generate_issue_number():
     """Generate next issue number in format: ISS-YYYY-NNNN"""
-    year = datetime.now().year
-    prefix = f"ISS-{year}-"
+    return allocate_issue_numbers(1)[0]
 
-    last_issue = ItemIssuance.objects.filter(
-        issue_number__startswith=prefix
-    ).order_by('-issue_number').first()
 
-    if last_issue:
-        last_number = int(last_issue.issue_number.split('-')[-1])
-        new_number = last_number + 1
-    else:
-        new_number = 1
+def allocate_issue_numbers(count):
+    """Allocate a block of `count` consecutive issue numbers with a single counter update"""
+    if count <= 0:
+        return []
 
-    return f"{prefix}{new_number:04d}"
+    year = datetime.now().year
+    prefix = f"ISS-{year}-"
+    first_number = allocate_numbers(prefix, count, seed=lambda: _highest_used(ItemIssuance, 'issue_number', prefix))
+    return [f"{prefix}{number:04d}" for number in range(first_number, first_number + count)]
 
 
 def generate_receiving_number():
     """Generate next receiving number in format: RCV-YYYY-NNNN"""
     year = datetime.now().year
     prefix = f"RCV-{year}-"
-
-    # Count receivings for current year
-    count = Receiving.objects.filter(
-        created_at__year=year
-    ).count()
-
-    new_number = count + 1
-    return f"{prefix}{new_number:04d}"
+    number = allocate_numbers(prefix, seed=lambda: _highest_used(Receiving, 'receiving_number', prefix))
+    return f"{prefix}{number:04d}"
 
 
 def generate_quotation_number():
     """Generate next quotation number in format: QTN-YYYY-NNNN"""
     year = datetime.now().year
     prefix = f"QTN-{year}-"
-
-    last_quotation = Quotation.objects.filter(
-        quotation_number__startswith=prefix
-    ).order_by('-quotation_number').first()
-
-    if last_quotation:
-        last_number = int(last_quotation.quotation_number.split('-')[-1])
-        new_number = last_number + 1
-    else:
-        new_number = 1
-
-    return f"{prefix}{new_number:04d}"
+    number = allocate_numbers(prefix, seed=lambda: _highest_used(Quotation, 'quotation_number', prefix))
+    return f"{prefix}{number:04d}"
 
 
 def generate_vendor_code():
     """Generate next vendor code in format: VEN-NNNN"""
     prefix = "VEN-"
+    number = allocate_numbers(prefix, seed=lambda: _highest_used(Vendor, 'code', prefix))
+    return f"{prefix}{number:04d}"
 
-    last_vendor = Vendor.objects.filter(
-        code__startswith=prefix
-    ).order_by('-code').first()
-
-    if last_vendor:
-        try:
-            last_number = int(last_vendor.code.split('-')[-1])
-            new_number = last_number + 1
-        except (ValueError, IndexError):
-            # If the last vendor code is not in expected format, count all vendors
-            new_number = Vendor.objects.count() + 1
-    else:
-        new_number = 1
 
-    return f"{prefix}{new_number:04d}"
+PRODUCT_SKU_PREFIX = "PRD-"
 
 
 def generate_product_sku():
     """Generate next product SKU in format: PRD-NNNN"""
-    prefix = "PRD-"
+    return allocate_product_skus(1)[0]
 
-    last_product = Product.objects.filter(
-        sku__startswith=prefix
-    ).order_by('-sku').first()
 
-    if last_product:
-        try:
-            last_number = int(last_product.sku.split('-')[-1])
-            new_number = last_number + 1
-        except (ValueError, IndexError):
-            # If the last SKU is not in expected format, count all products
-            new_number = Product.objects.count() + 1
-    else:
-        new_number = 1
+def allocate_product_skus(count):
+    """Allocate a block of `count` consecutive product SKUs with a single counter update"""
+    if count <= 0:
+        return []
 
-    return f"{prefix}{new_number:04d}"
+    prefix = PRODUCT_SKU_PREFIX
+    first_number = allocate_numbers(prefix, count, seed=lambda: _highest_used(Product, 'sku', prefix))
+    return [f"{prefix}{number:04d}" for number in range(first_number, first_number + count)]
+
+
+def claim_product_skus(skus):
+    """Move the SKU counter past explicitly chosen SKUs in the PRD-NNNN format, so they are never allocated"""
+    prefix = PRODUCT_SKU_PREFIX
+    numbers = [int(sku[len(prefix):]) for sku in skus if sku.startswith(prefix) and sku[len(prefix):].isdigit()]
+    if numbers:
+        advance_counter(prefix, max(numbers), seed=lambda: _highest_used(Product, 'sku', prefix))
 
 
 def generate_transfer_number():
     """Generate next transfer number in format: TRF-YYYY-NNNN"""
     year = datetime.now().year
     prefix = f"TRF-{year}-"
-
-    last_transfer = Transfer.objects.filter(
-        transfer_number__startswith=prefix
-    ).order_by('-transfer_number').first()
-
-    if last_transfer:
-        last_number = int(last_transfer.transfer_number.split('-')[-1])
-        new_number = last_number + 1
-    else:
-        new_number = 1
-
-    return f"{prefix}{new_number:04d}"
+    number = allocate_numbers(prefix, seed=lambda: _highest_used(Transfer, 'transfer_number', prefix))
+    return f"{prefix}{number:04d}"
@@ -1,3 +1,4 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
@@ -10,73 +11,74 @@ from datetime import datetime
 from .models import (
     Product, Department, Site, PurchaseOrder, PurchaseOrderItem,
     ItemRequest, ItemRequestLine, Receiving, ReceivingItem,
-    ItemIssuance, ItemIssuanceLine, UnitOfMeasure
+    ItemIssuance, ItemIssuanceLine, UnitOfMeasure, StockBalance
 )
 from .utils import (
     generate_po_number, generate_request_number,
-    generate_issue_number, generate_receiving_number, generate_product_sku
+    generate_issue_number, generate_receiving_number, generate_product_sku, claim_product_skus
 )
+from .listing import paginate
+from .search import search_products
+from .importers import COLUMNS as IMPORT_COLUMNS, ImportFileError, import_products, iter_rows
+from .stock import receive_stock, set_stock_level
+from . import reference, roles, stats
+
+
+PRODUCT_SORTS = {
+    'newest': ('Newest first', '-id'),
+    'name': ('Name (A-Z)', 'name'),
+    'quantity': ('Lowest stock first', 'quantity'),
+}
+
+LOW_STOCK_SORTS = {
+    'quantity': ('Lowest stock first', 'quantity'),
+    'newest': ('Newest first', '-id'),
+}
+
+# Products shown on the main dashboard
+DASHBOARD_PRODUCTS = 10
 
 
 # ==================== Dashboard ====================
+# Dashboards are polled by handhelds, so they are async views: queries go
+# through the async ORM and only the template render runs in a thread.
 
-def dashboard(request):
+async def dashboard(request):
     """Main dashboard with overview"""
-    # Get all products for the inventory table
-    products = Product.objects.all().order_by('-id')
-    low_stock = [p for p in products if p.is_low_stock]
+    # Newest products only; the full table is on the inventory list
+    products = [product async for product in Product.objects.for_list().order_by('-id')[:DASHBOARD_PRODUCTS]]
 
     # Check if user has permission to add/edit inventory
-    can_manage_inventory = False
-    if request.user.is_authenticated:
-        can_manage_inventory = (
-            request.user.is_superuser or
-            request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-        )
+    can_manage_inventory = await roles.acheck(request, roles.can_manage_inventory)
 
     context = {
         'products': products,
-        'total_products': products.count(),
-        'low_stock_count': len(low_stock),
-        'pending_requests': ItemRequest.objects.filter(status='pending').count(),
-        'pending_pos': PurchaseOrder.objects.filter(status__in=['draft', 'submitted']).count(),
         'can_manage_inventory': can_manage_inventory,
+        **await stats.adashboard_counts(),
     }
-    return render(request, 'dashboard.html', context)
+    return await sync_to_async(render)(request, 'dashboard.html', context)
 
 
 @login_required
-def inventory_dashboard(request):
+async def inventory_dashboard(request):
     """Inventory & Warehouse Operations Dashboard"""
     # Get statistics
-    total_products = Product.objects.count()
-    low_stock = [p for p in Product.objects.all() if p.is_low_stock]
-    low_stock_count = len(low_stock)
-
-    pending_requests = ItemRequest.objects.filter(status='pending').count()
-    total_issuances = ItemIssuance.objects.count()
+    counts = await stats.adashboard_counts()
 
     # Check permissions
-    can_manage_inventory = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
-
-    can_create_issuance = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_manage_inventory = await roles.acheck(request, roles.can_manage_inventory)
+    can_create_issuance = can_manage_inventory
 
     context = {
         'page_title': 'Inventory & Warehouse Operations',
-        'total_products': total_products,
-        'low_stock_count': low_stock_count,
-        'pending_requests': pending_requests,
-        'total_issuances': total_issuances,
+        'total_products': counts['total_products'],
+        'low_stock_count': counts['low_stock_count'],
+        'pending_requests': counts['pending_requests'],
+        'total_issuances': counts['total_issuances'],
         'can_manage_inventory': can_manage_inventory,
         'can_create_issuance': can_create_issuance,
     }
-    return render(request, 'inventory/dashboard.html', context)
+    return await sync_to_async(render)(request, 'inventory/dashboard.html', context)
 
 
 # ==================== Inventory Management ====================
@@ -84,27 +86,127 @@ def inventory_dashboard(request):
 @login_required
 def inventory_list(request):
     # All authenticated users can view inventory
-    products = Product.objects.all().order_by('-id')
+    query = request.GET.get('q', '').strip()
+    if query:
+        return _inventory_search(request, query)
+
+    listing = paginate(
+        request,
+        Product.objects.for_list(),
+        sorts=PRODUCT_SORTS,
+        default_sort='newest',
+    )
 
     # Check if user has permission to add/edit inventory
-    can_manage_inventory = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
+    can_manage_inventory = roles.can_manage_inventory(request.user)
+
+    context = {
+        'products': listing.object_list,
+        'listing': listing,
+        'can_manage_inventory': can_manage_inventory,
+    }
+    return render(request, 'inventory_list.html', context)
+
+def _inventory_search(request, query):
+    """Render inventory_list with ranked full-text search results"""
+    try:
+        page = int(request.GET.get('page', 1))
+    except (TypeError, ValueError):
+        page = 1
+    results = search_products(query, page=page)
+
+    can_manage_inventory = roles.can_manage_inventory(request.user)
+
+    context = {
+        'products': results.products,
+        'search': results,
+        'can_manage_inventory': can_manage_inventory,
+        'page_title': f'Search results for "{query}"',
+    }
+    return render(request, 'inventory_list.html', context)
+
+@login_required
+def product_search(request):
+    """JSON endpoint: ranked, paginated product search over name, SKU and description"""
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('per_page', 20))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'page and per_page must be integers'}, status=400)
+
+    results = search_products(request.GET.get('q', ''), page=page, page_size=page_size)
+
+    return JsonResponse({
+        'query': results.query,
+        'page': results.page,
+        'per_page': results.page_size,
+        'has_next': results.has_next,
+        'results': [
+            {
+                'id': product.id,
+                'name': product.name,
+                'sku': product.sku or '',
+                'quantity': product.quantity,
+                'uom': product.unit_of_measure.abbreviation if product.unit_of_measure else '',
+                'location': product.location.code if product.location else '',
+            }
+            for product in results
+        ],
+    })
+
+@login_required
+async def stock_lookup(request):
+    """JSON endpoint: what is in a bin (?location=A1) or where a SKU is held (?sku=PRD-00001)"""
+    location_code = request.GET.get('location', '').strip()
+    sku = request.GET.get('sku', '').strip()
+    if bool(location_code) == bool(sku):
+        return JsonResponse({'error': 'Pass exactly one of location or sku'}, status=400)
+
+    balances = StockBalance.objects.filter(quantity__gt=0).select_related('product', 'location')
+    if location_code:
+        balances = balances.filter(location__code=location_code).order_by('product__name')
+    else:
+        balances = balances.filter(product__sku=sku).order_by('location__code')
+
+    return JsonResponse({
+        'location': location_code,
+        'sku': sku,
+        'balances': [
+            {
+                'product_id': balance.product_id,
+                'sku': balance.product.sku or '',
+                'name': balance.product.name,
+                'location': balance.location.code,
+                'quantity': balance.quantity,
+            }
+            async for balance in balances
+        ],
+    })
+
+@login_required
+def low_stock_list(request):
+    """Products at or below their minimum stock level"""
+    listing = paginate(
+        request,
+        Product.low_stock_items.all().for_list(),
+        sorts=LOW_STOCK_SORTS,
+        default_sort='quantity',
     )
 
+    can_manage_inventory = roles.can_manage_inventory(request.user)
+
     context = {
-        'products': products,
+        'products': listing.object_list,
+        'listing': listing,
         'can_manage_inventory': can_manage_inventory,
+        'page_title': 'Low Stock Items',
     }
     return render(request, 'inventory_list.html', context)
 
 @login_required
 def add_inventory(request):
     # Only Warehouse Supervisor and Warehouse Manager can add inventory
-    can_add = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_add = roles.can_manage_inventory(request.user)
 
     if not can_add:
         messages.error(request, 'You do not have permission to add products.')
@@ -142,7 +244,6 @@ def add_inventory(request):
                 name=name,
                 sku=sku,
                 description=description,
-                quantity=quantity,
             )
 
             if location_id:
@@ -150,7 +251,10 @@ def add_inventory(request):
             if unit_of_measure_id:
                 product.unit_of_measure_id = unit_of_measure_id
 
-            product.save()
+            with db_transaction.atomic():
+                product.save()
+                if quantity:
+                    receive_stock(product, quantity, movement_type='opening', reference=sku, user=request.user)
             messages.success(request, f'Product "{name}" added successfully with SKU {sku}!')
             return redirect('inventory_list')
 
@@ -160,20 +264,53 @@ def add_inventory(request):
             messages.error(request, f'Error adding product: {str(e)}')
 
     # Get dropdown data
-    from .models import StorageLocation, UnitOfMeasure
     context = {
-        'storage_locations': StorageLocation.objects.filter(is_active=True).order_by('code'),
-        'units_of_measure': UnitOfMeasure.objects.filter(is_active=True).order_by('name'),
+        'storage_locations': reference.storage_locations(),
+        'units_of_measure': reference.units_of_measure(),
     }
     return render(request, 'add_inventory.html', context)
 
+@login_required
+def import_inventory(request):
+    """Bulk import products from an uploaded CSV or XLSX file"""
+    can_import = roles.can_manage_inventory(request.user)
+
+    if not can_import:
+        messages.error(request, 'You do not have permission to import products.')
+        return redirect('inventory_list')
+
+    result = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        dry_run = request.POST.get('dry_run') == 'on'
+        if not upload:
+            messages.error(request, 'Please choose a file to import.')
+        else:
+            try:
+                result = import_products(
+                    iter_rows(upload.file, upload.name),
+                    created_by=request.user,
+                    dry_run=dry_run,
+                )
+                verb = 'validated' if dry_run else 'imported'
+                messages.success(
+                    request,
+                    f'{result.created} products {verb} in {result.elapsed:.1f}s; '
+                    f'{result.error_count} rows rejected.'
+                )
+            except ImportFileError as e:
+                messages.error(request, str(e))
+
+    context = {
+        'result': result,
+        'columns': IMPORT_COLUMNS,
+    }
+    return render(request, 'import_inventory.html', context)
+
 @login_required
 def update_inventory(request, product_id):
     # Only Warehouse Supervisor and Warehouse Manager can update inventory
-    can_update = (
-        request.user.is_superuser or
-        request.user.groups.filter(name__in=['Warehouse Supervisor', 'Warehouse Manager']).exists()
-    )
+    can_update = roles.can_manage_inventory(request.user)
 
     if not can_update:
         messages.error(request, 'You do not have permission to update products.')
@@ -204,23 +341,27 @@ def update_inventory(request, product_id):
             except (ValueError, TypeError):
                 raise ValidationError('Quantity must be a valid number')
 
-            # Update product
+            try:
+                location_id = int(location_id) if location_id else None
+            except ValueError:
+                raise ValidationError('Invalid storage location')
+
+            # Update product details; quantity and location go through the stock service
             product.name = name
             product.sku = sku if sku else None
             product.description = description
-            product.quantity = quantity
-
-            if location_id:
-                product.location_id = location_id
-            else:
-                product.location = None
 
             if unit_of_measure_id:
                 product.unit_of_measure_id = unit_of_measure_id
             else:
                 product.unit_of_measure = None
 
-            product.save()
+            with db_transaction.atomic():
+                if product.sku:
+                    claim_product_skus([product.sku])
+                product.save(update_fields=['name', 'sku', 'description', 'unit_of_measure', 'updated_at'])
+                set_stock_level(product, quantity, location_id,
+                                reference='Manual update', user=request.user)
 
             messages.success(request, f'Product "{name}" updated successfully!')
             return redirect('inventory_list')
@@ -231,10 +372,9 @@ def update_inventory(request, product_id):
             messages.error(request, f'Error updating product: {str(e)}')
 
     # Get dropdown data
-    from .models import StorageLocation, UnitOfMeasure
     context = {
         'product': product,
-        'storage_locations': StorageLocation.objects.filter(is_active=True).order_by('code'),
-        'units_of_measure': UnitOfMeasure.objects.filter(is_active=True).order_by('name'),
+        'storage_locations': reference.storage_locations(),
+        'units_of_measure': reference.units_of_measure(),
     }
     return render(request, 'update_inventory.html', context)
@@ -0,0 +1,183 @@
+"""
+Wave issuance - issue many approved requests in one transaction with a fixed
+number of statements, however many requests and lines the wave holds
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import stats
+from .models import ItemIssuance, ItemIssuanceLine, ItemRequest, ItemRequestLine, Product, StockBalance, StockMovement
+from .stock import InsufficientStock, per_row, plan_withdrawal, record_movements
+from .utils import allocate_issue_numbers
+
+
+class WaveResult:
+    """The issuances a wave created, plus the requests it left out and why"""
+
+    def __init__(self):
+        self.issuances = []
+        self.skipped = []
+        self.line_count = 0
+
+
+def split_plan(plan, lines):
+    """
+    Share one product's withdrawal plan out over its lines, in order: yields
+    (line, location_id, quantity). Lines the plan does not cover get less.
+    """
+    plan = [list(step) for step in plan]
+    for line in lines:
+        needed = line.quantity_approved - line.quantity_issued
+        while needed and plan:
+            location_id, available = plan[0]
+            take = min(available, needed)
+            yield line, location_id, take
+            needed -= take
+            plan[0][1] -= take
+            if not plan[0][1]:
+                plan.pop(0)
+
+
+def issue_wave(request_ids, user, notes=''):
+    """
+    Issue everything still outstanding on the approved requests in request_ids.
+
+    Requests, products and balances are each locked once, in that order and
+    by id. Stock is checked against the wave's summed demand per product
+    before anything is written, so the wave either goes through whole or
+    raises InsufficientStock naming every short product. Each request gets
+    one completed ItemIssuance and moves to completed.
+    """
+    result = WaveResult()
+    with transaction.atomic():
+        requests = list(
+            ItemRequest.objects.select_for_update()
+            .filter(pk__in=set(request_ids))
+            .only('id', 'request_number', 'status', 'requested_by_id')
+            .order_by('pk')
+        )
+        approved = {}
+        for item_request in requests:
+            if item_request.status == 'approved':
+                approved[item_request.pk] = item_request
+            else:
+                result.skipped.append((item_request.request_number, 'Only approved requests can be issued.'))
+
+        lines = list(
+            ItemRequestLine.objects
+            .filter(item_request_id__in=approved, quantity_approved__gt=F('quantity_issued'))
+            .only('id', 'item_request_id', 'product_id', 'quantity_approved', 'quantity_issued')
+            .order_by('item_request_id', 'id')
+        )
+        waved = {line.item_request_id for line in lines}
+        for pk, item_request in approved.items():
+            if pk not in waved:
+                result.skipped.append((item_request.request_number, 'Nothing left to issue.'))
+        if not lines:
+            raise ValueError('No items to issue in the selected requests.')
+
+        demand = defaultdict(int)
+        lines_by_product = defaultdict(list)
+        for line in lines:
+            demand[line.product_id] += line.quantity_approved - line.quantity_issued
+            lines_by_product[line.product_id].append(line)
+
+        products = list(
+            Product.objects.select_for_update()
+            .filter(pk__in=demand)
+            .only('id', 'name', 'quantity', 'min_quantity', 'location_id')
+            .order_by('pk')
+        )
+        shortages = [
+            f'{product.name} (wave needs {demand[product.pk]}, available {product.quantity})'
+            for product in products if product.quantity < demand[product.pk]
+        ]
+        if shortages:
+            raise InsufficientStock('Insufficient stock for ' + '; '.join(shortages))
+
+        balance_ids = {}
+        held = defaultdict(list)
+        for balance_id, product_id, location_id, quantity in (
+            StockBalance.objects.select_for_update()
+            .filter(product_id__in=demand)
+            .order_by('product_id', 'location_id')
+            .values_list('id', 'product_id', 'location_id', 'quantity')
+        ):
+            balance_ids[product_id, location_id] = balance_id
+            if quantity > 0:
+                held[product_id].append((location_id, quantity))
+
+        # Numbers and headers first: issuance lines and movements point at them
+        wave_requests = [approved[pk] for pk in sorted(waved)]
+        now = timezone.now()
+        issuances = {
+            item_request.pk: ItemIssuance(
+                item_request_id=item_request.pk,
+                issue_number=number,
+                issued_by=user,
+                issued_to_id=item_request.requested_by_id,
+                issued_date=now,
+                status='completed',
+                notes=notes,
+            )
+            for item_request, number in zip(wave_requests, allocate_issue_numbers(len(wave_requests)))
+        }
+        ItemIssuance.objects.bulk_create(issuances.values())
+        stats.created_in_bulk(issuances.values())
+
+        issuance_lines = []
+        movements = defaultdict(int)
+        taken = defaultdict(int)
+        for product in products:
+            plan = plan_withdrawal(product, demand[product.pk], held[product.pk], product.quantity)
+            for line, location_id, quantity in split_plan(plan, lines_by_product[product.pk]):
+                issuance_lines.append(ItemIssuanceLine(
+                    issuance=issuances[line.item_request_id],
+                    request_line_id=line.pk,
+                    quantity_issued=quantity,
+                    location_id=location_id,
+                ))
+                movements[line.item_request_id, product.pk, location_id] += quantity
+                if location_id is not None:
+                    taken[balance_ids[product.pk, location_id]] += quantity
+
+        ItemIssuanceLine.objects.bulk_create(issuance_lines, batch_size=500)
+        record_movements(
+            StockMovement(
+                product_id=product_id,
+                movement_type='issue',
+                quantity_change=-quantity,
+                location_id=location_id,
+                reference=issuances[request_id].issue_number,
+                created_by=user,
+            )
+            for (request_id, product_id, location_id), quantity in movements.items()
+        )
+
+        # The wave issues every open line in full, so it also releases all of their reservations
+        Product.objects.filter(pk__in=demand).update(
+            quantity=F('quantity') - per_row(demand),
+            reserved_quantity=F('reserved_quantity') - per_row(demand),
+            updated_at=now,
+        )
+        changes = []
+        for product in products:
+            old_quantity = product.quantity
+            product.quantity -= demand[product.pk]
+            changes.append((product, old_quantity, product.quantity, product.min_quantity))
+        stats.quantities_changed(changes)
+        if taken:
+            StockBalance.objects.filter(pk__in=taken).update(quantity=F('quantity') - per_row(taken), updated_at=now)
+
+        ItemRequestLine.objects.filter(pk__in=[line.pk for line in lines]).update(quantity_issued=F('quantity_approved'))
+        ItemRequest.objects.filter(pk__in=waved).update(status='completed', updated_at=now)
+        for item_request in wave_requests:
+            item_request.status = 'completed'
+        stats.updated_in_bulk(wave_requests)
+
+    result.issuances = list(issuances.values())
+    result.line_count = len(lines)
+    return result
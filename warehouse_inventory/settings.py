@@ -47,7 +47,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Outermost after security so session/auth queries are counted too
+    'inventory.instrumentation.QueryInstrumentationMiddleware',
+    # WhiteNoise, usable in the async (ASGI) middleware chain
+    'inventory.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,6 +72,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'inventory.roles.roles',
             ],
         },
     },
@@ -86,16 +90,48 @@ DATABASE_URL = config('DATABASE_URL', default=None)
 
 if DATABASE_URL:
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+        # Persistent connections suit WSGI workers; under ASGI set DATABASE_CONN_MAX_AGE=0,
+        # since each request's ORM calls run in their own thread with their own connection
+        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=config('DATABASE_CONN_MAX_AGE', default=600, cast=int))
     }
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Take the write lock when a transaction starts, so concurrent
+                # writers wait (up to timeout seconds) instead of failing
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+            'TEST': {
+                # A file, not shared-cache memory, so threads in tests wait on locks too
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
         }
     }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# CACHE_BACKEND is locmem (per process, the default), file (shared by processes
+# on one host) or redis (any Redis-protocol server; needs the redis package).
+# CACHE_LOCATION is the file directory or the redis:// URL.
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'warehouse-inventory'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': config('CACHE_LOCATION', default=CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'KEY_PREFIX': config('CACHE_KEY_PREFIX', default='wms'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -130,3 +166,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
+
+# SQL instrumentation (inventory.instrumentation.QueryInstrumentationMiddleware)
+QUERY_STATS_WINDOW = 200      # requests kept per view for the query summary page
+QUERY_COUNT_WARNING = 100     # log a warning when one request runs more queries than this
+
+# Cached group membership (inventory.roles), invalidated on group changes
+ROLE_CACHE_TIMEOUT = 300
+
+# Cached counts and dropdown lists (inventory.reference), invalidated by model signals
+APP_CACHE_TIMEOUT = 300